@@ -2,7 +2,7 @@
 from django.contrib import admin
 from guardian.admin import GuardedModelAdmin
 
-from .models import Evaluation, Experiment, Frame, Project, Scan, ScanDecision
+from .models import Evaluation, Experiment, Frame, Project, ProjectStatistics, Scan, ScanDecision
 
 
 @admin.register(Experiment)
@@ -52,3 +52,9 @@ class ProjectAdmin(GuardedModelAdmin):
     )
     list_filter = ('created', 'modified', 'creator')
     search_fields = ('name',)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and 'evaluation_models' in form.changed_data:
+            # the frames counted as evaluable follow the scan types with an evaluation model
+            ProjectStatistics.refresh(obj.id)
@@ -0,0 +1,83 @@
+from typing import Iterator, List, Sequence, Type
+
+from django.conf import settings
+from django.db import connection, models, transaction
+
+# rows inserted per statement where rows cannot be copied
+BULK_CREATE_BATCH_SIZE = 1000
+
+
+def _copy_value(value) -> str:
+    """Format a database value for the text format of COPY."""
+    if value is None:
+        return '\\N'
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+class _LineReader:
+    """A file-like object reading from lines as they are generated, so COPY streams them."""
+
+    def __init__(self, lines: Iterator[str]):
+        self._lines = lines
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        parts: List[str] = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            line = next(self._lines, None)
+            if line is None:
+                break
+            parts.append(line)
+            length += len(line)
+        data = ''.join(parts)
+        if size < 0:
+            size = len(data)
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(model: Type[models.Model], objs: Sequence[models.Model]):
+    """
+    Insert new instances of a model with a PostgreSQL COPY ... FROM STDIN.
+
+    Values are prepared like bulk_create prepares them, so instances need their primary keys
+    assigned, as UUID defaults do.
+    """
+    fields = model._meta.concrete_fields
+
+    def lines():
+        for obj in objs:
+            values = [
+                field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields
+            ]
+            yield '\t'.join(_copy_value(value) for value in values) + '\n'
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', _LineReader(lines()))
+    for obj in objs:
+        obj._state.adding = False
+        obj._state.db = connection.alias
+
+
+def bulk_load(model: Type[models.Model], objs: Sequence[models.Model]):
+    """
+    Insert new instances of a model, like bulk_create without signals.
+
+    On PostgreSQL, rows are streamed with COPY unless IMPORT_USE_COPY is disabled; elsewhere
+    they are inserted in batches of BULK_CREATE_BATCH_SIZE.
+    """
+    if not objs:
+        return
+    if settings.IMPORT_USE_COPY and connection.vendor == 'postgresql':
+        copy_rows(model, objs)
+    else:
+        model.objects.bulk_create(objs, batch_size=BULK_CREATE_BATCH_SIZE)
@@ -1,12 +1,17 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import os
 from pathlib import Path
-from typing import List, Optional as TypingOptional
+from typing import Dict, List, Optional as TypingOptional, Set
 
-import pandas
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
 from rest_framework.exceptions import APIException
 from schema import Optional, Or, Schema, SchemaError, Use
 
 from miqa.core.models import GlobalSettings, Project
+from miqa.core.s3 import get_s3_client
 
 # subjectid and sessionid are for compatibility with PREDICT and other BidS datasets
 
@@ -29,24 +34,106 @@ IMPORT_CSV_COLUMNS = [
     'location_of_interest',
 ]
 
+# threads checking that imported files exist; on network file systems these mostly wait on I/O
+FILE_CHECK_WORKERS = 16
+
+
+def _collect_file_locations(input_dict, file_locations):
+    if not isinstance(input_dict, dict):
+        return
+    for key, value in input_dict.items():
+        if key == 'file_location':
+            file_locations.append(input_dict)
+        else:
+            _collect_file_locations(value, file_locations)
+
+
+def _existing_names(directory: Path, names: Set[str]) -> Set[str]:
+    """Return which of the names exist in a directory, listing it once instead of each name."""
+    found = set()
+    if len(names) > 1:
+        try:
+            with os.scandir(directory) as entries:
+                found = {
+                    entry.name
+                    for entry in entries
+                    if entry.name in names and not entry.is_symlink()
+                }
+        except (FileNotFoundError, NotADirectoryError):
+            return set()
+    # names a listing cannot confirm, like symlinks or '..', are checked one at a time
+    return found | {name for name in names - found if (directory / name).exists()}
+
+
+def _existing_s3_keys(bucket: str, prefix: str, public: bool) -> Set[str]:
+    paginator = get_s3_client(public).get_paginator('list_objects_v2')
+    return {
+        s3_object['Key']
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/')
+        for s3_object in page.get('Contents', [])
+    }
+
 
 def validate_file_locations(input_dict, project, not_found_errors):
     if not isinstance(input_dict, dict):
         return input_dict, not_found_errors
     import_path = GlobalSettings.load().import_path if project is None else project.import_path
-    for key, value in input_dict.items():
-        if key == 'file_location':
-            raw_path = Path(value.strip())
-            if not value.startswith('s3://'):
-                if not raw_path.is_absolute():
-                    # not an absolute file path; refer to project import csv location
-                    raw_path = Path(import_path).parent.parent / raw_path
-                if not raw_path.exists():
-                    not_found_errors.append(f'File not found: {raw_path}')
-            input_dict[key] = str(raw_path) if value and 's3://' not in value else value
+    file_locations = []
+    _collect_file_locations(input_dict, file_locations)
+
+    local_paths = {}
+    s3_paths = {}
+    for location in file_locations:
+        value = location['file_location']
+        raw_path = Path(value.strip())
+        if value.startswith('s3://'):
+            bucket, _, key = value.strip()[5:].partition('/')
+            s3_paths[id(location)] = (bucket, key)
         else:
-            new_value, not_found_errors = validate_file_locations(value, project, not_found_errors)
-            input_dict[key] = new_value
+            if not raw_path.is_absolute():
+                # not an absolute file path; refer to project import csv location
+                raw_path = Path(import_path).parent.parent / raw_path
+            local_paths[id(location)] = raw_path
+        location['file_location'] = str(raw_path) if value and 's3://' not in value else value
+
+    # each directory is checked once, in parallel, since on network file systems every file
+    # system call waits on the network
+    names_by_directory: Dict[Path, Set[str]] = defaultdict(set)
+    for raw_path in local_paths.values():
+        names_by_directory[raw_path.parent].add(raw_path.name)
+    keys_by_prefix: Dict[tuple, Set[str]] = defaultdict(set)
+    if settings.IMPORT_VERIFY_S3_LOCATIONS:
+        for bucket, key in s3_paths.values():
+            keys_by_prefix[(bucket, key[: key.rfind('/') + 1])].add(key)
+    s3_public = project.s3_public if project else False
+    with ThreadPoolExecutor(max_workers=FILE_CHECK_WORKERS) as executor:
+        existing_names = dict(
+            zip(
+                names_by_directory,
+                executor.map(_existing_names, names_by_directory, names_by_directory.values()),
+            )
+        )
+        listings = {
+            prefix: executor.submit(_existing_s3_keys, *prefix, s3_public)
+            for prefix in keys_by_prefix
+        }
+        existing_keys = {}
+        for (bucket, prefix), listing in listings.items():
+            try:
+                existing_keys[(bucket, prefix)] = listing.result()
+            except (BotoCoreError, ClientError) as e:
+                not_found_errors.append(f'Could not list s3://{bucket}/{prefix}: {e}')
+                existing_keys[(bucket, prefix)] = keys_by_prefix[(bucket, prefix)]
+
+    for location in file_locations:
+        if id(location) in local_paths:
+            raw_path = local_paths[id(location)]
+            if raw_path.name not in existing_names[raw_path.parent]:
+                not_found_errors.append(f'File not found: {raw_path}')
+        elif keys_by_prefix:
+            bucket, key = s3_paths[id(location)]
+            if key not in existing_keys[(bucket, key[: key.rfind('/') + 1])]:
+                not_found_errors.append(f'File not found: {location["file_location"]}')
     return input_dict, not_found_errors
 
 
@@ -70,8 +157,8 @@ def validate_import_dict(import_dict, project: TypingOptional[Project]):
                                             'decision': Use(str),
                                             'creator': Or(str, None),
                                             'note': Or(str, None),
-                                            'created': Or(str, None),
-                                            'user_identified_artifacts': Or(str, None),
+                                            'created': Or(str, datetime, None),
+                                            'user_identified_artifacts': Or(str, [str], None),
                                             'location': Or(str, None),
                                         },
                                     ],
@@ -80,8 +167,8 @@ def validate_import_dict(import_dict, project: TypingOptional[Project]):
                                             'decision': Use(str),
                                             'creator': Or(str, None),
                                             'note': Or(str, None),
-                                            'created': Or(str, None),
-                                            'user_identified_artifacts': Or(str, None),
+                                            'created': Or(str, datetime, None),
+                                            'user_identified_artifacts': Or(str, [str], None),
                                             'location': Or(str, None),
                                         },
                                         None,
@@ -110,6 +197,12 @@ def validate_import_dict(import_dict, project: TypingOptional[Project]):
     return import_dict, not_found_errors
 
 
+def _group_starts(df, columns) -> List[int]:
+    """Return the first row of each run of equal values in the columns, and the row count."""
+    changed = df[columns].ne(df[columns].shift()).any(axis=1)
+    return changed.to_numpy().nonzero()[0].tolist() + [len(df)]
+
+
 def import_dataframe_to_dict(df, project):
     df_columns = list(df.columns)
     # The columns after the first 6 are optional
@@ -120,111 +213,117 @@ def import_dataframe_to_dict(df, project):
             'Import file has invalid columns. '
             f'Expected {IMPORT_CSV_COLUMNS}, received {df_columns}.'
         )
+    # sort once, so that every project, experiment and scan is a contiguous block of rows;
+    # a stable sort keeps the frames of a scan in file order
+    group_columns = ['project_name', 'experiment_name', 'scan_name']
+    experiment_notes = {}
+    if 'experiment_notes' in df_columns:
+        # notes come from the first row of an experiment in file order, not in sorted order
+        experiment_notes = (
+            df.groupby(group_columns[:2], sort=False)['experiment_notes'].first().to_dict()
+        )
+    df = df.sort_values(group_columns, kind='stable')
+    columns = {column: df[column].tolist() for column in df_columns}
+    project_starts = _group_starts(df, group_columns[:1])
+    experiment_starts = set(_group_starts(df, group_columns[:2]))
+    scan_starts = _group_starts(df, group_columns)
+    project_ends = dict(zip(project_starts, project_starts[1:]))
+
+    def first(column, row):
+        # the values of a scan or experiment are taken from its first row
+        return columns[column][row] if column in columns else None
+
     ingest_dict = {'projects': {}}
-    for project_name, project_df in df.groupby('project_name'):
-        if project and project_name != project.name:
+    experiment_dict = project_dict = None
+    skip_project = False
+    for scan_start, scan_end in zip(scan_starts, scan_starts[1:]):
+        if scan_start in project_ends:
+            project_name = columns['project_name'][scan_start]
+            if project and project_name != project.name:
+                raise APIException(
+                    f'Import file contains rows for project "{project_name}, " \
+                    which does not match "{project.name}." Import failed.'
+                )
+            project_dict = {'experiments': {}}
+            ingest_dict['projects'][project_name] = project_dict
+            # empty experiment names sort first, so the last row tells if all of them are empty
+            skip_project = columns['experiment_name'][project_ends[scan_start] - 1] == ''
+        if skip_project:
+            continue
+        if scan_start in experiment_starts:
+            experiment_dict = {'scans': {}}
+            experiment_key = (project_name, columns['experiment_name'][scan_start])
+            if experiment_key in experiment_notes:
+                experiment_dict['notes'] = experiment_notes[experiment_key]
+            project_dict['experiments'][experiment_key[1]] = experiment_dict
+        file_locations = columns['file_location'][scan_start:scan_end]
+        if not any(file_locations):
+            continue
+        try:
+            frames = {
+                int(frame_number): {'file_location': file_location}
+                for frame_number, file_location in zip(
+                    columns['frame_number'][scan_start:scan_end], file_locations
+                )
+            }
+        except ValueError as e:
             raise APIException(
-                f'Import file contains rows for project "{project_name}, " \
-                which does not match "{project.name}." Import failed.'
+                f'Invalid frame number {str(e).split(":")[-1]}. Must be an integer value.'
             )
-        project_dict = {'experiments': {}}
-        if list(project_df['experiment_name'].unique()) != ['']:
-            for experiment_name, experiment_df in project_df.groupby('experiment_name'):
-                experiment_dict = {'scans': {}}
-                if 'experiment_notes' in experiment_df.columns:
-                    experiment_dict['notes'] = experiment_df['experiment_notes'].iloc[0]
-                for scan_name, scan_df in experiment_df.groupby('scan_name'):
-                    scan_dict = {}
-                    if list(scan_df['file_location'].unique()) != ['']:
-                        try:
-                            scan_dict = {
-                                'type': scan_df['scan_type'].iloc[0],
-                                'frames': {
-                                    int(row[1]['frame_number']): {
-                                        'file_location': row[1]['file_location']
-                                    }
-                                    for row in scan_df.iterrows()
-                                },
-                                'decisions': [],
-                            }
-                        except ValueError as e:
-                            raise APIException(
-                                f'Invalid frame number {str(e).split(":")[-1]}.'
-                                f' Must be an integer value.'
-                            )
-                        if 'subject_id' in scan_df.columns:
-                            scan_dict['subject_id'] = scan_df['subject_id'].iloc[0]
-                        if 'session_id' in scan_df.columns:
-                            scan_dict['session_id'] = scan_df['session_id'].iloc[0]
-                        if 'scan_link' in scan_df.columns:
-                            scan_dict['scan_link'] = scan_df['scan_link'].iloc[0]
-                        if 'last_decision' in scan_df.columns and scan_df['last_decision'].iloc[0]:
-                            decision_dict = {
-                                'decision': scan_df['last_decision'].iloc[0],
-                                'creator': scan_df['last_decision_creator'].iloc[0],
-                                'note': scan_df['last_decision_note'].iloc[0],
-                                'created': str(scan_df['last_decision_created'].iloc[0])
-                                if scan_df['last_decision_created'].iloc[0]
-                                else None,
-                                'user_identified_artifacts': scan_df['identified_artifacts'].iloc[0]
-                                or None,
-                                'location': scan_df['location_of_interest'].iloc[0] or None,
-                            }
-                            decision_dict = {k: (v or None) for k, v in decision_dict.items()}
-                            scan_dict['decisions'].append(decision_dict)
-
-                        # added for BIDS import
-                        if 'subject_ID' in scan_df.columns:
-                            scan_dict['subject_ID'] = scan_df['subject_ID'].iloc[0]
-                        if 'session_ID' in scan_df.columns:
-                            scan_dict['session_ID'] = scan_df['session_ID'].iloc[0]
-                        # ---- end of BIDS support addition
-
-                        experiment_dict['scans'][scan_name] = scan_dict
-                project_dict['experiments'][experiment_name] = experiment_dict
-        ingest_dict['projects'][project_name] = project_dict
+        scan_dict = {'type': columns['scan_type'][scan_start], 'frames': frames, 'decisions': []}
+        for column in ['subject_id', 'session_id', 'scan_link']:
+            if column in columns:
+                scan_dict[column] = columns[column][scan_start]
+        if first('last_decision', scan_start):
+            decision_dict = {
+                'decision': first('last_decision', scan_start),
+                'creator': first('last_decision_creator', scan_start),
+                'note': first('last_decision_note', scan_start),
+                'created': first('last_decision_created', scan_start),
+                'user_identified_artifacts': first('identified_artifacts', scan_start),
+                'location': first('location_of_interest', scan_start),
+            }
+            scan_dict['decisions'].append({k: (v or None) for k, v in decision_dict.items()})
+        experiment_dict['scans'][columns['scan_name'][scan_start]] = scan_dict
     return ingest_dict
 
 
-def import_dict_to_dataframe(data):
-    row_data = []
-    for project_name, project_data in data.get('projects', {}).items():
-        for experiment_name, experiment_data in project_data.get('experiments', {}).items():
-            for scan_name, scan_data in experiment_data.get('scans', {}).items():
-                for frame_number, frame_data in scan_data.get('frames', {}).items():
-                    row = [
-                        project_name,
-                        experiment_name,
-                        scan_name,
-                        scan_data.get('type', ''),
-                        frame_number,
-                        frame_data.get('file_location', ''),
-                        experiment_data.get('notes', ''),
-                        scan_data.get('subject_id', ''),
-                        scan_data.get('session_id', ''),
-                        scan_data.get('scan_link', ''),
-                    ]
-                    sorted_decisions = sorted(
-                        scan_data.get('decisions', []),
-                        key=lambda d: datetime.strptime(
-                            d['created'].split('+')[0], '%Y-%m-%d %H:%M:%S'
-                        ),
-                        reverse=True,
-                    )
-                    if len(sorted_decisions) > 0:
-                        last_decision_data = sorted_decisions[0]
-                        if last_decision_data:
-                            row += [
-                                last_decision_data.get('decision', ''),
-                                last_decision_data.get('creator', ''),
-                                last_decision_data.get('note', ''),
-                                last_decision_data.get('created', ''),
-                                last_decision_data.get('user_identified_artifacts', ''),
-                                last_decision_data.get('location', ''),
-                            ]
-                        else:
-                            row += ['' for i in range(6)]
-                    else:
-                        row += ['' for i in range(6)]
-                    row_data.append(row)
-    return pandas.DataFrame(row_data, columns=IMPORT_CSV_COLUMNS)
+def _decision_created(decision_data):
+    if not decision_data['created']:
+        return datetime.min
+    return datetime.fromisoformat(decision_data['created'].split('+')[0])
+
+
+def scan_row_values(project_name, experiment_name, experiment_data, scan_name, scan_data):
+    """Return the values shared by every CSV row of a scan, with None for the frame columns."""
+    scan_values = [
+        project_name,
+        experiment_name,
+        scan_name,
+        scan_data.get('type', ''),
+        None,
+        None,
+        experiment_data.get('notes', ''),
+        scan_data.get('subject_id', ''),
+        scan_data.get('session_id', ''),
+        scan_data.get('scan_link', ''),
+    ]
+    # every row of a scan repeats its last decision
+    decisions = scan_data.get('decisions', [])
+    last_decision_data = None
+    if len(decisions) == 1:
+        last_decision_data = decisions[0]
+    elif decisions:
+        last_decision_data = max(decisions, key=_decision_created)
+    if last_decision_data:
+        scan_values += [
+            last_decision_data.get('decision', ''),
+            last_decision_data.get('creator', ''),
+            last_decision_data.get('note', ''),
+            last_decision_data.get('created', ''),
+            last_decision_data.get('user_identified_artifacts', ''),
+            last_decision_data.get('location', ''),
+        ]
+    else:
+        scan_values += ['' for i in range(6)]
+    return scan_values
@@ -0,0 +1,151 @@
+from typing import Iterable, Iterator, List, Optional
+
+import pandas
+from rest_framework.exceptions import APIException
+
+from miqa.core.conversion.import_export_csvs import IMPORT_CSV_COLUMNS
+from miqa.core.models.scan_decision import default_identified_artifacts
+
+# rows of an export written as one Parquet row group; readers can load one row group at a time
+PARQUET_ROW_GROUP_SIZE = 10000
+
+# columns that are required in an import file, which CSV imports read as '' when left empty
+REQUIRED_STRING_COLUMNS = ['project_name', 'experiment_name', 'scan_name', 'scan_type']
+
+
+def _pyarrow():
+    # pyarrow is an optional dependency, only needed for Parquet files
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise APIException(
+            'Parquet files require pyarrow, which is not installed. Install miqa[parquet].'
+        )
+    return pyarrow
+
+
+def parquet_schema():
+    """
+    Return the schema of Parquet imports and exports.
+
+    The columns are those of CSV files, with types instead of strings: repeated names and
+    decision codes are dictionary encoded, the decision creation time is a timestamp, and
+    identified artifacts are a struct of one boolean flag per artifact.
+    """
+    pyarrow = _pyarrow()
+    categorical = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    types = {
+        'project_name': categorical,
+        'experiment_name': categorical,
+        'scan_name': categorical,
+        'scan_type': categorical,
+        'frame_number': pyarrow.int32(),
+        'last_decision': pyarrow.dictionary(pyarrow.int8(), pyarrow.string()),
+        'last_decision_creator': categorical,
+        'last_decision_created': pyarrow.timestamp('us', tz='UTC'),
+        'identified_artifacts': pyarrow.struct(
+            [(artifact, pyarrow.bool_()) for artifact in default_identified_artifacts()]
+        ),
+    }
+    return pyarrow.schema(
+        [
+            pyarrow.field(column, types.get(column, pyarrow.string()), nullable=i >= 6)
+            for i, column in enumerate(IMPORT_CSV_COLUMNS)
+        ]
+    )
+
+
+def _last_decision(decisions: List[dict]) -> Optional[dict]:
+    # like CSV exports, decisions without a creation time only count if no other has one
+    dated = [decision for decision in decisions if decision['created']]
+    if dated:
+        return max(dated, key=lambda decision: decision['created'])
+    return decisions[0] if decisions else None
+
+
+def parquet_scan_rows(
+    project_name, experiment_name, experiment_notes, scan_name, scan_data
+) -> Iterator[list]:
+    """
+    Yield the Parquet row of every frame of a scan.
+
+    Decisions must hold their creation time as a datetime and their identified artifacts as a
+    list of names, rather than the strings of CSV and JSON exports.
+    """
+    decision = _last_decision(scan_data['decisions'])
+    decision_values = [None] * 6
+    if decision:
+        decision_values = [
+            decision['decision'],
+            decision['creator'],
+            decision['note'],
+            decision['created'],
+            {
+                artifact: artifact in decision['user_identified_artifacts']
+                for artifact in default_identified_artifacts()
+            },
+            decision['location'],
+        ]
+    for frame_number, frame_data in scan_data['frames'].items():
+        yield [
+            project_name,
+            experiment_name,
+            scan_name,
+            scan_data['type'],
+            frame_number,
+            frame_data['file_location'],
+            experiment_notes,
+            scan_data['subject_id'],
+            scan_data['session_id'],
+            scan_data['scan_link'],
+        ] + decision_values
+
+
+def write_parquet(path: str, rows: Iterable[list]):
+    """Write rows to a Parquet file, one row group of PARQUET_ROW_GROUP_SIZE rows at a time."""
+    pyarrow = _pyarrow()
+    schema = parquet_schema()
+
+    def write_row_group(writer, row_group):
+        columns = zip(*row_group)
+        arrays = [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)]
+        writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        row_group = []
+        for row in rows:
+            row_group.append(row)
+            if len(row_group) == PARQUET_ROW_GROUP_SIZE:
+                write_row_group(writer, row_group)
+                row_group = []
+        if row_group:
+            write_row_group(writer, row_group)
+
+
+def read_parquet_chunks(source, chunk_size: int) -> Iterator[pandas.DataFrame]:
+    """
+    Yield the rows of a Parquet import file as dataframes of at most chunk_size rows.
+
+    The file is read one row group at a time. Values keep their types, so the dataframes can be
+    converted with import_dataframe_to_dict without parsing strings: decision creation times
+    are datetimes and identified artifacts are lists of names.
+    """
+    pyarrow = _pyarrow()
+    try:
+        parquet_file = pyarrow.parquet.ParquetFile(source)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            columns = {}
+            for name, array in zip(batch.schema.names, batch.columns):
+                values = array.to_pylist()
+                if name in REQUIRED_STRING_COLUMNS:
+                    values = ['' if value is None else value for value in values]
+                elif name == 'identified_artifacts':
+                    values = [
+                        [artifact for artifact, flag in flags.items() if flag] if flags else None
+                        for flags in values
+                    ]
+                columns[name] = values
+            yield pandas.DataFrame(columns, columns=batch.schema.names, dtype=object)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+        raise APIException(f'Invalid Parquet import file. {e}')
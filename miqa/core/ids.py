@@ -0,0 +1,37 @@
+import os
+import threading
+import time
+from uuid import UUID
+
+_lock = threading.Lock()
+_last_timestamp = 0
+_last_counter = 0
+
+
+def uuid7() -> UUID:
+    """
+    Return a UUID that sorts after those generated before it, in the layout of UUID version 7.
+
+    The first 48 bits are the Unix time in milliseconds and the following 12 bits count the
+    UUIDs generated in the same millisecond, so that rows inserted together are appended to the
+    end of primary key indexes rather than spread across them; the remaining 62 bits are random.
+    """
+    global _last_timestamp, _last_counter
+
+    with _lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp <= _last_timestamp:
+            # the counter is exhausted, or the clock went backwards
+            if _last_counter == 0xFFF:
+                _last_timestamp += 1
+                _last_counter = 0
+            else:
+                _last_counter += 1
+        else:
+            _last_timestamp = timestamp
+            # the counter starts in its lower half, leaving room for UUIDs in the same millisecond
+            _last_counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        timestamp, counter = _last_timestamp, _last_counter
+
+    random = int.from_bytes(os.urandom(8), 'big') & 0x3FFF_FFFF_FFFF_FFFF
+    return UUID(int=timestamp << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | random)
@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models import Subquery
+import djclick as click
+
+from miqa.core.models import Project, ProjectStatistics, Scan
+from miqa.core.models.project import latest_decisions
+
+
+def stale_scan_count(project: Project) -> int:
+    tier_2_reviewer_ids = project.get_tier_2_reviewer_ids()
+    scans = (
+        Scan.objects.filter(experiment__project=project)
+        .annotate(
+            expected_decision_id=Subquery(latest_decisions().values('id')[:1]),
+            expected_decision=Subquery(latest_decisions().values('decision')[:1]),
+            expected_creator_id=Subquery(latest_decisions().values('creator_id')[:1]),
+        )
+        .values_list(
+            'latest_decision_id',
+            'review_state',
+            'expected_decision_id',
+            'expected_decision',
+            'expected_creator_id',
+        )
+    )
+    stale = 0
+    for (
+        decision_id,
+        review_state,
+        expected_id,
+        expected_decision,
+        expected_creator_id,
+    ) in scans.iterator():
+        if expected_id is None:
+            expected_state = 'unreviewed'
+        elif expected_decision == 'U' or expected_creator_id in tier_2_reviewer_ids:
+            expected_state = 'complete'
+        else:
+            expected_state = 'needs tier 2 review'
+        stale += decision_id != expected_id or review_state != expected_state
+    return stale
+
+
+def stale_statistics(project: Project) -> list:
+    expected = ProjectStatistics.compute(project.id)
+    statistics = ProjectStatistics.objects.filter(project=project).values(*expected).first()
+    if statistics is None:
+        return list(expected)
+    return [counter for counter, count in expected.items() if statistics[counter] != count]
+
+
+# recompute the latest decision and review state denormalized on every scan, and the
+# statistics of every project, after changes they do not follow such as superuser status
+@click.option(
+    '--verify',
+    is_flag=True,
+    help='only report scans and project statistics that are out of date',
+)
+@click.command()
+def command(verify):
+    total_stale = 0
+    for project in Project.objects.order_by('name'):
+        if verify:
+            stale = stale_scan_count(project)
+            total_stale += stale
+            click.echo(f'{project.name}: {stale} scans out of date')
+            counters = stale_statistics(project)
+            if counters:
+                total_stale += 1
+                click.echo(f'{project.name}: statistics out of date ({", ".join(counters)})')
+        else:
+            with transaction.atomic():
+                project.update_review_states()
+            click.echo(f'{project.name}: review states and statistics updated')
+    if total_stale:
+        raise click.ClickException(f'{total_stale} scans or project statistics are out of date.')
@@ -0,0 +1,93 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:12
+
+import uuid
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0035_allow_null_decision_creation_times'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportExportJob',
+            fields=[
+                (
+                    'created',
+                    django_extensions.db.fields.CreationDateTimeField(
+                        auto_now_add=True, verbose_name='created'
+                    ),
+                ),
+                (
+                    'modified',
+                    django_extensions.db.fields.ModificationDateTimeField(
+                        auto_now=True, verbose_name='modified'
+                    ),
+                ),
+                (
+                    'id',
+                    models.UUIDField(
+                        default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    'kind',
+                    models.CharField(
+                        choices=[('import', 'Import'), ('export', 'Export')], max_length=6
+                    ),
+                ),
+                ('incremental', models.BooleanField(default=False)),
+                (
+                    'phase',
+                    models.CharField(
+                        choices=[
+                            ('queued', 'Queued'),
+                            ('download', 'Download'),
+                            ('parse', 'Parse'),
+                            ('validate', 'Validate'),
+                            ('write', 'Write'),
+                            ('enqueue_evaluation', 'Enqueue evaluation'),
+                            ('done', 'Done'),
+                            ('failed', 'Failed'),
+                        ],
+                        default='queued',
+                        max_length=20,
+                    ),
+                ),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('warnings', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                (
+                    'creator',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    'project',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='import_export_jobs',
+                        to='core.project',
+                    ),
+                ),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0036_import_export_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='delta_export_sequence',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='delta_export_watermark',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+
+def backfill_review_states(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor):
+    # as Project.update_review_states, with tier 2 reviewers read from guardian permissions
+    ContentType = apps.get_model('contenttypes', 'ContentType')  # noqa: N806
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')  # noqa: N806
+    User = apps.get_model(settings.AUTH_USER_MODEL)  # noqa: N806
+    Project = apps.get_model('core', 'Project')  # noqa: N806
+    Scan = apps.get_model('core', 'Scan')  # noqa: N806
+    ScanDecision = apps.get_model('core', 'ScanDecision')  # noqa: N806
+
+    # decisions without a creation time count as the oldest of their scan
+    latest_decisions = ScanDecision.objects.filter(scan=models.OuterRef('id')).order_by(
+        models.F('created').desc(nulls_last=True)
+    )
+    Scan.objects.update(latest_decision=models.Subquery(latest_decisions.values('id')[:1]))
+
+    superuser_ids = set(
+        User.objects.filter(is_active=True, is_superuser=True).values_list('id', flat=True)
+    )
+    content_type = ContentType.objects.filter(app_label='core', model='project').first()
+    for project_id in Project.objects.values_list('id', flat=True):
+        tier_2_reviewer_ids = set(superuser_ids)
+        if content_type is not None:
+            tier_2_reviewer_ids.update(
+                UserObjectPermission.objects.filter(
+                    content_type=content_type,
+                    object_pk=str(project_id),
+                    permission__codename='tier_2_reviewer',
+                    user__is_active=True,
+                ).values_list('user_id', flat=True)
+            )
+        # scans without decisions keep the default state, unreviewed
+        scans = Scan.objects.filter(
+            experiment__project_id=project_id, latest_decision__isnull=False
+        )
+        complete = models.Q(latest_decision__decision='U') | models.Q(
+            latest_decision__creator_id__in=tier_2_reviewer_ids
+        )
+        scans.filter(complete).update(review_state='complete')
+        scans.exclude(complete).update(review_state='needs tier 2 review')
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # check the deferred constraints of the updated rows now, as the index of latest_decision
+        # cannot be created on a table with pending constraint checks
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        schema_editor.execute('SET CONSTRAINTS ALL DEFERRED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('guardian', '0001_initial'),
+        ('core', '0037_project_delta_export'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scan',
+            name='latest_decision',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='+',
+                to='core.scandecision',
+            ),
+        ),
+        migrations.AddField(
+            model_name='scan',
+            name='review_state',
+            field=models.CharField(
+                choices=[
+                    ('unreviewed', 'Unreviewed'),
+                    ('needs tier 2 review', 'Needs tier 2 review'),
+                    ('complete', 'Complete'),
+                ],
+                default='unreviewed',
+                max_length=20,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='scan',
+            index=models.Index(
+                fields=['experiment', 'review_state'], name='core_scan_experim_5ae8fb_idx'
+            ),
+        ),
+        migrations.RunPython(backfill_review_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:38
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+# the counter of scans in each review state, as in miqa.core.models.project_statistics
+REVIEW_STATE_COUNTERS = {
+    'unreviewed': 'unreviewed_scans',
+    'needs tier 2 review': 'needs_tier_2_review_scans',
+    'complete': 'complete_scans',
+}
+
+
+def create_project_statistics(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor):
+    Project = apps.get_model('core', 'Project')  # noqa: N806
+    Scan = apps.get_model('core', 'Scan')  # noqa: N806
+    Frame = apps.get_model('core', 'Frame')  # noqa: N806
+    ProjectStatistics = apps.get_model('core', 'ProjectStatistics')  # noqa: N806
+
+    statistics = []
+    for project_id in Project.objects.values_list('id', flat=True):
+        counters = Scan.objects.filter(experiment__project_id=project_id).aggregate(
+            total_scans=models.Count('id'),
+            **{
+                counter: models.Count('id', filter=models.Q(review_state=review_state))
+                for review_state, counter in REVIEW_STATE_COUNTERS.items()
+            },
+        )
+        counters.update(
+            Frame.objects.filter(scan__experiment__project_id=project_id).aggregate(
+                total_frames=models.Count('id'),
+                evaluated_frames=models.Count('frame_evaluation'),
+            )
+        )
+        statistics.append(ProjectStatistics(project_id=project_id, **counters))
+    ProjectStatistics.objects.bulk_create(statistics)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0038_scan_review_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectStatistics',
+            fields=[
+                (
+                    'project',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='statistics',
+                        serialize=False,
+                        to='core.project',
+                    ),
+                ),
+                ('total_scans', models.IntegerField(default=0)),
+                ('complete_scans', models.IntegerField(default=0)),
+                ('needs_tier_2_review_scans', models.IntegerField(default=0)),
+                ('unreviewed_scans', models.IntegerField(default=0)),
+                ('total_frames', models.IntegerField(default=0)),
+                ('evaluated_frames', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_project_statistics, migrations.RunPython.noop),
+    ]
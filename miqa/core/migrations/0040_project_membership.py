@@ -0,0 +1,93 @@
+# Generated by Django 3.2.25 on 2026-10-18 07:54
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+import django.db.models.deletion
+
+# the roles a user can have in a project, lowest first
+PROJECT_ROLES = ['collaborator', 'tier_1_reviewer', 'tier_2_reviewer']
+
+
+def create_memberships(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')  # noqa: N806
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')  # noqa: N806
+    Project = apps.get_model('core', 'Project')  # noqa: N806
+    ProjectMembership = apps.get_model('core', 'ProjectMembership')  # noqa: N806
+
+    content_type = ContentType.objects.filter(app_label='core', model='project').first()
+    if content_type is None:
+        return
+    project_ids = {str(project_id) for project_id in Project.objects.values_list('id', flat=True)}
+    roles = {}
+    for project_id, user_id, codename in UserObjectPermission.objects.filter(
+        content_type=content_type, permission__codename__in=PROJECT_ROLES
+    ).values_list('object_pk', 'user_id', 'permission__codename'):
+        if project_id not in project_ids:
+            continue
+        role = roles.get((project_id, user_id))
+        if role is None or PROJECT_ROLES.index(codename) > PROJECT_ROLES.index(role):
+            roles[(project_id, user_id)] = codename
+    ProjectMembership.objects.bulk_create(
+        ProjectMembership(project_id=project_id, user_id=user_id, role=role)
+        for (project_id, user_id), role in roles.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('guardian', '0001_initial'),
+        ('core', '0039_project_statistics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectMembership',
+            fields=[
+                (
+                    'id',
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'role',
+                    models.CharField(
+                        choices=[
+                            ('collaborator', 'Collaborator'),
+                            ('tier_1_reviewer', 'Tier 1 Reviewer'),
+                            ('tier_2_reviewer', 'Tier 2 Reviewer'),
+                        ],
+                        max_length=15,
+                    ),
+                ),
+                (
+                    'project',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='memberships',
+                        to='core.project',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='project_memberships',
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='projectmembership',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'project'), name='unique_project_membership'
+            ),
+        ),
+        migrations.RunPython(create_memberships, migrations.RunPython.noop),
+    ]
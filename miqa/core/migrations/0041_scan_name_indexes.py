@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_project_membership'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='scan',
+            index=models.Index(fields=['experiment', 'name'], name='core_scan_experim_c9c8d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scan',
+            index=models.Index(fields=['name'], name='core_scan_name_fc51ee_idx'),
+        ),
+    ]
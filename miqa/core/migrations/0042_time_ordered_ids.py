@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 08:06
+
+from django.db import migrations, models
+
+import miqa.core.ids
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_scan_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='evaluation',
+            name='id',
+            field=models.UUIDField(
+                default=miqa.core.ids.uuid7, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name='experiment',
+            name='id',
+            field=models.UUIDField(
+                default=miqa.core.ids.uuid7, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name='frame',
+            name='id',
+            field=models.UUIDField(
+                default=miqa.core.ids.uuid7, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name='scan',
+            name='id',
+            field=models.UUIDField(
+                default=miqa.core.ids.uuid7, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name='scandecision',
+            name='id',
+            field=models.UUIDField(
+                default=miqa.core.ids.uuid7, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+    ]
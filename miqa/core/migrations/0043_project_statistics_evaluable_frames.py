@@ -0,0 +1,35 @@
+# Generated by Django 3.2.25 on 2026-10-18 09:10
+
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.migrations.state import StateApps
+
+
+def count_evaluable_frames(apps: StateApps, schema_editor: BaseDatabaseSchemaEditor):
+    Project = apps.get_model('core', 'Project')  # noqa: N806
+    Frame = apps.get_model('core', 'Frame')  # noqa: N806
+    ProjectStatistics = apps.get_model('core', 'ProjectStatistics')  # noqa: N806
+
+    for project_id, evaluation_models in Project.objects.values_list('id', 'evaluation_models'):
+        scan_types = [scan_type for scan_type, model in evaluation_models.items() if model]
+        ProjectStatistics.objects.filter(project_id=project_id).update(
+            evaluable_frames=Frame.objects.filter(
+                scan__experiment__project_id=project_id, scan__scan_type__in=scan_types
+            ).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_time_ordered_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='projectstatistics',
+            name='evaluable_frames',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_evaluable_frames, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,10 @@ from .evaluation import Evaluation
 from .experiment import Experiment
 from .frame import Frame
 from .global_settings import GlobalSettings
+from .import_export_job import ImportExportJob
 from .project import Project
+from .project_membership import ProjectMembership
+from .project_statistics import ProjectStatistics
 from .scan import Scan
 from .scan_decision import ScanDecision
 
@@ -11,7 +14,10 @@ __all__ = [
     'Experiment',
     'Frame',
     'GlobalSettings',
+    'ImportExportJob',
     'Project',
+    'ProjectMembership',
+    'ProjectStatistics',
     'Scan',
     'ScanDecision',
 ]
@@ -1,10 +1,10 @@
-from uuid import uuid4
-
 from django.db import models
 
+from miqa.core.ids import uuid7
+
 
 class Evaluation(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     frame = models.OneToOneField(
         'Frame',
         on_delete=models.CASCADE,
@@ -1,9 +1,9 @@
-from uuid import uuid4
-
 from django.contrib.auth.models import User
 from django.db import models
 from django_extensions.db.models import TimeStampedModel
 
+from miqa.core.ids import uuid7
+
 
 class Experiment(TimeStampedModel, models.Model):
     class Meta:
@@ -15,7 +15,7 @@ class Experiment(TimeStampedModel, models.Model):
         ]
         ordering = ['name']
 
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=255, blank=False)
     note = models.TextField(max_length=3000, blank=True)
     project = models.ForeignKey('Project', related_name='experiments', on_delete=models.CASCADE)
@@ -3,9 +3,7 @@ from __future__ import annotations
 from enum import Enum
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional
-from uuid import uuid4
 
-import boto3
 from django.conf import settings
 from django.db import models
 from django.db.models.signals import pre_delete
@@ -14,6 +12,8 @@ from django_extensions.db.models import TimeStampedModel
 from s3_file_field.fields import S3FileField
 
 from miqa.core.conversion.nifti_to_zarr_ngff import convert_to_store_path
+from miqa.core.ids import uuid7
+from miqa.core.s3 import S3Location, presigned_urls, split_s3_path
 
 if TYPE_CHECKING:
     from miqa.core.models import Experiment
@@ -30,7 +30,7 @@ class Frame(TimeStampedModel, models.Model):
         indexes = [models.Index(fields=['scan', 'frame_number'])]
         ordering = ['scan', 'frame_number']
 
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     scan = models.ForeignKey('Scan', related_name='frames', on_delete=models.CASCADE)
     content = S3FileField(null=True)
     raw_path = models.CharField(max_length=500, blank=False)
@@ -62,13 +62,16 @@ class Frame(TimeStampedModel, models.Model):
         return StorageMode.LOCAL_PATH
 
     @property
-    def s3_download_url(self) -> Optional[str]:
+    def s3_location(self) -> Optional[S3Location]:
         if self.storage_mode == StorageMode.S3_PATH:
-            bucket, key = self.raw_path.strip()[5:].split('/', maxsplit=1)
-            client = boto3.client('s3')
-            return client.generate_presigned_url(
-                'get_object', Params={'Bucket': bucket, 'Key': key}
-            )
+            return split_s3_path(self.raw_path)
+        return None
+
+    @property
+    def s3_download_url(self) -> Optional[str]:
+        location = self.s3_location
+        if location:
+            return presigned_urls.get(*location)
         return None
 
 
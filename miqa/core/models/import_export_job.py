@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from typing import Optional
+from uuid import uuid4
+
+from django.contrib.auth.models import User
+from django.db import models
+from django.utils import timezone
+from django_extensions.db.models import TimeStampedModel
+
+JOB_KIND_CHOICES = [
+    ('import', 'Import'),
+    ('export', 'Export'),
+]
+
+JOB_PHASE_CHOICES = [
+    ('queued', 'Queued'),
+    ('download', 'Download'),
+    ('parse', 'Parse'),
+    ('validate', 'Validate'),
+    ('write', 'Write'),
+    ('enqueue_evaluation', 'Enqueue evaluation'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
+# the database alias progress is written to, outside the transaction of the job
+PROGRESS_DATABASE = 'job_progress'
+
+
+class ImportExportJob(TimeStampedModel, models.Model):
+    """An import or export running in a celery worker, polled by the client for progress."""
+
+    class Meta:
+        ordering = ['-created']
+
+    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    kind = models.CharField(max_length=6, choices=JOB_KIND_CHOICES)
+    # null for global imports and exports
+    project = models.ForeignKey(
+        'Project',
+        related_name='import_export_jobs',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
+    creator = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    # an incremental import, or a delta export
+    incremental = models.BooleanField(default=False)
+    phase = models.CharField(max_length=20, choices=JOB_PHASE_CHOICES, default='queued')
+    rows_processed = models.PositiveIntegerField(default=0)
+    # warnings that did not stop the job, like import files that were not found
+    warnings = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if not self.started:
+            return None
+        return ((self.finished or timezone.now()) - self.started).total_seconds()
+
+    def update_progress(self, phase: Optional[str] = None, rows_processed: Optional[int] = None):
+        """
+        Save the progress of the job on a connection of its own.
+
+        Imports run in a single transaction, which would otherwise hide their progress from the
+        clients polling it until they commit.
+        """
+        if phase is not None:
+            self.phase = phase
+        if rows_processed is not None:
+            self.rows_processed = rows_processed
+        self.modified = timezone.now()
+        ImportExportJob.objects.using(PROGRESS_DATABASE).filter(id=self.id).update(
+            phase=self.phase, rows_processed=self.rows_processed, modified=self.modified
+        )
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional, Set
 from uuid import uuid4
 
 from django.apps import apps
@@ -6,8 +7,11 @@ from django.core.exceptions import ValidationError
 from django.db import models
 from django.dispatch import receiver
 from django_extensions.db.models import TimeStampedModel
-from guardian.shortcuts import assign_perm, get_perms, get_users_with_perms, remove_perm
+from guardian.shortcuts import assign_perm, get_users_with_perms, remove_perm
 
+from miqa.core.models.frame import Frame
+from miqa.core.models.project_membership import PROJECT_ROLES, ProjectMembership
+from miqa.core.models.project_statistics import REVIEW_STATE_COUNTERS, ProjectStatistics
 from miqa.core.models.scan import SCAN_TYPES, Scan
 from miqa.core.models.scan_decision import ScanDecision
 
@@ -32,6 +36,14 @@ def default_evaluation_model_mapping():
     }
 
 
+def latest_decisions() -> models.QuerySet:
+    """Return the decisions of the scan of an outer query, latest first."""
+    # decisions without a creation time count as the oldest of their scan
+    return ScanDecision.objects.filter(scan=models.OuterRef('id')).order_by(
+        models.F('created').desc(nulls_last=True)
+    )
+
+
 class AnatomyOrientation(models.TextChoices):
     LPS = 'LPS'
     RAS = 'RAS'
@@ -54,6 +66,9 @@ class Project(TimeStampedModel, models.Model):
     )
     evaluation_models = models.JSONField(default=default_evaluation_model_mapping)
     default_email_recipients = models.TextField(blank=True)
+    # the start of the last delta export, and the number of its delta file
+    delta_export_watermark = models.DateTimeField(null=True, blank=True)
+    delta_export_sequence = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -81,45 +96,117 @@ class Project(TimeStampedModel, models.Model):
         super().clean()
 
     def get_read_permission_groups(self):
-        return ['collaborator', 'tier_1_reviewer', 'tier_2_reviewer']
+        return list(PROJECT_ROLES)
 
     def get_review_permission_groups(self):
         return ['tier_1_reviewer', 'tier_2_reviewer']
 
-    def get_user_role(self, user):
-        perm_order = self.get_read_permission_groups()
-        return sorted(
-            get_perms(user, self),
-            key=lambda perm: perm_order.index(perm) if perm in perm_order else -1,
-        )[-1]
+    def get_user_role(self, user) -> Optional[str]:
+        if not user.is_active:
+            return None
+        if user.is_superuser:
+            return 'tier_2_reviewer'
+        return ProjectMembership.role_of(user, self.id)
+
+    def get_tier_2_reviewer_ids(self) -> Set[int]:
+        # the users get_user_role ranks as tier 2 reviewers. Review states follow changes of
+        # membership, but not of is_superuser or is_active; run backfill_review_states after those.
+        return set(
+            User.objects.filter(is_active=True)
+            .filter(
+                models.Q(is_superuser=True)
+                | models.Q(
+                    project_memberships__project=self, project_memberships__role='tier_2_reviewer'
+                )
+            )
+            .values_list('id', flat=True)
+        )
+
+    def update_review_states(self, scans: Optional[models.QuerySet] = None):
+        """
+        Point scans of this project at their latest decision and recompute their review state.
+
+        All scans of the project are updated by default. The project statistics are adjusted by
+        the number of scans that changed state.
+        """
+        update_all = scans is None
+        if update_all:
+            scans = Scan.objects.filter(experiment__project=self)
+        else:
+            states_before = self._count_review_states(scans)
+        scans.update(latest_decision=models.Subquery(latest_decisions().values('id')[:1]))
+        complete = models.Q(latest_decision__decision='U') | models.Q(
+            latest_decision__creator_id__in=self.get_tier_2_reviewer_ids()
+        )
+        scans.filter(latest_decision__isnull=True).update(review_state='unreviewed')
+        scans.filter(complete).update(review_state='complete')
+        scans.filter(latest_decision__isnull=False).exclude(complete).update(
+            review_state='needs tier 2 review'
+        )
+
+        if update_all:
+            ProjectStatistics.refresh(self.id)
+        else:
+            states_after = self._count_review_states(scans)
+            ProjectStatistics.adjust(
+                self.id,
+                **{
+                    counter: states_after.get(state, 0) - states_before.get(state, 0)
+                    for state, counter in REVIEW_STATE_COUNTERS.items()
+                },
+            )
+
+    def update_reviewer_review_states(self, user_id):
+        """Recompute the review states of the scans a user made the latest decision on."""
+        self.update_review_states(
+            Scan.objects.filter(experiment__project=self, latest_decision__creator_id=user_id)
+        )
+
+    @staticmethod
+    def _count_review_states(scans: models.QuerySet) -> Dict[str, int]:
+        return dict(
+            scans.order_by()
+            .values('review_state')
+            .annotate(count=models.Count('id'))
+            .values_list('review_state', 'count')
+        )
 
     def get_status(self):
-        tier_2_reviewers = [
-            user.id for user in get_users_with_perms(self, only_with_perms_in=['tier_2_reviewer'])
-        ]
-        scans_in_project = Scan.objects.filter(experiment__project=self)
-        completed_scans_in_project = scans_in_project.alias(
-            latest_decider_id=models.Subquery(
-                ScanDecision.objects.filter(scan__id=models.OuterRef('id'))
-                .order_by('-created')
-                .values('creator_id')[:1]
-            ),
-            latest_decision=models.Subquery(
-                ScanDecision.objects.filter(scan__id=models.OuterRef('id'))
-                .order_by('-created')
-                .values('decision')[:1]
-            ),
-        ).filter(models.Q(latest_decider_id__in=tier_2_reviewers) | models.Q(latest_decision='U'))
+        statistics = self.statistics
+        return {
+            'total_scans': statistics.total_scans,
+            'total_complete': statistics.complete_scans,
+            'total_needs_tier_2_review': statistics.needs_tier_2_review_scans,
+            'total_unreviewed': statistics.unreviewed_scans,
+            'evaluated_frames': statistics.evaluated_frames,
+            'pending_evaluations': statistics.pending_evaluations,
+        }
 
+    def get_evaluated_scan_types(self) -> List[str]:
+        # frames of other scan types are never queued for evaluation
+        return [scan_type for scan_type, model in self.evaluation_models.items() if model]
+
+    def get_evaluation_progress(self):
+        evaluated_scan_type = models.Q(scan__scan_type__in=self.get_evaluated_scan_types())
+        counts = Frame.objects.filter(scan__experiment__project=self).aggregate(
+            total_frames=models.Count('id'),
+            evaluated_frames=models.Count('frame_evaluation'),
+            evaluable_frames=models.Count('id', filter=evaluated_scan_type),
+            evaluated_evaluable_frames=models.Count('frame_evaluation', filter=evaluated_scan_type),
+        )
         return {
-            'total_scans': scans_in_project.count(),
-            'total_complete': completed_scans_in_project.count(),
+            'total_frames': counts['total_frames'],
+            'evaluated_frames': counts['evaluated_frames'],
+            'pending_frames': counts['evaluable_frames'] - counts['evaluated_evaluable_frames'],
+            'skipped_frames': counts['total_frames'] - counts['evaluable_frames'],
         }
 
     def update_group(self, group_name, user_list):
         if group_name not in self.get_read_permission_groups():
             raise ValueError(f'Error: {group_name} is not a valid group on this Project.')
 
+        # memberships, and the review states decided by tier 2 reviewers, follow the permissions
+        # assigned and removed here; see ProjectMembership
         old_list = get_users_with_perms(self, only_with_perms_in=[group_name])
         for previously_permitted_user in old_list:
             if previously_permitted_user.username not in user_list:
@@ -145,6 +232,12 @@ class Project(TimeStampedModel, models.Model):
         )
 
 
+@receiver(models.signals.post_save, sender=Project)
+def create_statistics(sender, instance, created, *args, **kwargs):
+    if created:
+        ProjectStatistics.objects.get_or_create(project_id=instance.id)
+
+
 @receiver(models.signals.post_delete, sender=Project)
 def delete_objects(sender, instance, *args, **kwargs):
     from miqa.core import models
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+from uuid import UUID
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from guardian.models import UserObjectPermission
+
+# the roles a user can have in a project, lowest first
+PROJECT_ROLE_CHOICES = [
+    ('collaborator', 'Collaborator'),
+    ('tier_1_reviewer', 'Tier 1 Reviewer'),
+    ('tier_2_reviewer', 'Tier 2 Reviewer'),
+]
+PROJECT_ROLES = [role for role, _ in PROJECT_ROLE_CHOICES]
+
+
+class ProjectMembership(models.Model):
+    """
+    The highest role of a user in a project, mirrored from their guardian object permissions.
+
+    Permissions are still assigned through guardian; this table answers the permission checks
+    of every request with one indexed lookup rather than guardian's generic queries.
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'project'], name='unique_project_membership')
+        ]
+
+    project = models.ForeignKey('Project', related_name='memberships', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, related_name='project_memberships', on_delete=models.CASCADE)
+    role = models.CharField(max_length=15, choices=PROJECT_ROLE_CHOICES)
+
+    @classmethod
+    def sync(cls, project_id, user_id, create: bool = True):
+        """
+        Update the membership of a user from their permissions on a project.
+
+        Memberships are only created when create is set, so that removing the permissions of a
+        user that is being deleted does not add memberships back. When the user becomes or stops
+        being a tier 2 reviewer, the review states of the scans they decided last are recomputed.
+        """
+        role_before = (
+            cls.objects.filter(project_id=project_id, user_id=user_id)
+            .values_list('role', flat=True)
+            .first()
+        )
+        codenames = UserObjectPermission.objects.filter(
+            user_id=user_id,
+            content_type=ContentType.objects.get_by_natural_key('core', 'project'),
+            object_pk=str(project_id),
+            permission__codename__in=PROJECT_ROLES,
+        ).values_list('permission__codename', flat=True)
+        if codenames:
+            role = max(codenames, key=PROJECT_ROLES.index)
+            if create:
+                cls.objects.update_or_create(
+                    project_id=project_id, user_id=user_id, defaults={'role': role}
+                )
+            else:
+                cls.objects.filter(project_id=project_id, user_id=user_id).update(role=role)
+        else:
+            role = None
+            cls.objects.filter(project_id=project_id, user_id=user_id).delete()
+
+        if (role_before == 'tier_2_reviewer') != (role == 'tier_2_reviewer'):
+            project = apps.get_model('core', 'Project').objects.filter(id=project_id).first()
+            if project is not None:
+                project.update_reviewer_review_states(user_id)
+
+    @classmethod
+    def roles_of(cls, user: User) -> Dict[UUID, str]:
+        """Return the role of a user in each project they are a member of."""
+        return dict(cls.objects.filter(user=user).values_list('project_id', 'role'))
+
+    @classmethod
+    def role_of(cls, user: User, project_id) -> Optional[str]:
+        return (
+            cls.objects.filter(user=user, project_id=project_id)
+            .values_list('role', flat=True)
+            .first()
+        )
+
+
+def _is_project_permission(instance: UserObjectPermission) -> bool:
+    return instance.content_type_id == ContentType.objects.get_by_natural_key('core', 'project').id
+
+
+@receiver(post_save, sender=UserObjectPermission)
+def sync_assigned_permission(sender, instance, *args, **kwargs):
+    if _is_project_permission(instance):
+        ProjectMembership.sync(instance.object_pk, instance.user_id)
+
+
+@receiver(post_delete, sender=UserObjectPermission)
+def sync_removed_permission(sender, instance, *args, **kwargs):
+    if _is_project_permission(instance):
+        ProjectMembership.sync(instance.object_pk, instance.user_id, create=False)
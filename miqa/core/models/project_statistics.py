@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from django.apps import apps
+from django.db import models
+
+from miqa.core.models.frame import Frame
+from miqa.core.models.scan import Scan
+
+# the counter of scans in each review state
+REVIEW_STATE_COUNTERS = {
+    'unreviewed': 'unreviewed_scans',
+    'needs tier 2 review': 'needs_tier_2_review_scans',
+    'complete': 'complete_scans',
+}
+
+
+class ProjectStatistics(models.Model):
+    """
+    Progress counters of a project, so that listing projects does not count their scans.
+
+    Counters are adjusted as decisions and evaluations are created, and recomputed after
+    imports and deletions.
+    """
+
+    project = models.OneToOneField(
+        'Project', primary_key=True, related_name='statistics', on_delete=models.CASCADE
+    )
+    total_scans = models.IntegerField(default=0)
+    complete_scans = models.IntegerField(default=0)
+    needs_tier_2_review_scans = models.IntegerField(default=0)
+    unreviewed_scans = models.IntegerField(default=0)
+    total_frames = models.IntegerField(default=0)
+    evaluated_frames = models.IntegerField(default=0)
+    # frames of the scan types with an evaluation model, the only ones queued for evaluation
+    evaluable_frames = models.IntegerField(default=0)
+
+    @property
+    def pending_evaluations(self) -> int:
+        # frames evaluated before their scan type lost its evaluation model count as evaluated
+        return max(self.evaluable_frames - self.evaluated_frames, 0)
+
+    @staticmethod
+    def compute(project_id) -> dict:
+        project = apps.get_model('core', 'Project').objects.get(id=project_id)
+        counters = Scan.objects.filter(experiment__project_id=project_id).aggregate(
+            total_scans=models.Count('id'),
+            **{
+                counter: models.Count('id', filter=models.Q(review_state=review_state))
+                for review_state, counter in REVIEW_STATE_COUNTERS.items()
+            },
+        )
+        counters.update(
+            Frame.objects.filter(scan__experiment__project_id=project_id).aggregate(
+                total_frames=models.Count('id'),
+                evaluated_frames=models.Count('frame_evaluation'),
+                evaluable_frames=models.Count(
+                    'id', filter=models.Q(scan__scan_type__in=project.get_evaluated_scan_types())
+                ),
+            )
+        )
+        return counters
+
+    @classmethod
+    def refresh(cls, project_id):
+        cls.objects.update_or_create(project_id=project_id, defaults=cls.compute(project_id))
+
+    @classmethod
+    def adjust(cls, project_id, **deltas: int):
+        deltas = {counter: delta for counter, delta in deltas.items() if delta}
+        if deltas:
+            cls.objects.filter(project_id=project_id).update(
+                **{counter: models.F(counter) + delta for counter, delta in deltas.items()}
+            )
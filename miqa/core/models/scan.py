@@ -1,10 +1,10 @@
 from __future__ import annotations
 
-from uuid import uuid4
-
 from django.db import models
 from django_extensions.db.models import TimeStampedModel
 
+from miqa.core.ids import uuid7
+
 SCAN_TYPES = [
     ('T1', 'T1'),
     ('T2', 'T2'),
@@ -25,15 +25,35 @@ SCAN_TYPES = [
     ('CT', 'CT'),
 ]
 
+# a scan is complete once its latest decision is usable or was made by a tier 2 reviewer
+REVIEW_STATE_CHOICES = [
+    ('unreviewed', 'Unreviewed'),
+    ('needs tier 2 review', 'Needs tier 2 review'),
+    ('complete', 'Complete'),
+]
+
 
 class Scan(TimeStampedModel, models.Model):
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['experiment', 'review_state']),
+            # the keyset pagination of scans, by experiment or across experiments
+            models.Index(fields=['experiment', 'name']),
+            models.Index(fields=['name']),
+        ]
 
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     name = models.CharField(max_length=127, blank=False)
     experiment = models.ForeignKey('Experiment', related_name='scans', on_delete=models.CASCADE)
     scan_type = models.CharField(max_length=25, choices=SCAN_TYPES, default='T1')
     subject_id = models.TextField(max_length=255, null=True)
     session_id = models.TextField(max_length=255, null=True)
     scan_link = models.TextField(max_length=1000, null=True)
+    # denormalized from the scan's decisions by Project.update_review_states
+    latest_decision = models.ForeignKey(
+        'ScanDecision', related_name='+', on_delete=models.SET_NULL, null=True, blank=True
+    )
+    review_state = models.CharField(
+        max_length=20, choices=REVIEW_STATE_CHOICES, default='unreviewed'
+    )
@@ -2,12 +2,13 @@ from __future__ import annotations
 
 from enum import Enum
 from typing import TYPE_CHECKING
-from uuid import uuid4
 
 from django.contrib.auth.models import User
 from django.db import models
 from django.utils import timezone
 
+from miqa.core.ids import uuid7
+
 if TYPE_CHECKING:
     from miqa.core.models import Experiment
 
@@ -55,7 +56,7 @@ class ScanDecision(models.Model):
             models.Index(fields=['scan', '-created']),
         ]
 
-    id = models.UUIDField(primary_key=True, default=uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     created = models.DateTimeField(default=timezone.now, null=True)
     scan = models.ForeignKey('Scan', related_name='decisions', on_delete=models.CASCADE)
     creator = models.ForeignKey(User, on_delete=models.PROTECT, null=True, blank=True)
@@ -4,6 +4,7 @@ from .experiment import ExperimentViewSet
 from .frame import FrameViewSet
 from .global_settings import GlobalSettingsViewSet
 from .home import HomePageView
+from .import_export_job import ImportExportJobViewSet
 from .other_endpoints import MIQAConfigView
 from .project import ProjectViewSet
 from .scan import ScanViewSet
@@ -15,6 +16,7 @@ __all__ = [
     'HomePageView',
     'FrameViewSet',
     'GlobalSettingsViewSet',
+    'ImportExportJobViewSet',
     'AccountActivateView',
     'AccountInactiveView',
     'DemoModeLoginView',
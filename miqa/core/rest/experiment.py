@@ -5,7 +5,6 @@ from django.db import transaction
 from django.utils import timezone
 from django_filters import rest_framework as filters
 from drf_yasg.utils import no_body, swagger_auto_schema
-from guardian.shortcuts import get_objects_for_user, get_perms
 from rest_framework import mixins, serializers, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import APIException
@@ -14,8 +13,13 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from miqa.core.models import Experiment, Project, ScanDecision
-from miqa.core.rest.permissions import project_permission_required
+from miqa.core.models import Experiment, Project, ProjectStatistics, ScanDecision
+from miqa.core.rest.permissions import (
+    get_project_role,
+    project_permission_required,
+    readable_projects,
+)
+from miqa.core.rest.query_plan import QueryPlanMixin
 from miqa.core.rest.scan import ScanSerializer
 
 from .permissions import ArchivedProject, LockContention, UserHoldsExperimentLock
@@ -36,19 +40,29 @@ class DecisionSerializer(serializers.ModelSerializer):
     decision = serializers.ChoiceField(choices=ScanDecision.decision.field.choices)  # type: ignore
 
 
-class ExperimentSerializer(serializers.ModelSerializer):
+class ExperimentSummarySerializer(serializers.ModelSerializer):
+    """An experiment without its scans, which are listed by experiment from the scans endpoint."""
+
     class Meta:
         model = Experiment
-        fields = ['id', 'name', 'lock_owner', 'scans', 'project', 'note']
-        ref_name = 'project_experiment'
+        fields = ['id', 'name', 'lock_owner', 'project', 'note']
+        ref_name = 'project_experiment_summary'
 
-    scans = ScanSerializer(many=True)
     lock_owner = LockOwnerSerializer()
     project = serializers.PrimaryKeyRelatedField(  # type: ignore
         read_only=True, pk_field=UUIDField()
     )
 
 
+class ExperimentSerializer(ExperimentSummarySerializer):
+    class Meta:
+        model = Experiment
+        fields = ['id', 'name', 'lock_owner', 'scans', 'project', 'note']
+        ref_name = 'project_experiment'
+
+    scans = ScanSerializer(many=True)
+
+
 class ExperimentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Experiment
@@ -64,9 +78,24 @@ class ExperimentCreateSerializer(serializers.ModelSerializer):
     )
 
 
-class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.DestroyModelMixin):
+class ExperimentViewSet(
+    QueryPlanMixin,
+    ReadOnlyModelViewSet,
+    mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
+):
     filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ['project']
     serializer_class = ExperimentSerializer
+    select_related = ['lock_owner']
+    action_prefetch_related = {
+        'retrieve': ['scans__frames__frame_evaluation', 'scans__decisions__creator'],
+    }
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ExperimentSummarySerializer
+        return ExperimentSerializer
 
     def get_permissions(self):
         if self.action == 'destroy' or self.action == 'create':
@@ -76,12 +105,12 @@ class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.De
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
-        projects = get_objects_for_user(
-            self.request.user,
-            [f'core.{perm}' for perm in Project().get_read_permission_groups()],
-            any_perm=True,
-        )
-        return Experiment.objects.filter(project__in=projects)
+        projects = readable_projects(self.request.user)
+        return self.plan_queryset(Experiment.objects.filter(project__in=projects))
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        ProjectStatistics.refresh(instance.project_id)
 
     @swagger_auto_schema(
         request_body=ExperimentCreateSerializer(),
@@ -91,7 +120,7 @@ class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.De
         serializer = ExperimentCreateSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         project = Project.objects.get(id=serializer.data['project'])
-        if not get_perms(request.user, project):
+        if not get_project_role(request, project):
             Response(status=status.HTTP_403_FORBIDDEN)
         experiment = Experiment(
             project=project,
@@ -111,7 +140,7 @@ class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.De
         experiment_object.note = request.data['note']
         experiment_object.save()
         return Response(
-            ExperimentSerializer(experiment_object).data, status=status.HTTP_201_CREATED
+            ExperimentSummarySerializer(experiment_object).data, status=status.HTTP_201_CREATED
         )
 
     @swagger_auto_schema(
@@ -153,7 +182,7 @@ class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.De
             experiment.save(update_fields=['lock_owner', 'lock_time'])
 
             return Response(
-                ExperimentSerializer(experiment).data,
+                ExperimentSummarySerializer(experiment).data,
                 status=status.HTTP_200_OK,
             )
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -182,7 +211,7 @@ class ExperimentViewSet(ReadOnlyModelViewSet, mixins.CreateModelMixin, mixins.De
                 experiment.save(update_fields=['lock_owner', 'lock_time'])
 
                 return Response(
-                    ExperimentSerializer(experiment).data,
+                    ExperimentSummarySerializer(experiment).data,
                     status=status.HTTP_200_OK,
                 )
         return Response(status=status.HTTP_204_NO_CONTENT)
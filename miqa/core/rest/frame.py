@@ -2,10 +2,10 @@ from pathlib import Path
 from typing import Optional
 
 from django.core.exceptions import BadRequest
+from django.db import models
 from django.http import FileResponse, HttpResponseServerError
 from django_filters import rest_framework as filters
 from drf_yasg.utils import swagger_auto_schema
-from guardian.shortcuts import get_objects_for_user, get_perms
 from rest_framework import mixins, serializers, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import APIException, ValidationError
@@ -13,9 +13,16 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from miqa.core.models import Evaluation, Experiment, Frame, Project, Scan
+from miqa.core.models import Evaluation, Experiment, Frame, ProjectStatistics, Scan
 from miqa.core.models.frame import StorageMode
-from miqa.core.rest.permissions import project_permission_required
+from miqa.core.rest.pagination import FramePagination
+from miqa.core.rest.permissions import (
+    get_project_role,
+    project_permission_required,
+    readable_projects,
+)
+from miqa.core.rest.query_plan import QueryPlanMixin
+from miqa.core.s3 import presigned_urls
 from miqa.core.tasks import evaluate_frame_content
 
 from .permissions import UserHoldsExperimentLock
@@ -27,7 +34,7 @@ class EvaluationSerializer(serializers.ModelSerializer):
         fields = ['results', 'evaluation_model']
 
 
-class FrameSerializer(serializers.ModelSerializer):
+class FrameSummarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Frame
         fields = [
@@ -35,13 +42,11 @@ class FrameSerializer(serializers.ModelSerializer):
             'frame_number',
             'frame_evaluation',
             'extension',
-            'download_url',
         ]
-        ref_name = 'scan_frame'
+        ref_name = 'scan_frame_summary'
 
     frame_evaluation = EvaluationSerializer()
     extension = serializers.SerializerMethodField('get_extension')
-    download_url = serializers.SerializerMethodField('get_download_url')
 
     def get_extension(self, obj):
         if obj.content:
@@ -50,6 +55,27 @@ class FrameSerializer(serializers.ModelSerializer):
             filename = obj.raw_path
         return ''.join(Path(filename).suffixes)
 
+
+class FrameListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        frames = data.all() if isinstance(data, models.Manager) else data
+        # sign the download URLs of all S3 frames at once; each frame then reads its URL from
+        # the cache
+        presigned_urls.get_many(
+            location for location in (frame.s3_location for frame in frames) if location
+        )
+        return super().to_representation(frames)
+
+
+class FrameSerializer(FrameSummarySerializer):
+    class Meta:
+        model = Frame
+        fields = FrameSummarySerializer.Meta.fields + ['download_url']
+        ref_name = 'scan_frame'
+        list_serializer_class = FrameListSerializer
+
+    download_url = serializers.SerializerMethodField('get_download_url')
+
     def get_download_url(self, obj: Frame) -> Optional[str]:
         if obj.storage_mode == StorageMode.CONTENT_STORAGE:
             return obj.content.url
@@ -90,22 +116,22 @@ class FrameContentSerializer(serializers.ModelSerializer):
 
 
 class FrameViewSet(
+    QueryPlanMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
     GenericViewSet,
 ):
     filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ['scan']
+    pagination_class = FramePagination
     permission_classes = [IsAuthenticated, UserHoldsExperimentLock]
     serializer_class = FrameSerializer
+    select_related = ['frame_evaluation']
 
     def get_queryset(self):
-        projects = get_objects_for_user(
-            self.request.user,
-            [f'core.{perm}' for perm in Project().get_read_permission_groups()],
-            any_perm=True,
-        )
-        return Frame.objects.filter(scan__experiment__project__in=projects)
+        projects = readable_projects(self.request.user)
+        return self.plan_queryset(Frame.objects.filter(scan__experiment__project__in=projects))
 
     @swagger_auto_schema(
         request_body=FrameCreateSerializer(),
@@ -118,16 +144,17 @@ class FrameViewSet(
         if 'experiment' in serializer.data:
             experiment = Experiment.objects.get(id=serializer.data['experiment'])
 
-            if not get_perms(request.user, experiment.project):
+            if not get_project_role(request, experiment.project_id):
                 Response(status=status.HTTP_403_FORBIDDEN)
 
             scan = Scan(name=serializer.data['filename'], experiment=experiment)
             scan.save()
+            ProjectStatistics.adjust(experiment.project_id, total_scans=1, unreviewed_scans=1)
         elif 'scan' in serializer.data:
             scan = Scan.objects.get(id=serializer.data['scan'])
             if not scan:
                 raise ValidationError('Could not create new Frame; Scan not found.')
-            if not get_perms(request.user, scan.experiment.project):
+            if not get_project_role(request, scan.experiment.project_id):
                 Response(status=status.HTTP_403_FORBIDDEN)
         else:
             raise APIException(
@@ -139,6 +166,13 @@ class FrameViewSet(
         content_serializer = FrameContentSerializer(data=dict(request.data, scan=scan.id))
         content_serializer.is_valid(raise_exception=True)
         new_frame = content_serializer.save()
+        ProjectStatistics.adjust(
+            scan.experiment.project_id,
+            total_frames=1,
+            evaluable_frames=int(
+                scan.scan_type in scan.experiment.project.get_evaluated_scan_types()
+            ),
+        )
         evaluate_frame_content.delay(str(new_frame.id))
         return Response(
             FrameSerializer(new_frame).data,
@@ -6,7 +6,8 @@ from rest_framework.response import Response
 from rest_framework.viewsets import ViewSet
 
 from miqa.core.models import GlobalSettings
-from miqa.core.tasks import export_data, import_data
+from miqa.core.rest.import_export_job import ImportExportJobSerializer, start_import_export_job
+from miqa.core.rest.project import ImportOptionsSerializer
 
 
 class IsSuperUser(BasePermission):
@@ -53,31 +54,29 @@ class GlobalSettingsViewSet(ViewSet):
             global_settings.save()
         return Response(GlobalSettingsSerializer(global_settings).data)
 
-    @swagger_auto_schema(responses={204: 'Import succeeded.'})
+    @swagger_auto_schema(
+        request_body=ImportOptionsSerializer(),
+        responses={202: ImportExportJobSerializer()},
+    )
     @action(
         detail=False,
         url_path='import',
         methods=['POST'],
     )
     def import_(self, request, **kwargs):
-        error_list = import_data(None)
-        if len(error_list) > 0:
-            return Response(
-                {
-                    'detail': 'The following errors occurred during import. \
-                        Objects were still created for missing files, \
-                        but these objects will be non-functional until the file is present.',
-                    'errors': error_list,
-                }
-            )
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        options = ImportOptionsSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
+        job = start_import_export_job(
+            request, 'import', incremental=options.validated_data['incremental']
+        )
+        return Response(ImportExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-    @swagger_auto_schema(responses={204: 'Export succeeded.'})
+    @swagger_auto_schema(responses={202: ImportExportJobSerializer()})
     @action(
         detail=False,
         url_path='export',
         methods=['POST'],
     )
     def export_(self, request, **kwargs):
-        export_data(None)
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        job = start_import_export_job(request, 'export')
+        return Response(ImportExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
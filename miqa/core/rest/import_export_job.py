@@ -0,0 +1,49 @@
+from rest_framework import mixins, serializers
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.viewsets import GenericViewSet
+
+from miqa.core.models import ImportExportJob
+from miqa.core.tasks import run_import_export_job
+
+
+class ImportExportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportExportJob
+        fields = [
+            'id',
+            'kind',
+            'project',
+            'incremental',
+            'phase',
+            'rows_processed',
+            'warnings',
+            'error',
+            'created',
+            'started',
+            'finished',
+            'elapsed',
+        ]
+
+    elapsed = serializers.FloatField(read_only=True, allow_null=True)
+
+
+def start_import_export_job(request, kind, project=None, incremental=False) -> ImportExportJob:
+    job = ImportExportJob.objects.create(
+        kind=kind, project=project, creator=request.user, incremental=incremental
+    )
+    # tasks sent to celery must use serializable arguments
+    run_import_export_job.delay(str(job.id))
+    # an eagerly run job has already finished
+    job.refresh_from_db()
+    return job
+
+
+class ImportExportJobViewSet(mixins.RetrieveModelMixin, GenericViewSet):
+    permission_classes = [IsAuthenticated]
+    serializer_class = ImportExportJobSerializer
+
+    def get_queryset(self):
+        # jobs are polled by the client that started them
+        if self.request.user.is_superuser:
+            return ImportExportJob.objects.all()
+        return ImportExportJob.objects.filter(creator=self.request.user)
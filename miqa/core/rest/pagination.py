@@ -0,0 +1,151 @@
+from functools import reduce
+import json
+from operator import or_
+from typing import List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Model, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination
+
+
+def _keyset_filter(model: Model, ordering: Sequence[str], position: List[Optional[str]]) -> Q:
+    """
+    Match the rows that follow a position in an ordering.
+
+    Nulls sort as the greatest values, as they do in PostgreSQL.
+    """
+    following = []
+    equal = Q()
+    for order, value in zip(ordering, position):
+        field_name = order.lstrip('-')
+        nullable = model._meta.get_field(field_name).null
+        if order.startswith('-'):
+            if value is None:
+                after = Q(**{f'{field_name}__isnull': False})
+            else:
+                after = Q(**{f'{field_name}__lt': value})
+        elif value is None:
+            after = None
+        else:
+            after = Q(**{f'{field_name}__gt': value})
+            if nullable:
+                after |= Q(**{f'{field_name}__isnull': True})
+        if after is not None:
+            following.append(equal & after)
+        if value is None:
+            equal &= Q(**{f'{field_name}__isnull': True})
+        else:
+            equal &= Q(**{field_name: value})
+    keyset = reduce(or_, following, Q(pk__in=[]))
+
+    # bound the leading field too, so that its index finds where the page starts
+    order, value = ordering[0], position[0]
+    field_name = order.lstrip('-')
+    if value is not None and not model._meta.get_field(field_name).null:
+        lookup = 'lte' if order.startswith('-') else 'gte'
+        keyset &= Q(**{f'{field_name}__{lookup}': value})
+    return keyset
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pages that continue from the ordering key of the last row of the previous page.
+
+    Unlike CursorPagination, which positions pages on the first field of the ordering and skips
+    rows that share it by offset, cursors hold every field of the ordering, which must end with
+    a unique field. Deep pages then cost as much as the first, and no page counts the list.
+    """
+
+    page_size_query_param = 'limit'
+    # the upper bound of the default limit/offset pagination
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            _, reverse, current_position = self.cursor
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [
+                order[1:] if order.startswith('-') else f'-{order}' for order in self.ordering
+            ]
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            # cursors come from clients, so positions that do not fit the ordering are not found
+            try:
+                position = json.loads(current_position)
+                if not (
+                    isinstance(position, list)
+                    and len(position) == len(ordering)
+                    and all(value is None or isinstance(value, str) for value in position)
+                ):
+                    raise ValueError('The position does not match the ordering.')
+                queryset = queryset.filter(_keyset_filter(queryset.model, ordering, position))
+            except (ValueError, TypeError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # an extra row tells whether more rows follow the page
+        results = list(queryset[: self.page_size + 1])
+        self.page = results[: self.page_size]
+        has_following = len(results) > len(self.page)
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+        # pages continue from their last and first rows
+        self.next_position = self.previous_position = None
+        if self.page:
+            self.next_position = self._get_position_from_instance(self.page[-1], self.ordering)
+            self.previous_position = self._get_position_from_instance(self.page[0], self.ordering)
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or self.next_position is None:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.next_position))
+
+    def get_previous_link(self):
+        if not self.has_previous or self.previous_position is None:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.previous_position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            value = (
+                instance[field_name]
+                if isinstance(instance, dict)
+                else getattr(instance, field_name)
+            )
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+
+class ScanPagination(KeysetPagination):
+    ordering = ('name', 'id')
+
+
+class FramePagination(KeysetPagination):
+    ordering = ('scan_id', 'frame_number', 'id')
+
+
+class ScanDecisionPagination(KeysetPagination):
+    ordering = ('scan_id', '-created', 'id')
@@ -1,17 +1,17 @@
 from functools import wraps
-from typing import Union
+from typing import Optional, Union
 
 from django.contrib.auth.models import User
+from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404
 from django.views.generic import View
-from guardian.shortcuts import get_perms
 from rest_framework import status
 from rest_framework.exceptions import APIException
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 from rest_framework.request import Request
 from rest_framework.response import Response
 
-from miqa.core.models import Experiment, Project, Scan
+from miqa.core.models import Experiment, Project, ProjectMembership, Scan
 
 
 def has_review_perm(user_perms_on_project):
@@ -22,6 +22,34 @@ def has_read_perm(user_perms_on_project):
     return any(perm in user_perms_on_project for perm in Project().get_read_permission_groups())
 
 
+def readable_projects(user: User) -> QuerySet:
+    """Return the projects a user has any role in."""
+    if not user.is_active:
+        return Project.objects.none()
+    if user.is_superuser:
+        return Project.objects.all()
+    return Project.objects.filter(memberships__user=user)
+
+
+def get_project_role(request: Request, project: Union[Project, str]) -> Optional[str]:
+    """
+    Return the role of the requesting user in a project, like Project.get_user_role.
+
+    The memberships of the user are looked up once per request.
+    """
+    user = request.user
+    if not user.is_active:
+        return None
+    if user.is_superuser:
+        return 'tier_2_reviewer'
+    if not hasattr(request, '_project_roles'):
+        request._project_roles = {
+            str(project_id): role for project_id, role in ProjectMembership.roles_of(user).items()
+        }
+    project_id = project.id if isinstance(project, Project) else project
+    return request._project_roles.get(str(project_id))
+
+
 def project_permission_required(review_access=False, superuser_access=False, **decorator_kwargs):
     def decorator(view_func):
         def _wrapped_view(viewset, *args, **wrapped_view_kwargs):
@@ -34,9 +62,9 @@ def project_permission_required(review_access=False, superuser_access=False, **d
             project = get_object_or_404(Project, **lookup_dict)
 
             user = viewset.request.user
-            user_perms_on_project = get_perms(user, project)
-            review_perm = has_review_perm(user_perms_on_project)
-            read_perm = has_read_perm(user_perms_on_project)
+            role = get_project_role(viewset.request, project)
+            review_perm = role in project.get_review_permission_groups()
+            read_perm = role is not None
 
             if (
                 (superuser_access and not user.is_superuser)
@@ -1,17 +1,21 @@
 from django.conf import settings
 from drf_yasg.utils import no_body, swagger_auto_schema
-from guardian.shortcuts import get_objects_for_user, get_users_with_perms
 from rest_framework import mixins, serializers, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from miqa.core.models import Project
-from miqa.core.rest.experiment import ExperimentSerializer
-from miqa.core.rest.permissions import project_permission_required
+from miqa.core.models import Project, Scan
+from miqa.core.rest.experiment import ExperimentSummarySerializer
+from miqa.core.rest.import_export_job import ImportExportJobSerializer, start_import_export_job
+from miqa.core.rest.permissions import (
+    get_project_role,
+    project_permission_required,
+    readable_projects,
+)
+from miqa.core.rest.query_plan import QueryPlanMixin
 from miqa.core.rest.user import UserSerializer
-from miqa.core.tasks import export_data, import_data
 
 
 class ProjectSettingsSerializer(serializers.ModelSerializer):
@@ -29,22 +33,11 @@ class ProjectSettingsSerializer(serializers.ModelSerializer):
     default_email_recipients = serializers.SerializerMethodField('get_default_email_recipients')
 
     def get_permissions(self, obj):
-        permissions = {
-            perm_group: [
-                UserSerializer(user).data
-                for user in get_users_with_perms(obj, only_with_perms_in=[perm_group])
-            ]
-            for perm_group in Project().get_read_permission_groups()
-        }
-        permissions['collaborator'] = [
-            x
-            for x in permissions['collaborator']
-            if x not in permissions['tier_1_reviewer'] and x not in permissions['tier_2_reviewer']
-        ]
-        permissions['tier_1_reviewer'] = [
-            x for x in permissions['tier_1_reviewer'] if x not in permissions['tier_2_reviewer']
-        ]
-
+        # members are listed under their highest role only
+        permissions = {perm_group: [] for perm_group in Project().get_read_permission_groups()}
+        # memberships are prefetched with their users by ProjectViewSet
+        for membership in sorted(obj.memberships.all(), key=lambda m: m.user.username):
+            permissions[membership.role].append(UserSerializer(membership.user).data)
         return permissions
 
     def get_default_email_recipients(self, obj):
@@ -74,32 +67,43 @@ class ProjectTaskOverviewSerializer(serializers.ModelSerializer):
         return obj.experiments.count()
 
     def get_total_scans(self, obj):
-        return sum([exp.scans.count() for exp in obj.experiments.all()])
+        return Scan.objects.filter(experiment__project=obj).count()
 
     def get_my_project_role(self, obj):
-        return obj.get_user_role(self.context['user'])
+        return get_project_role(self.context['request'], obj)
 
     def get_scan_states(self, obj):
-        def convert_state_string(last_decision):
-            if last_decision.decision == 'U':
-                return 'complete'
-            if last_decision.creator:
-                last_reviewer_role = obj.get_user_role(last_decision.creator)
-                if last_reviewer_role == 'tier_2_reviewer':
-                    # scan is complete if it is marked usable by anyone
-                    # or if marked at all by a tier 2 reviewer
-                    return 'complete'
-            return 'needs tier 2 review'
-
         return {
-            str(scan.id): convert_state_string(scan.decisions.latest('created'))
-            if scan.decisions.count() > 0
-            else 'unreviewed'
-            for exp in obj.experiments.all()
-            for scan in exp.scans.all()
+            str(scan_id): review_state
+            for scan_id, review_state in Scan.objects.filter(experiment__project=obj).values_list(
+                'id', 'review_state'
+            )
         }
 
 
+class ImportOptionsSerializer(serializers.Serializer):
+    incremental = serializers.BooleanField(
+        default=False,
+        help_text='Only apply changes, keeping existing decisions and evaluations.',
+    )
+
+
+class ExportOptionsSerializer(serializers.Serializer):
+    delta = serializers.BooleanField(
+        default=False,
+        help_text='Only export scans changed since the last delta export, to a new numbered file.',
+    )
+
+
+class ProjectEvaluationProgressSerializer(serializers.Serializer):
+    total_frames = serializers.IntegerField()
+    evaluated_frames = serializers.IntegerField()
+    pending_frames = serializers.IntegerField()
+    skipped_frames = serializers.IntegerField(
+        help_text='Frames of scan types without an evaluation model, which are not evaluated.'
+    )
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     class Meta:
         model = Project
@@ -107,7 +111,8 @@ class ProjectSerializer(serializers.ModelSerializer):
         ref_name = 'projects'
 
     status = serializers.SerializerMethodField('get_status')
-    experiments = ExperimentSerializer(many=True, required=False)
+    # scans are listed a page at a time by experiment, from the scans endpoint
+    experiments = ExperimentSummarySerializer(many=True, required=False)
     settings = serializers.SerializerMethodField('get_settings')
     creator = serializers.SerializerMethodField('get_creator')
 
@@ -122,25 +127,26 @@ class ProjectSerializer(serializers.ModelSerializer):
 
 
 class ProjectViewSet(
+    QueryPlanMixin,
     ReadOnlyModelViewSet,
     mixins.CreateModelMixin,
     mixins.DestroyModelMixin,
 ):
     permission_classes = [IsAuthenticated]
     serializer_class = ProjectSerializer
+    # the status of every project is read from its statistics row
+    select_related = ['statistics', 'creator']
+    action_prefetch_related = {
+        'list': ['experiments__lock_owner', 'memberships__user'],
+        'retrieve': ['experiments__lock_owner', 'memberships__user'],
+        'settings_': ['memberships__user'],
+    }
 
     def get_queryset(self):
-        projects = get_objects_for_user(
-            self.request.user,
-            [f'core.{perm}' for perm in Project().get_read_permission_groups()],
-            any_perm=True,
-        )
-        if self.action == 'retrieve':
-            return projects.prefetch_related(
-                'experiments__scans__frames', 'experiments__scans__decisions'
-            )
-        else:
-            return projects.all().order_by('name')
+        projects = self.plan_queryset(readable_projects(self.request.user))
+        if self.action == 'list':
+            return projects.order_by('name')
+        return projects
 
     def create(self, request, *args, **kwargs):
         if not settings.NORMAL_USERS_CAN_CREATE_PROJECTS and not request.user.is_superuser:
@@ -195,51 +201,40 @@ class ProjectViewSet(
             project.export_path = request.data['export_path']
             project.full_clean()
             project.save()
+            # reload the memberships that update_group changed after they were prefetched
+            project = self.get_object()
         serializer = ProjectSettingsSerializer(project)
         return Response(serializer.data)
 
     @swagger_auto_schema(
-        request_body=no_body,
-        responses={204: 'Import succeeded.'},
+        request_body=ImportOptionsSerializer(),
+        responses={202: ImportExportJobSerializer()},
     )
     @project_permission_required()
     @action(detail=True, url_path='import', url_name='import', methods=['POST'])
     def import_(self, request, **kwargs):
         project: Project = self.get_object()
+        options = ImportOptionsSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
 
-        # tasks sent to celery must use serializable arguments
-        error_list = import_data(project.id)
-        if len(error_list) > 0:
-            return Response(
-                {
-                    'detail': 'The following errors occurred during import.',
-                    'errors': error_list,
-                }
-            )
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        job = start_import_export_job(
+            request, 'import', project, options.validated_data['incremental']
+        )
+        return Response(ImportExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     @swagger_auto_schema(
-        request_body=no_body,
-        responses={204: 'Export succeeded.'},
+        request_body=ExportOptionsSerializer(),
+        responses={202: ImportExportJobSerializer()},
     )
     @project_permission_required()
     @action(detail=True, methods=['POST'])
     def export(self, request, **kwargs):
         project: Project = self.get_object()
+        options = ExportOptionsSerializer(data=request.data)
+        options.is_valid(raise_exception=True)
 
-        # tasks sent to celery must use serializable arguments
-        warning_list = export_data(project.id)
-        if len(warning_list) > 0:
-            return Response(
-                {
-                    'detail': 'The following warnings were raised during import. \
-                        Exports of uploaded scans are not yet supported.',
-                    'warnings': warning_list,
-                }
-            )
-
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        job = start_import_export_job(request, 'export', project, options.validated_data['delta'])
+        return Response(ImportExportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
     @swagger_auto_schema(
         request_body=no_body,
@@ -250,6 +245,19 @@ class ProjectViewSet(
     def task_overview(self, request, **kwargs):
         project: Project = self.get_object()
         return Response(
-            ProjectTaskOverviewSerializer(project, context={'user': request.user}).data,
+            ProjectTaskOverviewSerializer(project, context={'request': request}).data,
+            status=status.HTTP_200_OK,
+        )
+
+    @swagger_auto_schema(
+        request_body=no_body,
+        responses={200: ProjectEvaluationProgressSerializer()},
+    )
+    @project_permission_required()
+    @action(detail=True, methods=['GET'])
+    def evaluation_progress(self, request, **kwargs):
+        project: Project = self.get_object()
+        return Response(
+            ProjectEvaluationProgressSerializer(project.get_evaluation_progress()).data,
             status=status.HTTP_200_OK,
         )
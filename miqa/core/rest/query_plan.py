@@ -0,0 +1,28 @@
+from typing import Dict, Sequence
+
+from django.db.models import QuerySet
+
+
+class QueryPlanMixin:
+    """
+    Load the related objects a viewset's serializers read along with its queryset.
+
+    Viewsets declare the select_related and prefetch_related lookups of every action, and extra
+    prefetch_related lookups for actions whose serializers nest more objects, so that a page
+    takes the same number of queries whatever its size.
+    """
+
+    select_related: Sequence[str] = ()
+    prefetch_related: Sequence[str] = ()
+    action_prefetch_related: Dict[str, Sequence[str]] = {}
+
+    def plan_queryset(self, queryset: QuerySet) -> QuerySet:
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        prefetch_related = [
+            *self.prefetch_related,
+            *self.action_prefetch_related.get(self.action, ()),
+        ]
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
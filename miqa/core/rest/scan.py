@@ -1,12 +1,13 @@
 from django_filters import rest_framework as filters
-from guardian.shortcuts import get_objects_for_user
 from rest_framework import mixins, serializers
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.viewsets import GenericViewSet
 
-from miqa.core.models import Experiment, Project, Scan
-from miqa.core.rest.frame import FrameSerializer
-from miqa.core.rest.permissions import UserHoldsExperimentLock
+from miqa.core.models import Experiment, ProjectStatistics, Scan
+from miqa.core.rest.frame import FrameSerializer, FrameSummarySerializer
+from miqa.core.rest.pagination import ScanPagination
+from miqa.core.rest.permissions import UserHoldsExperimentLock, readable_projects
+from miqa.core.rest.query_plan import QueryPlanMixin
 from miqa.core.rest.scan_decision import ScanDecisionSerializer
 
 
@@ -31,20 +32,41 @@ class ScanSerializer(serializers.ModelSerializer):
     experiment = serializers.SlugRelatedField(queryset=Experiment.objects.all(), slug_field='id')
 
 
+class ScanSummarySerializer(ScanSerializer):
+    """A scan whose frames have no download URL, which is only generated when a scan is opened."""
+
+    class Meta(ScanSerializer.Meta):
+        ref_name = 'experiment_scan_summary'
+
+    frames = FrameSummarySerializer(many=True, read_only=True)  # type: ignore
+
+
 class ScanViewSet(
+    QueryPlanMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.CreateModelMixin,
     GenericViewSet,
 ):
     filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ['experiment']
+    pagination_class = ScanPagination
     permission_classes = [IsAuthenticated, UserHoldsExperimentLock]
     serializer_class = ScanSerializer
+    select_related = ['experiment']
+    prefetch_related = ['frames__frame_evaluation', 'decisions__creator']
+
+    def get_serializer_class(self):
+        # scans are listed a page at a time by experiment; download URLs are only generated
+        # for the frames of a retrieved scan
+        if self.action == 'list':
+            return ScanSummarySerializer
+        return ScanSerializer
 
     def get_queryset(self):
-        projects = get_objects_for_user(
-            self.request.user,
-            [f'core.{perm}' for perm in Project().get_read_permission_groups()],
-            any_perm=True,
-        )
-        return Scan.objects.filter(experiment__project__in=projects)
+        projects = readable_projects(self.request.user)
+        return self.plan_queryset(Scan.objects.filter(experiment__project__in=projects))
+
+    def perform_create(self, serializer):
+        scan = serializer.save()
+        ProjectStatistics.adjust(scan.experiment.project_id, total_scans=1, unreviewed_scans=1)
@@ -1,15 +1,22 @@
+from django.db import transaction
 from django_filters import rest_framework as filters
-from guardian.shortcuts import get_objects_for_user, get_perms
 from rest_framework import mixins, serializers, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
-from miqa.core.models import Project, Scan, ScanDecision
+from miqa.core.models import Scan, ScanDecision
 from miqa.core.models.scan_decision import ArtifactState, default_identified_artifacts
+from miqa.core.rest.pagination import ScanDecisionPagination
+from miqa.core.rest.query_plan import QueryPlanMixin
 from miqa.core.rest.user import UserSerializer
 
-from .permissions import UserHoldsExperimentLock, ensure_experiment_lock, has_review_perm
+from .permissions import (
+    UserHoldsExperimentLock,
+    ensure_experiment_lock,
+    get_project_role,
+    readable_projects,
+)
 
 
 class ScanDecisionSerializer(serializers.ModelSerializer):
@@ -32,29 +39,32 @@ class ScanDecisionSerializer(serializers.ModelSerializer):
 
 
 class ScanDecisionViewSet(
+    QueryPlanMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
 ):
     filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ['scan']
+    pagination_class = ScanDecisionPagination
     permission_classes = [IsAuthenticated, UserHoldsExperimentLock]
     serializer_class = ScanDecisionSerializer
+    select_related = ['creator']
 
     def get_queryset(self):
-        projects = get_objects_for_user(
-            self.request.user,
-            [f'core.{perm}' for perm in Project().get_read_permission_groups()],
-            any_perm=True,
+        projects = readable_projects(self.request.user)
+        return self.plan_queryset(
+            ScanDecision.objects.filter(scan__experiment__project__in=projects)
         )
-        return ScanDecision.objects.filter(scan__experiment__project__in=projects)
 
     # cannot use project_permission_required decorator because no pk is provided
     def create(self, request, **kwargs):
         request_data = request.data
-        scan = Scan.objects.get(id=request.data['scan'])
+        scan = Scan.objects.select_related('experiment__project').get(id=request.data['scan'])
+        project = scan.experiment.project
 
-        if not has_review_perm(get_perms(request.user, scan.experiment.project)):
+        if get_project_role(request, project) not in project.get_review_permission_groups():
             return Response(status=status.HTTP_403_FORBIDDEN)
 
         request_data['scan'] = scan
@@ -78,5 +88,7 @@ class ScanDecisionViewSet(
 
         ensure_experiment_lock(request_data['scan'], request_data['creator'])
         new_obj = ScanDecision(**request_data)
-        new_obj.save()
+        with transaction.atomic():
+            new_obj.save()
+            project.update_review_states(Scan.objects.filter(id=scan.id))
         return Response(ScanDecisionSerializer(new_obj).data, status=status.HTTP_201_CREATED)
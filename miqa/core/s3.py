@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from functools import lru_cache
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+import boto3
+from botocore import UNSIGNED
+from botocore.client import Config
+
+# presigned download URLs are valid for this many seconds, the boto3 default
+PRESIGNED_URL_EXPIRATION = 3600
+# a cached URL is signed again once it has less than this many seconds left, so that clients
+# have time to download the frame
+PRESIGNED_URL_EXPIRY_MARGIN = 600
+# maximum number of presigned URLs cached per process
+PRESIGNED_URL_CACHE_SIZE = 100000
+
+S3Location = Tuple[str, str]
+
+
+# boto3 clients are thread safe and expensive to build, so one is shared per process
+@lru_cache(maxsize=None)
+def get_s3_client(public: bool = False):
+    if public:
+        return boto3.client('s3', config=Config(signature_version=UNSIGNED))
+    else:
+        return boto3.client('s3')
+
+
+def split_s3_path(path: str) -> S3Location:
+    """Return the bucket and key of an s3:// path."""
+    bucket, key = path.strip()[5:].split('/', maxsplit=1)
+    return bucket, key
+
+
+class PresignedURLCache:
+    """
+    Presigned download URLs by bucket and key, kept until shortly before they expire.
+
+    Signing a URL needs no request to S3, but serializing thousands of frames signs thousands
+    of URLs; cached URLs also let browsers reuse the frames they have already downloaded.
+    """
+
+    def __init__(
+        self,
+        expiration: int = PRESIGNED_URL_EXPIRATION,
+        expiry_margin: int = PRESIGNED_URL_EXPIRY_MARGIN,
+        max_size: int = PRESIGNED_URL_CACHE_SIZE,
+    ):
+        self.expiration = expiration
+        self.expiry_margin = expiry_margin
+        self.max_size = max_size
+        # (bucket, key) -> (url, monotonic time after which the url is signed again)
+        self._urls: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, bucket: str, key: str) -> str:
+        return self.get_many([(bucket, key)])[(bucket, key)]
+
+    def get_many(self, locations: Iterable[S3Location]) -> Dict[S3Location, str]:
+        """Return the URLs of many objects, signing only those not cached or about to expire."""
+        now = time.monotonic()
+        urls = {}
+        with self._lock:
+            for location in locations:
+                if location in urls:
+                    continue
+                cached = self._urls.get(location)
+                if cached and now < cached[1]:
+                    self._urls.move_to_end(location)
+                    urls[location] = cached[0]
+                    continue
+                bucket, key = location
+                url = get_s3_client().generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': bucket, 'Key': key},
+                    ExpiresIn=self.expiration,
+                )
+                self._urls[location] = (url, now + self.expiration - self.expiry_margin)
+                self._urls.move_to_end(location)
+                urls[location] = url
+            while len(self._urls) > self.max_size:
+                self._urls.popitem(last=False)
+        return urls
+
+    def clear(self):
+        with self._lock:
+            self._urls.clear()
+
+
+presigned_urls = PresignedURLCache()
@@ -1,55 +1,147 @@
-from datetime import datetime
-from io import BytesIO, StringIO
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing
+import csv
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import groupby
 import json
+import logging
+from operator import itemgetter
 from pathlib import Path
 import tempfile
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import boto3
-from botocore import UNSIGNED
-from botocore.client import Config
-from celery import shared_task
+from celery import group, shared_task
+from celery.signals import worker_process_init
 import dateparser
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 from guardian.shortcuts import assign_perm
 import pandas
 from rest_framework.exceptions import APIException
 
+from miqa.core.bulk_load import bulk_load
 from miqa.core.conversion.import_export_csvs import (
+    IMPORT_CSV_COLUMNS,
     import_dataframe_to_dict,
-    import_dict_to_dataframe,
+    scan_row_values,
     validate_import_dict,
 )
+from miqa.core.conversion.import_export_parquet import (
+    parquet_scan_rows,
+    read_parquet_chunks,
+    write_parquet,
+)
 from miqa.core.conversion.nifti_to_zarr_ngff import nifti_to_zarr_ngff
 from miqa.core.models import (
     Evaluation,
     Experiment,
     Frame,
     GlobalSettings,
+    ImportExportJob,
     Project,
+    ProjectStatistics,
     Scan,
     ScanDecision,
 )
 from miqa.core.models.frame import StorageMode
 from miqa.core.models.scan_decision import DECISION_CHOICES, default_identified_artifacts
+from miqa.core.s3 import get_s3_client, split_s3_path
 
+logger = logging.getLogger(__name__)
 
-def _get_s3_client(public: bool):
-    if public:
-        return boto3.client('s3', config=Config(signature_version=UNSIGNED))
-    else:
-        return boto3.client('s3')
+# number of threads downloading S3 frames while earlier frames are evaluated
+S3_PREFETCH_WORKERS = 4
+# maximum number of prefetched frames held in the temp directory at once
+S3_PREFETCH_MAX_PENDING = 8
+# number of frames evaluated (and committed) by each evaluate_data task
+EVALUATION_CHUNK_SIZE = 64
+# number of CSV rows validated and written to the database together during an import
+IMPORT_CHUNK_SIZE = 5000
+# temporary table of the frames listed by an incremental import in chunks, which are kept
+LISTED_FRAMES_TABLE = 'miqa_import_listed_frames'
+# delta exports reach back this far before the watermark, so that rows written by transactions
+# still open during the previous delta export are not missed; deltas may repeat such rows
+DELTA_EXPORT_OVERLAP = timedelta(hours=1)
+# number of exported frames between progress updates of an export job
+EXPORT_PROGRESS_INTERVAL = 5000
 
 
 def _download_from_s3(path: str, public: bool) -> bytes:
-    bucket, key = path.strip()[5:].split('/', maxsplit=1)
-    client = _get_s3_client(public)
+    bucket, key = split_s3_path(path)
+    client = get_s3_client(public)
     buf = BytesIO()
     client.download_fileobj(bucket, key, buf)
     return buf.getvalue()
 
 
+def _download_s3_file(path: str, public: bool, dest: Path) -> Path:
+    # download_file fetches large objects as concurrent byte-range parts
+    bucket, key = split_s3_path(path)
+    get_s3_client(public).download_file(bucket, key, str(dest))
+    return dest
+
+
+def _local_frame_path(frame: Frame, tmpdir: Path) -> Path:
+    if frame.storage_mode == StorageMode.S3_PATH:
+        # prefix with the frame id, since different scans often reuse the same file name
+        return tmpdir / f'{frame.id}_{frame.path.name}'
+    return frame.path
+
+
+def _prefetch_frames(frames: Iterable[Frame], file_paths: Dict[Frame, Path]) -> Iterator[Path]:
+    """
+    Yield the local path of each frame in order, downloading S3 frames on a thread pool.
+
+    At most S3_PREFETCH_MAX_PENDING frames are downloading or waiting to be consumed, which
+    caps temp disk use. A downloaded file is deleted once the consumer asks for the next frame.
+    """
+    frame_iter = iter(frames)
+    pending: deque = deque()
+
+    with ThreadPoolExecutor(max_workers=S3_PREFETCH_WORKERS) as executor:
+
+        def submit_next():
+            frame = next(frame_iter, None)
+            if frame is None:
+                return
+            dest = file_paths[frame]
+            if frame.storage_mode == StorageMode.S3_PATH:
+                s3_public = frame.scan.experiment.project.s3_public
+                future = executor.submit(_download_s3_file, frame.raw_path, s3_public, dest)
+            else:
+                future = Future()
+                future.set_result(dest)
+            pending.append((frame, future))
+
+        for _ in range(S3_PREFETCH_MAX_PENDING):
+            submit_next()
+        while pending:
+            frame, future = pending.popleft()
+            local_path = future.result()
+            yield local_path
+            if frame.storage_mode == StorageMode.S3_PATH:
+                local_path.unlink(missing_ok=True)
+            submit_next()
+
+
+@worker_process_init.connect
+def preload_evaluation_models(**kwargs):
+    # load every evaluation model once per worker process, before any task needs it
+    try:
+        from miqa.learning.evaluation_models import evaluation_model_registry
+    except ImportError:
+        logger.warning('Learning dependencies are not installed; evaluation models not preloaded.')
+        return
+    evaluation_model_registry.preload()
+
+
 @shared_task
 def reset_demo():
     Project.objects.all().delete()
@@ -69,13 +161,13 @@ def reset_demo():
 
 @shared_task
 def evaluate_frame_content(frame_id):
-    from miqa.learning.evaluation_models import available_evaluation_models
+    from miqa.learning.evaluation_models import evaluation_model_registry
     from miqa.learning.nn_inference import evaluate1
 
-    frame = Frame.objects.get(id=frame_id)
+    frame = Frame.objects.select_related('scan__experiment__project').get(id=frame_id)
     eval_model_name = frame.scan.experiment.project.evaluation_models[[frame.scan.scan_type][0]]
     s3_public = frame.scan.experiment.project.s3_public
-    eval_model = available_evaluation_models[eval_model_name].load()
+    eval_model = evaluation_model_registry.get(eval_model_name)
     with tempfile.TemporaryDirectory() as tmpdirname:
         # need to send a local version to NN
         if frame.storage_mode == StorageMode.LOCAL_PATH:
@@ -94,38 +186,42 @@ def evaluate_frame_content(frame_id):
             evaluation_model=eval_model_name,
             results=result,
         )
+        ProjectStatistics.adjust(frame.scan.experiment.project_id, evaluated_frames=1)
+
+
+def _group_frames_by_evaluation_model(frame_ids: List[str]) -> Dict[str, List[Frame]]:
+    # resolve every frame along with its scan, experiment and project in a single query,
+    # skipping frames already evaluated, e.g. by an earlier attempt of the same chunk
+    frames = (
+        Frame.objects.select_related('scan__experiment__project')
+        .filter(frame_evaluation__isnull=True)
+        .in_bulk(frame_ids)
+    )
+    model_to_frames_map: Dict[str, List[Frame]] = {}
+    for frame in frames.values():
+        if frame.storage_mode == StorageMode.S3_PATH or frame.path.exists():
+            project = frame.scan.experiment.project
+            eval_model_name = project.evaluation_models.get(frame.scan.scan_type)
+            if eval_model_name:
+                model_to_frames_map.setdefault(eval_model_name, []).append(frame)
+    return model_to_frames_map
 
 
 @shared_task
 def evaluate_data(frames_by_project):
-    from miqa.learning.evaluation_models import available_evaluation_models
+    from miqa.learning.evaluation_models import evaluation_model_registry
     from miqa.learning.nn_inference import evaluate_many
 
-    model_to_frames_map = {}
-    for project_id, frame_ids in frames_by_project.items():
-        project = Project.objects.get(id=project_id)
-        for frame_id in frame_ids:
-            frame = Frame.objects.get(id=frame_id)
-            file_path = frame.raw_path
-            if frame.storage_mode == StorageMode.S3_PATH or Path(file_path).exists():
-                eval_model_name = project.evaluation_models[[frame.scan.scan_type][0]]
-                if eval_model_name not in model_to_frames_map:
-                    model_to_frames_map[eval_model_name] = []
-                model_to_frames_map[eval_model_name].append(frame)
+    frame_ids = [frame_id for frame_ids in frames_by_project.values() for frame_id in frame_ids]
+    model_to_frames_map = _group_frames_by_evaluation_model(frame_ids)
 
     with tempfile.TemporaryDirectory() as tmpdirname:
         tmpdir = Path(tmpdirname)
         for model_name, frame_set in model_to_frames_map.items():
-            current_model = available_evaluation_models[model_name].load()
-            file_paths = {frame: frame.raw_path for frame in frame_set}
-            for frame, file_path in file_paths.items():
-                if frame.storage_mode == StorageMode.S3_PATH:
-                    s3_public = frame.scan.experiment.project.s3_public
-                    dest = tmpdir / frame.path.name
-                    with open(dest, 'wb') as fd:
-                        fd.write(_download_from_s3(file_path, s3_public))
-                    file_paths[frame] = dest
-            results = evaluate_many(current_model, list(file_paths.values()))
+            current_model = evaluation_model_registry.get(model_name)
+            file_paths = {frame: _local_frame_path(frame, tmpdir) for frame in frame_set}
+            # frames are downloaded in the background while earlier ones are evaluated
+            results = evaluate_many(current_model, _prefetch_frames(frame_set, file_paths))
 
             Evaluation.objects.bulk_create(
                 [
@@ -137,9 +233,56 @@ def evaluate_data(frames_by_project):
                     for frame in frame_set
                 ]
             )
+            evaluated_by_project = Counter(frame.scan.experiment.project_id for frame in frame_set)
+            for project_id, evaluated_frames in evaluated_by_project.items():
+                ProjectStatistics.adjust(project_id, evaluated_frames=evaluated_frames)
+
+
+def evaluation_chunks(frames: Iterable[Frame]) -> List[Dict[str, List[str]]]:
+    """
+    Split frames into evaluate_data payloads of at most EVALUATION_CHUNK_SIZE frames.
+
+    Every chunk uses a single evaluation model. Frames whose scan type has no evaluation model
+    configured on their project are skipped.
+    """
+    frames_by_model: Dict[str, List[Frame]] = {}
+    for frame in frames:
+        project = frame.scan.experiment.project
+        eval_model_name = project.evaluation_models.get(frame.scan.scan_type)
+        if eval_model_name:
+            frames_by_model.setdefault(eval_model_name, []).append(frame)
+
+    chunks: List[Dict[str, List[str]]] = []
+    for model_frames in frames_by_model.values():
+        for start in range(0, len(model_frames), EVALUATION_CHUNK_SIZE):
+            # must use str, not UUID, to get sent to celery task properly
+            chunk: Dict[str, List[str]] = {}
+            for frame in model_frames[start : start + EVALUATION_CHUNK_SIZE]:
+                project_id = str(frame.scan.experiment.project.id)
+                chunk.setdefault(project_id, []).append(str(frame.id))
+            chunks.append(chunk)
+    return chunks
+
+
+def enqueue_evaluation(frames: Iterable[Frame]):
+    # fan the chunks out across workers; each chunk commits its own evaluations
+    chunks = evaluation_chunks(frames)
+    if chunks:
+        group(evaluate_data.s(chunk) for chunk in chunks).delay()
+
+
+def _report_progress(
+    job: Optional[ImportExportJob],
+    phase: Optional[str] = None,
+    rows_processed: Optional[int] = None,
+):
+    if job:
+        job.update_progress(phase, rows_processed)
 
 
-def import_data(project_id: Optional[str]):
+def import_data(
+    project_id: Optional[str], incremental: bool = False, job: Optional[ImportExportJob] = None
+):
     if project_id is None:
         project = None
         import_path = GlobalSettings.load().import_path
@@ -151,80 +294,344 @@ def import_data(project_id: Optional[str]):
 
     try:
         if import_path.endswith('.csv'):
+            _report_progress(job, 'download')
             if import_path.startswith('s3://'):
-                buf = _download_from_s3(import_path, s3_public).decode('utf-8')
+                bucket, key = split_s3_path(import_path)
+                csv_file = get_s3_client(s3_public).get_object(Bucket=bucket, Key=key)['Body']
             else:
-                with open(import_path) as fd:
-                    buf = fd.read()
-            import_dict = import_dataframe_to_dict(
-                pandas.read_csv(StringIO(buf), index_col=False, na_filter=False).astype(str),
-                project,
-            )
+                csv_file = open(import_path)
+            with closing(csv_file):
+                return import_csv_chunks(csv_file, project, incremental, job)
+        elif import_path.endswith('.parquet'):
+            _report_progress(job, 'download')
+            if import_path.startswith('s3://'):
+                # Parquet files are read by seeking to their row groups, which needs a local copy
+                with tempfile.TemporaryDirectory() as tmpdirname:
+                    local_path = _download_s3_file(
+                        import_path, s3_public, Path(tmpdirname) / 'import.parquet'
+                    )
+                    return import_parquet_chunks(local_path, project, incremental, job)
+            return import_parquet_chunks(import_path, project, incremental, job)
         elif import_path.endswith('.json'):
+            _report_progress(job, 'download')
             if import_path.startswith('s3://'):
-                import_dict = json.loads(_download_from_s3(import_path, s3_public))
+                buf = _download_from_s3(import_path, s3_public)
             else:
                 with open(import_path) as fd:
-                    import_dict = json.load(fd)
+                    buf = fd.read()
+            _report_progress(job, 'parse')
+            import_dict = json.loads(buf)
         else:
-            raise APIException(f'Invalid import file {import_path}. Must be CSV or JSON.')
+            raise APIException(f'Invalid import file {import_path}. Must be CSV, Parquet or JSON.')
     except (FileNotFoundError, boto3.exceptions.Boto3Error):
         raise APIException(f'Could not locate import file at {import_path}.')
     except PermissionError:
         raise APIException(f'MIQA lacks permission to read {import_path}.')
 
+    _report_progress(job, 'validate')
     import_dict, not_found_errors = validate_import_dict(import_dict, project)
-    perform_import(import_dict)
+    _report_progress(job, 'write')
+    frame_ids = perform_import(import_dict, incremental, job=job)
+    _report_progress(job, rows_processed=len(frame_ids))
+    return not_found_errors
+
+
+def import_csv_chunks(
+    csv_file,
+    project: Optional[Project],
+    incremental: bool = False,
+    job: Optional[ImportExportJob] = None,
+):
+    reader = pandas.read_csv(
+        csv_file, index_col=False, na_filter=False, dtype=str, chunksize=IMPORT_CHUNK_SIZE
+    )
+    return import_chunks(reader, project, incremental, job)
+
+
+def import_parquet_chunks(
+    parquet_file,
+    project: Optional[Project],
+    incremental: bool = False,
+    job: Optional[ImportExportJob] = None,
+):
+    reader = read_parquet_chunks(parquet_file, IMPORT_CHUNK_SIZE)
+    return import_chunks(reader, project, incremental, job)
+
+
+@transaction.atomic
+def import_chunks(
+    chunks: Iterable[pandas.DataFrame],
+    project: Optional[Project],
+    incremental: bool = False,
+    job: Optional[ImportExportJob] = None,
+):
+    """
+    Import the rows of an import file in chunks of IMPORT_CHUNK_SIZE, all in one transaction.
+
+    Memory use is bounded by the chunk size rather than the file size. Rows of one scan may span
+    chunks; every chunk is merged into what earlier chunks imported. If a chunk is invalid, the
+    import stops there and nothing is imported, so that projects are never left half replaced.
+    """
+    not_found_errors: List[str] = []
+    imported_projects: List[Project] = []
+    if incremental:
+        # frames listed anywhere in the file, to remove the others after an incremental import
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE {LISTED_FRAMES_TABLE} (id uuid PRIMARY KEY) '
+                'ON COMMIT DROP'
+            )
+    first_row = 1
+    for chunk_df in chunks:
+        last_row = first_row + len(chunk_df) - 1
+        try:
+            _report_progress(job, 'parse')
+            chunk_dict = import_dataframe_to_dict(chunk_df, project)
+            _report_progress(job, 'validate')
+            chunk_dict, chunk_errors = validate_import_dict(chunk_dict, project)
+            _report_progress(job, 'write')
+            for project_name in chunk_dict['projects']:
+                if project_name not in [project.name for project in imported_projects]:
+                    project_object = Project.objects.get(name=project_name)
+                    imported_projects.append(project_object)
+                    if not incremental:
+                        # delete old imports of this project
+                        Experiment.objects.filter(project=project_object).delete()
+            frame_ids = perform_import(chunk_dict, incremental=True, prune=False, job=job)
+            if incremental:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {LISTED_FRAMES_TABLE} SELECT unnest(%s::uuid[]) '
+                        'ON CONFLICT DO NOTHING',
+                        [frame_ids],
+                    )
+        except APIException as e:
+            raise APIException(
+                f'Import stopped at rows {first_row}-{last_row}, nothing was imported. {e.detail}'
+            )
+        not_found_errors += chunk_errors
+        logger.info('Imported rows %d-%d', first_row, last_row)
+        _report_progress(job, rows_processed=last_row)
+        first_row = last_row + 1
+
+    if incremental:
+        # anything not listed in the import file anymore is removed, like perform_import does
+        stale_frames = Frame.objects.filter(
+            scan__experiment__project__in=imported_projects
+        ).exclude(id__in=RawSQL(f'SELECT id FROM {LISTED_FRAMES_TABLE}', []))
+        while True:
+            stale_frame_ids = list(stale_frames.values_list('id', flat=True)[:IMPORT_CHUNK_SIZE])
+            if not stale_frame_ids:
+                break
+            Frame.objects.filter(id__in=stale_frame_ids).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {LISTED_FRAMES_TABLE}')
+        Scan.objects.filter(experiment__project__in=imported_projects, frames__isnull=True).delete()
+        Experiment.objects.filter(project__in=imported_projects, scans__isnull=True).delete()
+
+    # chunks leave statistics to be counted once every chunk is imported
+    for project_object in imported_projects:
+        ProjectStatistics.refresh(project_object.id)
     return not_found_errors
 
 
+def _decision_key(scan_id, decision, created, creator_id):
+    # decisions have no natural key, so match on what an export round trip preserves
+    if isinstance(created, datetime):
+        created = timezone.localtime(created).strftime('%Y-%m-%d %H:%M')
+    return (scan_id, decision, created, creator_id)
+
+
+# formats written by exports, tried in order before falling back to dateparser
+DECISION_CREATED_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M']
+
+
+def _iter_decision_data(import_dict) -> Iterator[dict]:
+    for project_data in import_dict['projects'].values():
+        for experiment_data in project_data['experiments'].values():
+            for scan_data in experiment_data['scans'].values():
+                if scan_data.get('last_decision'):
+                    yield scan_data['last_decision']
+                else:
+                    yield from scan_data.get('decisions', [])
+
+
+def _resolve_decision_creators(import_dict) -> Dict[str, User]:
+    emails = {decision_data.get('creator') for decision_data in _iter_decision_data(import_dict)}
+    emails.discard(None)
+    return {user.email: user for user in User.objects.filter(email__in=emails)}
+
+
+def _parse_decision_datetimes(import_dict) -> Dict[Any, Optional[str]]:
+    """Map every decision creation time of an import to its minute, or None if unparseable."""
+    created_values = {
+        decision_data['created']
+        for decision_data in _iter_decision_data(import_dict)
+        if decision_data['created']
+    }
+    # typed import files, like Parquet, hold datetimes that need no parsing
+    datetimes = {
+        value: timezone.localtime(value).strftime('%Y-%m-%d %H:%M')
+        if timezone.is_aware(value)
+        else value.strftime('%Y-%m-%d %H:%M')
+        for value in created_values
+        if isinstance(value, datetime)
+    }
+    values = pandas.Series(
+        [value for value in created_values if value not in datetimes], dtype=object
+    )
+    parsed = pandas.Series(pandas.NaT, index=values.index)
+    for created_format in DECISION_CREATED_FORMATS:
+        unparsed = parsed.isna()
+        parsed[unparsed] = pandas.to_datetime(
+            values[unparsed], format=created_format, errors='coerce'
+        )
+    created = parsed.dt.strftime('%Y-%m-%d %H:%M').to_dict()
+    # dateparser is slow, so it only sees the values in other formats
+    for index in parsed.index[parsed.isna()]:
+        valid_dt = dateparser.parse(values[index])
+        created[index] = valid_dt.strftime('%Y-%m-%d %H:%M') if valid_dt else None
+    return {**datetimes, **{values[index]: created[index] for index in values.index}}
+
+
 @shared_task
-def perform_import(import_dict):
+@transaction.atomic
+def perform_import(import_dict, incremental=False, prune=True, job=None):
+    """
+    Create the experiments, scans, frames and decisions described by an import dict.
+
+    By default, all existing experiments of every imported project are replaced. An incremental
+    import instead matches existing experiments, scans and frames by name and frame number,
+    creates or updates only what changed and deletes what is no longer listed. Existing
+    evaluations and decisions are kept, and only new or changed frames are evaluated.
+
+    Without prune, an incremental import only adds to and updates what it lists, so that an
+    import can be applied in parts; the statistics of the imported projects are then left for the
+    caller to refresh once every part is applied. Returns the ids of all frames listed by the
+    import.
+
+    The import runs in a transaction, so that a failure leaves every project as it was.
+    """
     new_projects: List[Project] = []
     new_experiments: List[Experiment] = []
     new_scans: List[Scan] = []
     new_frames: List[Frame] = []
     new_scan_decisions: List[ScanDecision] = []
+    # only populated by incremental imports
+    changed_experiments: List[Experiment] = []
+    changed_scans: List[Scan] = []
+    changed_frames: List[Frame] = []
+    kept_experiments: List[Experiment] = []
+    kept_scans: List[Scan] = []
+    kept_frames: List[Frame] = []
+    stale_experiments: List[Experiment] = []
+    stale_scans: List[Scan] = []
+    stale_frames: List[Frame] = []
+    # scans given new decisions, whose review state is updated once they are saved
+    decided_scan_ids: Dict[Project, set] = {}
+    creators = _resolve_decision_creators(import_dict)
+    decision_datetimes = _parse_decision_datetimes(import_dict)
 
+    imported_projects: List[Project] = []
     for project_name, project_data in import_dict['projects'].items():
         try:
             project_object = Project.objects.get(name=project_name)
         except Project.DoesNotExist:
             raise APIException(f'Project {project_name} does not exist.')
+        imported_projects.append(project_object)
 
-        # delete old imports of these projects
-        Experiment.objects.filter(
-            project=project_object
-        ).delete()  # cascades to scans -> frames, scan_notes
+        existing_experiments: Dict[str, Experiment] = {}
+        existing_scans: Dict[tuple, Scan] = {}
+        existing_frames: Dict[tuple, Frame] = {}
+        existing_decisions: set = set()
+        if incremental:
+            experiments = Experiment.objects.filter(project=project_object)
+            scans = Scan.objects.filter(experiment__project=project_object)
+            if not prune:
+                # nothing unlisted is removed, so only load what this import lists
+                experiments = experiments.filter(name__in=list(project_data['experiments']))
+                scans = scans.filter(
+                    experiment__in=experiments,
+                    name__in=list(
+                        {
+                            scan_name
+                            for experiment_data in project_data['experiments'].values()
+                            for scan_name in experiment_data['scans']
+                        }
+                    ),
+                )
+            existing_experiments = {experiment.name: experiment for experiment in experiments}
+            existing_scans = {(scan.experiment_id, scan.name): scan for scan in scans}
+            existing_frames = {
+                (frame.scan_id, frame.frame_number): frame
+                for frame in Frame.objects.filter(scan__in=scans)
+            }
+            existing_decisions = {
+                _decision_key(*values)
+                for values in ScanDecision.objects.filter(scan__in=scans).values_list(
+                    'scan_id', 'decision', 'created', 'creator_id'
+                )
+            }
+        else:
+            # delete old imports of these projects
+            Experiment.objects.filter(
+                project=project_object
+            ).delete()  # cascades to scans -> frames, scan_notes
 
         for experiment_name, experiment_data in project_data['experiments'].items():
             notes = experiment_data.get('notes', '')
-            experiment_object = Experiment(
-                name=experiment_name,
-                project=project_object,
-                note=notes,
-            )
-            new_experiments.append(experiment_object)
+            experiment_object = existing_experiments.pop(experiment_name, None)
+            if experiment_object is None:
+                experiment_object = Experiment(
+                    name=experiment_name,
+                    project=project_object,
+                    note=notes,
+                )
+                new_experiments.append(experiment_object)
+            else:
+                # enqueue_evaluation reads the project of changed frames through these objects
+                experiment_object.project = project_object
+                kept_experiments.append(experiment_object)
+                if experiment_object.note != (notes or ''):
+                    experiment_object.note = notes or ''
+                    changed_experiments.append(experiment_object)
 
             for scan_name, scan_data in experiment_data['scans'].items():
                 subject_id = scan_data.get('subject_id', None)
                 session_id = scan_data.get('session_id', None)
                 scan_link = scan_data.get('scan_link', None)
-                scan_object = Scan(
-                    name=scan_name,
-                    scan_type=scan_data['type'],
-                    experiment=experiment_object,
-                    subject_id=subject_id,
-                    session_id=session_id,
-                    scan_link=scan_link,
-                )
+                scan_object = existing_scans.pop((experiment_object.id, scan_name), None)
+                scan_retyped = False
+                if scan_object is None:
+                    scan_object = Scan(
+                        name=scan_name,
+                        scan_type=scan_data['type'],
+                        experiment=experiment_object,
+                        subject_id=subject_id,
+                        session_id=session_id,
+                        scan_link=scan_link,
+                    )
+                    new_scans.append(scan_object)
+                else:
+                    scan_object.experiment = experiment_object
+                    kept_scans.append(scan_object)
+                    # a new scan type may select a different evaluation model
+                    scan_retyped = scan_object.scan_type != scan_data['type']
+                    if (
+                        scan_retyped
+                        or scan_object.subject_id != subject_id
+                        or scan_object.session_id != session_id
+                        or scan_object.scan_link != scan_link
+                    ):
+                        scan_object.scan_type = scan_data['type']
+                        scan_object.subject_id = subject_id
+                        scan_object.session_id = session_id
+                        scan_object.scan_link = scan_link
+                        changed_scans.append(scan_object)
                 if 'last_decision' in scan_data and scan_data['last_decision']:
                     scan_data['decisions'] = [scan_data['last_decision']]
                 for decision_data in scan_data.get('decisions', []):
-                    try:
-                        creator = User.objects.get(email=decision_data.get('creator', ''))
-                    except User.DoesNotExist:
-                        creator = None
+                    creator = creators.get(decision_data.get('creator'))
                     note = ''
                     created = (
                         datetime.now().strftime('%Y-%m-%d %H:%M')
@@ -233,10 +640,8 @@ def perform_import(import_dict):
                     )
                     location = {}
                     note = decision_data.get('note', '')
-                    if decision_data['created']:
-                        valid_dt = dateparser.parse(decision_data['created'])
-                        if valid_dt:
-                            created = valid_dt.strftime('%Y-%m-%d %H:%M')
+                    if decision_data['created'] and decision_datetimes[decision_data['created']]:
+                        created = decision_datetimes[decision_data['created']]
                     if decision_data['location'] and decision_data['location'] != '':
                         slices = [
                             axis.split('=')[1] for axis in decision_data['location'].split(';')
@@ -247,6 +652,15 @@ def perform_import(import_dict):
                             'k': slices[2],
                         }
                     if decision_data['decision'] in [dec[0] for dec in DECISION_CHOICES]:
+                        decision_key = _decision_key(
+                            scan_object.id,
+                            decision_data['decision'],
+                            created,
+                            creator.id if creator else None,
+                        )
+                        if decision_key in existing_decisions:
+                            # this decision was already imported, or made in MIQA and exported
+                            continue
                         decision = ScanDecision(
                             decision=decision_data['decision'],
                             creator=creator,
@@ -265,49 +679,114 @@ def perform_import(import_dict):
                             scan=scan_object,
                         )
                         new_scan_decisions.append(decision)
-                new_scans.append(scan_object)
+                        decided_scan_ids.setdefault(project_object, set()).add(scan_object.id)
                 for frame_number, frame_data in scan_data['frames'].items():
                     if frame_data['file_location']:
-                        frame_object = Frame(
-                            frame_number=frame_number,
-                            raw_path=frame_data['file_location'],
-                            scan=scan_object,
+                        frame_object = existing_frames.pop(
+                            (scan_object.id, int(frame_number)), None
                         )
-                        new_frames.append(frame_object)
+                        if frame_object is None:
+                            frame_object = Frame(
+                                frame_number=frame_number,
+                                raw_path=frame_data['file_location'],
+                                scan=scan_object,
+                            )
+                            new_frames.append(frame_object)
+                        else:
+                            frame_object.scan = scan_object
+                            kept_frames.append(frame_object)
+                            if frame_object.raw_path == frame_data['file_location']:
+                                if scan_retyped:
+                                    changed_frames.append(frame_object)
+                                continue
+                            frame_object.raw_path = frame_data['file_location']
+                            changed_frames.append(frame_object)
                         if settings.ZARR_SUPPORT and Path(frame_object.raw_path).exists():
                             nifti_to_zarr_ngff.delay(frame_data['file_location'])
 
+        if prune:
+            # anything not listed in the import file anymore is removed
+            stale_experiments += existing_experiments.values()
+            stale_scans += existing_scans.values()
+            stale_frames += existing_frames.values()
+
+    # ids are assigned on instantiation, so pruning can match on ids in linear time
+    scans_with_frames = {frame.scan_id for frame in new_frames + kept_frames}
     # if any scan has no frames, it should not be created
-    new_scans = [
-        new_scan
-        for new_scan in new_scans
-        if any(new_frame.scan == new_scan for new_frame in new_frames)
-    ]
-    # if any experiment has no scans, it should not be created
+    new_scans = [scan for scan in new_scans if scan.id in scans_with_frames]
+    if prune:
+        # existing scans left empty by an incremental import are removed
+        stale_scans += [scan for scan in kept_scans if scan.id not in scans_with_frames]
+        kept_scans = [scan for scan in kept_scans if scan.id in scans_with_frames]
+    # likewise for experiments without scans
+    experiments_with_scans = {scan.experiment_id for scan in new_scans + kept_scans}
     new_experiments = [
-        new_experiment
-        for new_experiment in new_experiments
-        if any(new_scan.experiment == new_experiment for new_scan in new_scans)
+        experiment for experiment in new_experiments if experiment.id in experiments_with_scans
+    ]
+    if prune:
+        stale_experiments += [
+            experiment
+            for experiment in kept_experiments
+            if experiment.id not in experiments_with_scans
+        ]
+    # decisions can only be attached to scans that will exist
+    remaining_scans = {scan.id for scan in new_scans + kept_scans}
+    new_scan_decisions = [
+        decision for decision in new_scan_decisions if decision.scan_id in remaining_scans
     ]
 
-    Project.objects.bulk_create(new_projects)
-    Experiment.objects.bulk_create(new_experiments)
-    Scan.objects.bulk_create(new_scans)
-    Frame.objects.bulk_create(new_frames)
-    ScanDecision.objects.bulk_create(new_scan_decisions)
+    Frame.objects.filter(id__in=[frame.id for frame in stale_frames]).delete()
+    Scan.objects.filter(id__in=[scan.id for scan in stale_scans]).delete()
+    Experiment.objects.filter(id__in=[experiment.id for experiment in stale_experiments]).delete()
+    # kept scans given new decisions count as changed for delta exports, since imported decisions
+    # may have been created long ago
+    scans_with_new_decisions = {decision.scan_id for decision in new_scan_decisions}
+    changed_scan_ids = {scan.id for scan in changed_scans}
+    changed_scans += [
+        scan
+        for scan in kept_scans
+        if scan.id in scans_with_new_decisions and scan.id not in changed_scan_ids
+    ]
+    # bulk_update does not set modification times, which delta exports compare to watermarks
+    modified = timezone.now()
+    for changed_object in changed_experiments + changed_scans + changed_frames:
+        changed_object.modified = modified
+    Experiment.objects.bulk_update(changed_experiments, ['note', 'modified'])
+    Scan.objects.bulk_update(
+        changed_scans, ['scan_type', 'subject_id', 'session_id', 'scan_link', 'modified']
+    )
+    Frame.objects.bulk_update(changed_frames, ['raw_path', 'modified'])
+    # evaluations of changed frames are out of date and will be recomputed
+    Evaluation.objects.filter(frame__in=changed_frames).delete()
 
-    # must use str, not UUID, to get sent to celery task properly
-    frames_by_project: Dict[str, List[str]] = {}
-    for frame in new_frames:
-        project_id = str(frame.scan.experiment.project.id)
-        if project_id not in frames_by_project:
-            frames_by_project[project_id] = []
-        frames_by_project[project_id].append(str(frame.id))
-    evaluate_data.delay(frames_by_project)
+    bulk_load(Project, new_projects)
+    bulk_load(Experiment, new_experiments)
+    bulk_load(Scan, new_scans)
+    bulk_load(Frame, new_frames)
+    bulk_load(ScanDecision, new_scan_decisions)
+    for project_object, scan_ids in decided_scan_ids.items():
+        project_object.update_review_states(Scan.objects.filter(id__in=scan_ids & remaining_scans))
+    if prune:
+        for project_object in imported_projects:
+            ProjectStatistics.refresh(project_object.id)
 
+    # workers can only see the frames once they are committed
+    evaluated_frames = new_frames + changed_frames
 
-def export_data(project_id: Optional[str]):
+    def enqueue():
+        _report_progress(job, 'enqueue_evaluation')
+        enqueue_evaluation(evaluated_frames)
+
+    transaction.on_commit(enqueue)
+    return [str(frame.id) for frame in new_frames + kept_frames]
+
+
+def export_data(
+    project_id: Optional[str], job: Optional[ImportExportJob] = None, delta: bool = False
+):
     if not project_id:
+        if delta:
+            raise APIException('Delta exports are only available for single projects.')
         export_path = GlobalSettings.load().export_path
     else:
         project = Project.objects.get(id=project_id)
@@ -316,89 +795,326 @@ def export_data(project_id: Optional[str]):
     if not parent_location.exists():
         raise APIException(f'No such location {parent_location} to create export file.')
 
-    return perform_export(project_id)
+    if delta:
+        return perform_delta_export(project_id, job)
+    return perform_export(project_id, job)
 
 
-@shared_task
-def perform_export(project_id: Optional[str]):
-    data = {'projects': {}}
-    export_warnings = []
+def _ordered_group_lookup(rows: Iterable[dict], key: str):
+    """
+    Return a function that gets the rows with a given key from rows ordered by that key.
+
+    Keys must be looked up in the same order as the rows, so that only one group is held in
+    memory at a time. Keys without rows get an empty list.
+    """
+    groups = groupby(rows, key=itemgetter(key))
+    current = next(groups, None)
+
+    def lookup(value) -> List[dict]:
+        nonlocal current
+        if current is None or current[0] != value:
+            return []
+        group = list(current[1])
+        current = next(groups, None)
+        return group
+
+    return lookup
+
+
+def _export_location(location: dict) -> Optional[str]:
+    if not location:
+        return None
+    return f'i={location["i"]};j={location["j"]};k={location["k"]}'
+
+
+def _export_decision(decision: dict) -> dict:
+    location = _export_location(decision['location'])
+    artifacts = ';'.join(
+        [
+            artifact
+            for artifact, value in decision['user_identified_artifacts'].items()
+            if value == 1
+        ]
+    )
+    return {
+        'decision': decision['decision'],
+        'creator': decision['creator__username'],
+        'note': decision['note'],
+        'created': datetime.strftime(decision['created'], '%Y-%m-%d %H:%M:%S')
+        if decision['created']
+        else None,
+        'user_identified_artifacts': artifacts if len(artifacts) > 0 else None,
+        'location': location,
+    }
+
+
+def _export_typed_decision(decision: dict) -> dict:
+    # for typed export formats, the creation time stays a datetime and artifacts a list of names
+    return {
+        'decision': decision['decision'],
+        'creator': decision['creator__username'],
+        'note': decision['note'],
+        'created': decision['created'],
+        'user_identified_artifacts': [
+            artifact
+            for artifact, value in decision['user_identified_artifacts'].items()
+            if value == 1
+        ],
+        'location': _export_location(decision['location']),
+    }
+
+
+def export_experiments(
+    project: Project,
+    job: Optional[ImportExportJob] = None,
+    export_decision: Callable[[dict], dict] = _export_decision,
+    since: Optional[datetime] = None,
+) -> Iterator[tuple]:
+    """
+    Yield the name, notes and scans of every experiment of a project, in export order.
+
+    The scans of each experiment are yielded lazily as (name, scan data) pairs. Scans, frames
+    and decisions are read with one ordered query each and matched up as they stream in, so
+    memory use does not grow with the size of the project.
+
+    With since, only scans that changed after that time are exported, along with all of their
+    frames and decisions. A scan changed if it, its experiment or one of its frames was modified,
+    or if one of its decisions was created.
+    """
+    project_scans = Scan.objects.filter(experiment__project=project)
+    project_frames = Frame.objects.filter(scan__experiment__project=project)
+    project_decisions = ScanDecision.objects.filter(scan__experiment__project=project)
+    project_experiments = project.experiments.all()
+    if since:
+        changed_scans = project_scans.filter(
+            Q(modified__gt=since)
+            | Q(experiment__modified__gt=since)
+            | Q(frames__modified__gt=since)
+            | Q(decisions__created__gt=since)
+        ).values('id')
+        project_scans = project_scans.filter(id__in=changed_scans)
+        project_frames = project_frames.filter(scan__in=changed_scans)
+        project_decisions = project_decisions.filter(scan__in=changed_scans)
+        project_experiments = project_experiments.filter(
+            id__in=project_scans.values('experiment_id')
+        )
+
+    experiment_order = ['experiment__name', 'experiment_id', 'name', 'id']
+    scans = _ordered_group_lookup(
+        project_scans.order_by(*experiment_order)
+        .values('id', 'experiment_id', 'name', 'scan_type', 'subject_id', 'session_id', 'scan_link')
+        .iterator(),
+        'experiment_id',
+    )
+    scan_order = [f'scan__{field}' for field in experiment_order]
+    frames = _ordered_group_lookup(
+        project_frames.order_by(*scan_order, 'frame_number')
+        .values('scan_id', 'frame_number', 'raw_path')
+        .iterator(),
+        'scan_id',
+    )
+    decisions = _ordered_group_lookup(
+        project_decisions.order_by(*scan_order, '-created')
+        .values(
+            'scan_id',
+            'decision',
+            'creator__username',
+            'note',
+            'created',
+            'user_identified_artifacts',
+            'location',
+        )
+        .iterator(),
+        'scan_id',
+    )
+
+    unreported_frames = 0
+
+    def experiment_scans(experiment_id):
+        nonlocal unreported_frames
+        for scan in scans(experiment_id):
+            scan_frames = frames(scan['id'])
+            scan_decisions = decisions(scan['id'])
+            if not scan_frames:
+                # a scan without frames cannot be imported again
+                continue
+            if job:
+                job.rows_processed += len(scan_frames)
+                unreported_frames += len(scan_frames)
+                if unreported_frames >= EXPORT_PROGRESS_INTERVAL:
+                    job.update_progress()
+                    unreported_frames = 0
+            yield scan['name'], {
+                'frames': {
+                    frame['frame_number']: {'file_location': frame['raw_path']}
+                    for frame in scan_frames
+                },
+                'decisions': [export_decision(decision) for decision in scan_decisions],
+                'type': scan['scan_type'],
+                'subject_id': scan['subject_id'],
+                'session_id': scan['session_id'],
+                'scan_link': scan['scan_link'],
+            }
+
+    for experiment in project_experiments.order_by('name', 'id').values('id', 'name', 'note'):
+        yield experiment['name'], experiment['note'], experiment_scans(experiment['id'])
+
 
+def _write_json_export(
+    fd, projects: Iterable[Project], job: Optional[ImportExportJob], since: Optional[datetime]
+):
+    # the same output as json.dump of the nested export dict, written one scan at a time
+    fd.write('{"projects": {')
+    for project_index, project in enumerate(projects):
+        fd.write(', ' * bool(project_index) + json.dumps(project.name) + ': {"experiments": {')
+        for experiment_index, (name, notes, scans) in enumerate(
+            export_experiments(project, job, since=since)
+        ):
+            fd.write(', ' * bool(experiment_index) + json.dumps(name) + ': {"scans": {')
+            for scan_index, (scan_name, scan_data) in enumerate(scans):
+                fd.write(
+                    ', ' * bool(scan_index) + json.dumps(scan_name) + ': ' + json.dumps(scan_data)
+                )
+            fd.write('}, "notes": ' + json.dumps(notes) + '}')
+        fd.write('}}')
+    fd.write('}}')
+
+
+def _write_csv_export(
+    fd, projects: Iterable[Project], job: Optional[ImportExportJob], since: Optional[datetime]
+):
+    writer = csv.writer(fd, lineterminator='\n')
+    writer.writerow(IMPORT_CSV_COLUMNS)
+    for project in projects:
+        for experiment_name, notes, scans in export_experiments(project, job, since=since):
+            experiment_data = {'notes': notes}
+            for scan_name, scan_data in scans:
+                values = scan_row_values(
+                    project.name, experiment_name, experiment_data, scan_name, scan_data
+                )
+                for frame_number, frame_data in scan_data['frames'].items():
+                    values[4:6] = frame_number, frame_data['file_location']
+                    writer.writerow(values)
+
+
+def _parquet_export_rows(
+    projects: Iterable[Project], job: Optional[ImportExportJob], since: Optional[datetime]
+):
+    for project in projects:
+        for experiment_name, notes, scans in export_experiments(
+            project, job, _export_typed_decision, since
+        ):
+            for scan_name, scan_data in scans:
+                yield from parquet_scan_rows(
+                    project.name, experiment_name, notes, scan_name, scan_data
+                )
+
+
+@shared_task
+def perform_export(project_id: Optional[str], job: Optional[ImportExportJob] = None):
     if project_id is None:
         # A global export should export all projects
-        project = None
-        projects = list(Project.objects.all())
+        projects = Project.objects.all()
         export_path = GlobalSettings.load().export_path
     else:
         # A normal export should only export the current project
-        project = Project.objects.get(id=project_id)
-        projects = [project]
-        export_path = project.export_path
+        projects = Project.objects.filter(id=project_id)
+        export_path = Project.objects.values_list('export_path', flat=True).get(id=project_id)
 
-    for project_object in projects:
-        project_data = {'experiments': {}}
-        for experiment_object in project_object.experiments.all():
-            experiment_data = {'scans': {}, 'notes': experiment_object.note}
-            for scan_object in experiment_object.scans.all():
-                scan_data = {
-                    'frames': {},
-                    'decisions': [],
-                    'type': scan_object.scan_type,
-                    'subject_id': scan_object.subject_id,
-                    'session_id': scan_object.session_id,
-                    'scan_link': scan_object.scan_link,
-                }
-                for frame_object in scan_object.frames.all():
-                    scan_data['frames'][frame_object.frame_number] = {
-                        'file_location': frame_object.raw_path
-                    }
-                for decision_object in scan_object.decisions.all():
-                    location = None
-                    if decision_object.location:
-                        location = (
-                            f'i={decision_object.location["i"]};'
-                            f'j={decision_object.location["j"]};'
-                            f'k={decision_object.location["k"]}'
-                        )
-                    artifacts = ';'.join(
-                        [
-                            artifact
-                            for artifact, value in decision_object.user_identified_artifacts.items()
-                            if value == 1
-                        ]
-                    )
-                    scan_data['decisions'].append(
-                        {
-                            'decision': decision_object.decision,
-                            'creator': decision_object.creator.username
-                            if decision_object.creator
-                            else None,
-                            'note': decision_object.note,
-                            'created': datetime.strftime(
-                                decision_object.created, '%Y-%m-%d %H:%M:%S'
-                            )
-                            if decision_object.created
-                            else None,
-                            'user_identified_artifacts': artifacts if len(artifacts) > 0 else None,
-                            'location': location,
-                        }
-                    )
-                experiment_data['scans'][scan_object.name] = scan_data
-            project_data['experiments'][experiment_object.name] = experiment_data
-        data['projects'][project_object.name] = project_data
-    data, export_warnings = validate_import_dict(data, project)
+    # everything exported comes from the database, so the file locations were already validated
+    # on import and are not checked again
+    _report_progress(job, 'write')
+    _write_export(export_path, projects, job)
+    _report_progress(job)
+    return []
+
+
+def delta_export_path(export_path: str, sequence: int) -> str:
+    """Return the path of a numbered delta export, next to the full export path."""
+    path = Path(export_path)
+    return str(path.with_name(f'{path.stem}.delta-{sequence:06d}{path.suffix}'))
+
+
+@shared_task
+def perform_delta_export(project_id: str, job: Optional[ImportExportJob] = None):
+    """
+    Export the scans of a project that changed since its last delta export.
+
+    Each delta export writes a new numbered file next to the project's export path, in the same
+    format, and never overwrites an earlier one. The first delta export of a project holds all
+    of it. Scans removed since the last delta export are not recorded.
+    """
+    project = Project.objects.get(id=project_id)
+    # changes made while this export runs are picked up by the next one
+    started = timezone.now()
+    since = None
+    if project.delta_export_watermark:
+        since = project.delta_export_watermark - DELTA_EXPORT_OVERLAP
+    sequence = project.delta_export_sequence + 1
+    export_path = delta_export_path(project.export_path, sequence)
+    if Path(export_path).exists():
+        raise APIException(f'Delta export file {export_path} already exists.')
+
+    _report_progress(job, 'write')
+    _write_export(export_path, [project], job, since)
+    Project.objects.filter(id=project.id).update(
+        delta_export_watermark=started, delta_export_sequence=sequence
+    )
+    _report_progress(job)
+    return []
 
+
+@shared_task
+def delta_export_projects():
+    # run by celery beat when DELTA_EXPORT_INTERVAL_HOURS is set
+    for project_id in (
+        Project.objects.filter(archived=False).exclude(export_path='').values_list('id', flat=True)
+    ):
+        perform_delta_export.delay(str(project_id))
+
+
+def _write_export(
+    export_path: str,
+    projects: Iterable[Project],
+    job: Optional[ImportExportJob],
+    since: Optional[datetime] = None,
+):
     try:
         if export_path.endswith('csv'):
-            export_df = import_dict_to_dataframe(data)
-            export_df.to_csv(export_path, index=False)
+            with open(export_path, 'w', newline='') as fd:
+                _write_csv_export(fd, projects, job, since)
+        elif export_path.endswith('parquet'):
+            write_parquet(export_path, _parquet_export_rows(projects, job, since))
         elif export_path.endswith('json'):
             with open(export_path, 'w') as fd:
-                json.dump(data, fd)
+                _write_json_export(fd, projects, job, since)
         else:
             raise APIException(
-                f'Unknown format for export path {export_path}. Expected csv or json.'
+                f'Unknown format for export path {export_path}. Expected csv, parquet or json.'
             )
     except PermissionError:
         raise APIException(f'MIQA lacks permission to write to {export_path}.')
-    return export_warnings
+
+
+@shared_task
+def run_import_export_job(job_id: str):
+    job = ImportExportJob.objects.select_related('project').get(id=job_id)
+    job.started = timezone.now()
+    job.save(update_fields=['started', 'modified'])
+    project_id = str(job.project.id) if job.project else None
+    try:
+        if job.kind == 'import':
+            job.warnings = import_data(project_id, job.incremental, job)
+        else:
+            job.warnings = export_data(project_id, job, delta=job.incremental)
+        job.phase = 'done'
+    except APIException as e:
+        job.phase = 'failed'
+        job.error = str(e.detail)
+    except Exception:
+        job.phase = 'failed'
+        job.error = f'The {job.kind} failed due to a server error.'
+        raise
+    finally:
+        job.finished = timezone.now()
+        job.save()
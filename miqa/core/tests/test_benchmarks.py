@@ -0,0 +1,253 @@
+"""
+Scaling benchmarks for bulk code paths.
+
+Rather than asserting absolute timings, which depend on the machine, these tests time the same
+operation at two sizes and assert that the cost grows roughly linearly, or time two
+implementations of an operation against each other.
+"""
+import csv
+import time
+from uuid import uuid4
+
+from django.db import connection
+import pandas
+import pytest
+from rest_framework.exceptions import APIException
+
+from miqa.core.conversion.import_export_csvs import IMPORT_CSV_COLUMNS, import_dataframe_to_dict
+from miqa.core.ids import uuid7
+from miqa.core.models import Frame
+from miqa.core.tasks import import_data
+
+# multiplier between the small and the large run of each benchmark
+SCALE = 4
+# a linear operation may take this many times longer per unit on the large run before failing;
+# a quadratic one takes about SCALE times longer
+LINEAR_TOLERANCE = 2
+# rows inserted by the primary key benchmark, in batches like those of a large import
+PRIMARY_KEY_ROWS = 200000
+PRIMARY_KEY_BATCH_SIZE = 10000
+# time-ordered keys fill the pages of their index, where random keys leave them about 70% full
+MAX_ORDERED_INDEX_SIZE_RATIO = 0.85
+# how many times faster CSV conversion must be than the row by row reference
+MIN_CONVERSION_SPEEDUP = 10
+
+
+def best_time(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def assert_linear(small_time, large_time):
+    assert large_time < small_time * SCALE * LINEAR_TOLERANCE, (
+        f'{SCALE}x the input took {large_time / small_time:.1f}x as long '
+        f'({small_time:.3f}s vs {large_time:.3f}s)'
+    )
+
+
+def write_import_csv(path, project_name, image_file, scans, frames_per_scan=2):
+    with open(path, 'w', newline='') as fd:
+        writer = csv.writer(fd)
+        writer.writerow(IMPORT_CSV_COLUMNS)
+        for scan_index in range(scans):
+            for frame_number in range(frames_per_scan):
+                writer.writerow(
+                    [
+                        project_name,
+                        f'experiment_{scan_index // 10}',
+                        f'scan_{scan_index}',
+                        'T1',
+                        frame_number,
+                        str(image_file),
+                        'notes',
+                        f'subject_{scan_index}',
+                        f'session_{scan_index}',
+                        '',
+                        'U',
+                        '',
+                        'note',
+                        '2022-01-01 12:00',
+                        'lesions',
+                        'i=1;j=2;k=3',
+                    ]
+                )
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_import_scales_linearly(tmp_path, project_factory, mocker):
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    image_file = tmp_path / 'image.nii.gz'
+    image_file.touch()
+    project = project_factory(name='benchmark')
+
+    def time_import(scans):
+        project.import_path = str(tmp_path / f'import_{scans}.csv')
+        project.save()
+        write_import_csv(project.import_path, project.name, image_file, scans)
+        elapsed = best_time(lambda: import_data(project.id))
+        assert Frame.objects.filter(scan__experiment__project=project).count() == scans * 2
+        return elapsed
+
+    assert_linear(time_import(250), time_import(250 * SCALE))
+
+
+def import_dataframe(scans):
+    rows = [
+        [
+            'benchmark',
+            f'experiment_{scan_index // 10}',
+            f'scan_{scan_index}',
+            'T1',
+            str(frame_number),
+            f'/data/scan_{scan_index}/{frame_number}.nii.gz',
+            'notes',
+            f'subject_{scan_index}',
+            f'session_{scan_index}',
+            '',
+            'U',
+            'reviewer@miqa.test',
+            'note',
+            '2022-01-01 12:00:00',
+            'lesions',
+            'i=1;j=2;k=3',
+        ]
+        for scan_index in range(scans)
+        for frame_number in range(2)
+    ]
+    return pandas.DataFrame(rows, columns=IMPORT_CSV_COLUMNS)
+
+
+def row_by_row_import_dataframe_to_dict(df, project):
+    """Convert import CSVs like before the conversion became a single pass, for reference."""
+    df_columns = list(df.columns)
+    # The columns after the first 6 are optional
+    if df_columns != IMPORT_CSV_COLUMNS and (
+        len(df_columns) < 6 or df_columns != IMPORT_CSV_COLUMNS[: len(df_columns)]
+    ):
+        raise APIException(
+            'Import file has invalid columns. '
+            f'Expected {IMPORT_CSV_COLUMNS}, received {df_columns}.'
+        )
+    ingest_dict = {'projects': {}}
+    for project_name, project_df in df.groupby('project_name'):
+        if project and project_name != project.name:
+            raise APIException(
+                f'Import file contains rows for project "{project_name}, " \
+                which does not match "{project.name}." Import failed.'
+            )
+        project_dict = {'experiments': {}}
+        if list(project_df['experiment_name'].unique()) != ['']:
+            for experiment_name, experiment_df in project_df.groupby('experiment_name'):
+                experiment_dict = {'scans': {}}
+                if 'experiment_notes' in experiment_df.columns:
+                    experiment_dict['notes'] = experiment_df['experiment_notes'].iloc[0]
+                for scan_name, scan_df in experiment_df.groupby('scan_name'):
+                    scan_dict = {}
+                    if list(scan_df['file_location'].unique()) != ['']:
+                        try:
+                            scan_dict = {
+                                'type': scan_df['scan_type'].iloc[0],
+                                'frames': {
+                                    int(row[1]['frame_number']): {
+                                        'file_location': row[1]['file_location']
+                                    }
+                                    for row in scan_df.iterrows()
+                                },
+                                'decisions': [],
+                            }
+                        except ValueError as e:
+                            raise APIException(
+                                f'Invalid frame number {str(e).split(":")[-1]}.'
+                                f' Must be an integer value.'
+                            )
+                        if 'subject_id' in scan_df.columns:
+                            scan_dict['subject_id'] = scan_df['subject_id'].iloc[0]
+                        if 'session_id' in scan_df.columns:
+                            scan_dict['session_id'] = scan_df['session_id'].iloc[0]
+                        if 'scan_link' in scan_df.columns:
+                            scan_dict['scan_link'] = scan_df['scan_link'].iloc[0]
+                        if 'last_decision' in scan_df.columns and scan_df['last_decision'].iloc[0]:
+                            decision_dict = {
+                                'decision': scan_df['last_decision'].iloc[0],
+                                'creator': scan_df['last_decision_creator'].iloc[0],
+                                'note': scan_df['last_decision_note'].iloc[0],
+                                'created': str(scan_df['last_decision_created'].iloc[0])
+                                if scan_df['last_decision_created'].iloc[0]
+                                else None,
+                                'user_identified_artifacts': scan_df['identified_artifacts'].iloc[0]
+                                or None,
+                                'location': scan_df['location_of_interest'].iloc[0] or None,
+                            }
+                            decision_dict = {k: (v or None) for k, v in decision_dict.items()}
+                            scan_dict['decisions'].append(decision_dict)
+
+                        # added for BIDS import
+                        if 'subject_ID' in scan_df.columns:
+                            scan_dict['subject_ID'] = scan_df['subject_ID'].iloc[0]
+                        if 'session_ID' in scan_df.columns:
+                            scan_dict['session_ID'] = scan_df['session_ID'].iloc[0]
+                        # ---- end of BIDS support addition
+
+                        experiment_dict['scans'][scan_name] = scan_dict
+                project_dict['experiments'][experiment_name] = experiment_dict
+        ingest_dict['projects'][project_name] = project_dict
+    return ingest_dict
+
+
+@pytest.mark.benchmark
+def test_csv_conversion_throughput():
+    def conversion_time(scans):
+        df = import_dataframe(scans)
+        return best_time(lambda: import_dataframe_to_dict(df, None))
+
+    small_time = conversion_time(5000)
+    large_time = conversion_time(5000 * SCALE)
+    assert_linear(small_time, large_time)
+
+
+@pytest.mark.benchmark
+def test_csv_conversion_speedup():
+    df = import_dataframe(1000)
+    assert import_dataframe_to_dict(df, None) == row_by_row_import_dataframe_to_dict(df, None)
+
+    conversion_time = best_time(lambda: import_dataframe_to_dict(df, None))
+    reference_time = best_time(lambda: row_by_row_import_dataframe_to_dict(df, None), repeat=1)
+    assert conversion_time * MIN_CONVERSION_SPEEDUP < reference_time, (
+        f'conversion took {conversion_time:.3f}s, '
+        f'{reference_time / conversion_time:.1f}x faster than row by row ({reference_time:.3f}s)'
+    )
+
+
+@pytest.mark.benchmark
+@pytest.mark.django_db
+def test_time_ordered_primary_key_inserts():
+    def insert(id_function):
+        table = f'benchmark_{id_function.__name__}'
+        batches = [
+            [str(id_function()) for _ in range(PRIMARY_KEY_BATCH_SIZE)]
+            for _ in range(PRIMARY_KEY_ROWS // PRIMARY_KEY_BATCH_SIZE)
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {table} (id uuid PRIMARY KEY)')
+
+            def insert_batches():
+                cursor.execute(f'TRUNCATE {table}')
+                for batch in batches:
+                    cursor.execute(f'INSERT INTO {table} SELECT unnest(%s::uuid[])', [batch])
+
+            elapsed = best_time(insert_batches)
+            cursor.execute('SELECT pg_relation_size(%s)', [f'{table}_pkey'])
+            return elapsed, cursor.fetchone()[0]
+
+    random_time, random_index_size = insert(uuid4)
+    ordered_time, ordered_index_size = insert(uuid7)
+    assert ordered_index_size < random_index_size * MAX_ORDERED_INDEX_SIZE_RATIO
+    assert ordered_time < random_time, (
+        f'time-ordered keys inserted {PRIMARY_KEY_ROWS / ordered_time:.0f} rows per second, '
+        f'random keys {PRIMARY_KEY_ROWS / random_time:.0f}'
+    )
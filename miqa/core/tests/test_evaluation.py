@@ -0,0 +1,104 @@
+import pytest
+
+from miqa.core.models import Evaluation
+from miqa.core.tasks import (
+    EVALUATION_CHUNK_SIZE,
+    S3_PREFETCH_MAX_PENDING,
+    _group_frames_by_evaluation_model,
+    _local_frame_path,
+    _prefetch_frames,
+    evaluation_chunks,
+)
+
+
+@pytest.mark.django_db
+def test_prefetch_frames_streams_in_order(tmp_path, frame_factory, mocker):
+    frames = [frame_factory(raw_path=f's3://bucket/scan{i}/image.nii.gz') for i in range(12)]
+
+    def fake_download(path, public, dest):
+        dest.write_text(path)
+        return dest
+
+    mocker.patch('miqa.core.tasks._download_s3_file', side_effect=fake_download)
+    file_paths = {frame: _local_frame_path(frame, tmp_path) for frame in frames}
+
+    # identical file names from different scans must not collide in the temp directory
+    assert len(set(file_paths.values())) == len(frames)
+    for index, local_path in enumerate(_prefetch_frames(frames, file_paths)):
+        assert local_path == file_paths[frames[index]]
+        assert local_path.read_text() == frames[index].raw_path
+        assert len(list(tmp_path.iterdir())) <= S3_PREFETCH_MAX_PENDING
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.django_db
+def test_prefetch_frames_keeps_local_files(tmp_path, frame_factory, mocker):
+    local_file = tmp_path / 'image.nii.gz'
+    local_file.write_text('local')
+    frame = frame_factory(raw_path=str(local_file))
+    download = mocker.patch('miqa.core.tasks._download_s3_file')
+
+    file_paths = {frame: _local_frame_path(frame, tmp_path)}
+    assert list(_prefetch_frames([frame], file_paths)) == [local_file]
+    assert local_file.exists()
+    download.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_evaluation_chunks_are_model_homogeneous(experiment, scan_factory, frame_factory):
+    t1_scan = scan_factory(experiment=experiment, scan_type='T1')
+    dti_scan = scan_factory(experiment=experiment, scan_type='DTI')
+    unmapped_scan = scan_factory(experiment=experiment, scan_type='CT')
+    t1_frames = [frame_factory(scan=t1_scan) for i in range(EVALUATION_CHUNK_SIZE + 1)]
+    dti_frames = [frame_factory(scan=dti_scan) for i in range(2)]
+    frame_factory(scan=unmapped_scan)
+
+    chunks = evaluation_chunks(t1_frames + dti_frames + list(unmapped_scan.frames.all()))
+
+    project_id = str(experiment.project.id)
+    assert [len(chunk[project_id]) for chunk in chunks] == [EVALUATION_CHUNK_SIZE, 1, 2]
+    assert chunks[0][project_id] + chunks[1][project_id] == [str(frame.id) for frame in t1_frames]
+    assert chunks[2][project_id] == [str(frame.id) for frame in dti_frames]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('frames_per_scan', [1, 25])
+def test_group_frames_by_evaluation_model_query_count(
+    experiment_factory, scan_factory, frame_factory, django_assert_num_queries, frames_per_scan
+):
+    frames = []
+    for experiment in [experiment_factory(), experiment_factory()]:
+        for scan_type in ['T1', 'DTI']:
+            scan = scan_factory(experiment=experiment, scan_type=scan_type)
+            frames += [
+                frame_factory(scan=scan, raw_path=f's3://bucket/{scan.id}/{i}.nii.gz')
+                for i in range(frames_per_scan)
+            ]
+    Evaluation.objects.create(frame=frames[0], evaluation_model='MIQAMix-0', results={})
+
+    # one query resolves every frame and project, however many frames there are
+    with django_assert_num_queries(1):
+        frames_by_model = _group_frames_by_evaluation_model([str(frame.id) for frame in frames])
+        for model_frames in frames_by_model.values():
+            for frame in model_frames:
+                assert frame.scan.experiment.project.s3_public is False
+
+    assert sum(len(model_frames) for model_frames in frames_by_model.values()) == len(frames) - 1
+    assert {frame.scan.scan_type for frame in frames_by_model['MIQAT1-0']} == {'DTI'}
+    assert {frame.scan.scan_type for frame in frames_by_model['MIQAMix-0']} == {'T1'}
+
+
+def test_preload_skips_models_that_fail_to_load(mocker):
+    evaluation_models = pytest.importorskip('miqa.learning.evaluation_models')
+    working, broken = mocker.Mock(), mocker.Mock()
+    working.load.return_value = object()
+    broken.load.side_effect = FileNotFoundError('miqaT1-val0.pth')
+    registry = evaluation_models.EvaluationModelRegistry({'working': working, 'broken': broken})
+
+    registry.preload()
+    assert registry.stats().keys() == {'working'}
+
+    # the model is loaded when an evaluation needs it
+    broken.load.side_effect = None
+    broken.load.return_value = object()
+    assert registry.get('broken') is broken.load.return_value
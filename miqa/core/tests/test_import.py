@@ -1,18 +1,41 @@
+from datetime import timedelta
 import json
+import os
 from pathlib import Path
 import re
 
-from guardian.shortcuts import get_perms
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from guardian.shortcuts import assign_perm, get_perms
 import pytest
 from rest_framework.exceptions import APIException
 
-from miqa.core.conversion.import_export_csvs import IMPORT_CSV_COLUMNS
-from miqa.core.models import Frame, GlobalSettings
-from miqa.core.tasks import import_data
+from miqa.core.conversion.import_export_csvs import IMPORT_CSV_COLUMNS, validate_file_locations
+from miqa.core.models import (
+    Evaluation,
+    Frame,
+    GlobalSettings,
+    ImportExportJob,
+    ProjectStatistics,
+    Scan,
+    ScanDecision,
+)
+from miqa.core.models.import_export_job import PROGRESS_DATABASE
+from miqa.core.tasks import (
+    evaluation_chunks,
+    import_data,
+    perform_delta_export,
+    perform_export,
+    perform_import,
+)
 from miqa.core.tests.helpers import generate_import_csv, generate_import_json
 
+# tests running import and export jobs, which write their progress through a database of its own
+JOB_DATABASES = ['default', PROGRESS_DATABASE]
 
-@pytest.mark.django_db
+
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_empty_csv(tmp_path, user, project_factory, user_api_client):
     csv_file = str(tmp_path / 'import.csv')
     with open(csv_file, 'w') as fd:
@@ -23,14 +46,15 @@ def test_import_empty_csv(tmp_path, user, project_factory, user_api_client):
 
     resp = user_api_client.post(f'/api/v1/projects/{project.id}/import')
     if get_perms(user, project):
-        assert resp.status_code == 204
+        assert resp.status_code == 202
+        assert resp.data['phase'] == 'done'
         project.refresh_from_db()
         assert project.experiments.count() == 0
     else:
         assert resp.status_code == 403
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_csv(tmp_path, user, project_factory, sample_scans, user_api_client):
     csv_file = str(tmp_path / 'import.csv')
     with open(csv_file, 'w') as fd:
@@ -42,7 +66,8 @@ def test_import_csv(tmp_path, user, project_factory, sample_scans, user_api_clie
 
     resp = user_api_client.post(f'/api/v1/projects/{project.id}/import')
     if get_perms(user, project):
-        assert resp.status_code == 204
+        assert resp.status_code == 202
+        assert resp.data['phase'] == 'done'
         project.refresh_from_db()
         assert project.experiments.count() == 1
         assert project.experiments.all()[0].scans.count() == 1
@@ -50,7 +75,7 @@ def test_import_csv(tmp_path, user, project_factory, sample_scans, user_api_clie
         assert resp.status_code == 403
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_csv_optional_columns(user, project_factory, user_api_client):
     csv_file = Path('samples', 'scans_to_review_optional_columns.csv')
 
@@ -59,7 +84,8 @@ def test_import_csv_optional_columns(user, project_factory, user_api_client):
 
     resp = user_api_client.post(f'/api/v1/projects/{project.id}/import')
     if get_perms(user, project):
-        assert resp.status_code == 204
+        assert resp.status_code == 202
+        assert resp.data['phase'] == 'done'
         project.refresh_from_db()
         assert project.experiments.count() == 2
         assert project.experiments.all()[0].scans.count() == 1
@@ -68,7 +94,7 @@ def test_import_csv_optional_columns(user, project_factory, user_api_client):
         assert resp.status_code == 403
 
 
-@pytest.mark.django_db(transaction=True)
+@pytest.mark.django_db(transaction=True, databases=JOB_DATABASES)
 def test_import_global_csv(tmp_path, user, project_factory, sample_scans, user_api_client):
     csv_file = str(tmp_path / 'import.csv')
     with open(csv_file, 'w') as fd:
@@ -84,7 +110,8 @@ def test_import_global_csv(tmp_path, user, project_factory, sample_scans, user_a
     project_ucsd = project_factory(name='ucsd')
 
     resp = user_api_client().post('/api/v1/global/import')
-    assert resp.status_code == 204
+    assert resp.status_code == 202
+    assert resp.data['phase'] == 'done'
     project_ohsu.refresh_from_db()
     project_ucsd.refresh_from_db()
     assert project_ohsu.experiments.count() == 1
@@ -93,7 +120,7 @@ def test_import_global_csv(tmp_path, user, project_factory, sample_scans, user_a
     assert project_ucsd.experiments.get().scans.count() == 1
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_json(
     tmp_path: Path,
     user,
@@ -117,7 +144,8 @@ def test_import_json(
 
     resp = user_api_client(project=project).post(f'/api/v1/projects/{project.id}/import')
     if get_perms(user, project):
-        assert resp.status_code == 204
+        assert resp.status_code == 202
+        assert resp.data['phase'] == 'done'
         project.refresh_from_db()
         assert project.experiments.count() == 1
         assert project.experiments.all()[0].scans.count() == 1
@@ -125,7 +153,7 @@ def test_import_json(
         assert resp.status_code == 403
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_global_json(
     tmp_path: Path,
     user,
@@ -147,7 +175,8 @@ def test_import_global_json(
     project_ucsd = project_factory(import_path=json_file, name='ucsd')
 
     resp = user_api_client().post('/api/v1/global/import')
-    assert resp.status_code == 204
+    assert resp.status_code == 202
+    assert resp.data['phase'] == 'done'
     # The import should update the correctly named projects, but not the original import project
     project_ohsu.refresh_from_db()
     project_ucsd.refresh_from_db()
@@ -240,7 +269,7 @@ def test_import_s3_preserves_path(project_factory):
     )
 
 
-@pytest.mark.django_db
+@pytest.mark.django_db(databases=JOB_DATABASES)
 def test_import_export_unchanged(
     tmp_path: Path,
     user,
@@ -271,3 +300,512 @@ def test_import_export_unchanged(
 
     else:
         assert resp.status_code == 403
+
+
+@pytest.mark.django_db
+def test_import_incremental(
+    tmp_path: Path,
+    project_factory,
+    user,
+    mocker,
+    django_capture_on_commit_callbacks,
+    django_assert_num_queries,
+):
+    for name in ['a0', 'a1', 'a1-fixed', 'b0', 'c0', 'd0']:
+        (tmp_path / f'{name}.nii.gz').touch()
+
+    def import_contents(scans, notes):
+        return {
+            'projects': {
+                'ucsd': {
+                    'experiments': {
+                        experiment_name: {
+                            'notes': notes,
+                            'scans': {
+                                scan_name: {
+                                    'type': 'T1',
+                                    'frames': {
+                                        frame_number: {'file_location': str(tmp_path / file_name)}
+                                        for frame_number, file_name in enumerate(file_names)
+                                    },
+                                }
+                                for scan_name, file_names in experiment_scans.items()
+                            },
+                        }
+                        for experiment_name, experiment_scans in scans.items()
+                    }
+                }
+            }
+        }
+
+    import_file = tmp_path / 'import.json'
+    project = project_factory(name='ucsd', import_path=str(import_file))
+    enqueue_evaluation = mocker.patch('miqa.core.tasks.enqueue_evaluation')
+
+    import_file.write_text(
+        json.dumps(
+            import_contents(
+                {
+                    'exp1': {'scan_a': ['a0.nii.gz', 'a1.nii.gz'], 'scan_b': ['b0.nii.gz']},
+                    'exp2': {'scan_c': ['c0.nii.gz']},
+                },
+                'old notes',
+            )
+        )
+    )
+    import_data(project.id)
+    scan_a = Scan.objects.get(name='scan_a')
+    frame_a0, frame_a1 = scan_a.frames.all()
+    decision = ScanDecision.objects.create(scan=scan_a, creator=user, decision='U')
+    evaluation = Evaluation.objects.create(frame=frame_a0, evaluation_model='MIQAMix-0', results={})
+
+    import_file.write_text(
+        json.dumps(
+            import_contents(
+                {'exp1': {'scan_a': ['a0.nii.gz', 'a1-fixed.nii.gz'], 'scan_d': ['d0.nii.gz']}},
+                'new notes',
+            )
+        )
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        import_data(project.id, incremental=True)
+
+    experiment = project.experiments.get()
+    assert experiment.name == 'exp1'
+    assert experiment.note == 'new notes'
+    assert sorted(experiment.scans.values_list('name', flat=True)) == ['scan_a', 'scan_d']
+    assert experiment.scans.get(name='scan_a').id == scan_a.id
+    assert list(scan_a.decisions.all()) == [decision]
+    assert Evaluation.objects.filter(id=evaluation.id, frame=frame_a0).exists()
+    frame_a1.refresh_from_db()
+    assert frame_a1.raw_path == str(tmp_path / 'a1-fixed.nii.gz')
+
+    # only the changed and the new frame are queued for evaluation
+    queued_frames = enqueue_evaluation.call_args.args[0]
+    assert {frame.raw_path for frame in queued_frames} == {
+        str(tmp_path / 'a1-fixed.nii.gz'),
+        str(tmp_path / 'd0.nii.gz'),
+    }
+    # their scans, experiments and projects are already loaded
+    with django_assert_num_queries(0):
+        evaluation_chunks(queued_frames)
+
+
+@pytest.mark.django_db
+def test_import_resolves_decision_creators_and_dates(project_factory, user_factory, mocker):
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    project_factory(name='ucsd')
+    creators = [user_factory(email=f'reviewer{i}@miqa.test') for i in range(3)]
+    created = ['2022-01-01 12:00:31', '2022-01-02 13:05', 'Jan 3 2022 4pm', 'not a date']
+    decisions = [
+        {
+            'decision': 'U',
+            'creator': email,
+            'note': '',
+            'created': created_value,
+            'location': None,
+            'user_identified_artifacts': None,
+        }
+        for email in [creator.email for creator in creators] + ['unknown@miqa.test']
+        for created_value in created
+    ]
+    import_dict = {
+        'projects': {
+            'ucsd': {
+                'experiments': {
+                    'exp1': {
+                        'scans': {
+                            'scan1': {
+                                'type': 'T1',
+                                'decisions': decisions,
+                                'frames': {0: {'file_location': '/tmp/scan1.nii.gz'}},
+                            }
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+    with CaptureQueriesContext(connection) as context:
+        perform_import(import_dict)
+    # one query resolves every creator; the other user query finds the tier 2 reviewers
+    creator_queries = [
+        query for query in context.captured_queries if '"auth_user"."email" IN' in query['sql']
+    ]
+    assert len(creator_queries) == 1
+
+    imported = ScanDecision.objects.filter(scan__name='scan1')
+    assert imported.count() == len(decisions)
+    for creator in creators:
+        assert imported.filter(creator=creator).count() == len(created)
+    assert imported.filter(creator=None).count() == len(created)
+    # unparseable dates fall back to the creation time of the decision
+    assert {
+        timezone.localtime(decision.created).strftime('%Y-%m-%d %H:%M') for decision in imported
+    } >= {'2022-01-01 12:00', '2022-01-02 13:05', '2022-01-03 16:00'}
+    scan = Scan.objects.get(name='scan1')
+    # decisions without a creation time are not the latest
+    assert timezone.localtime(scan.latest_decision.created).strftime('%Y-%m-%d %H:%M') == (
+        '2022-01-03 16:00'
+    )
+    assert scan.review_state == 'complete'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('incremental', [False, True])
+def test_import_csv_in_chunks(tmp_path: Path, project_factory, mocker, incremental):
+    mocker.patch('miqa.core.tasks.IMPORT_CHUNK_SIZE', 3)
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    image_file = tmp_path / 'image.nii.gz'
+    image_file.touch()
+    csv_file = tmp_path / 'import.csv'
+    project = project_factory(name='ucsd', import_path=str(csv_file))
+
+    def write_rows(scans, frames_per_scan):
+        # 3 row chunks split the frames of a scan and the scans of an experiment
+        rows = [','.join(IMPORT_CSV_COLUMNS[:6])]
+        rows += [
+            f'ucsd,experiment_{scan // 2},scan_{scan},T1,{frame},{image_file}'
+            for scan in scans
+            for frame in range(frames_per_scan)
+        ]
+        csv_file.write_text('\n'.join(rows))
+
+    write_rows(range(4), 2)
+    refresh = mocker.spy(ProjectStatistics, 'refresh')
+    assert import_data(project.id) == []
+    # statistics are counted once, after the last chunk
+    assert refresh.call_count == 1
+    assert ProjectStatistics.objects.get(project=project).total_frames == 8
+    assert project.experiments.count() == 2
+    assert Scan.objects.filter(experiment__project=project).count() == 4
+    assert Frame.objects.filter(scan__experiment__project=project).count() == 8
+    scan_1 = Scan.objects.get(name='scan_1')
+
+    write_rows(range(1, 3), 1)
+    import_data(project.id, incremental=incremental)
+    assert sorted(project.experiments.values_list('name', flat=True)) == [
+        'experiment_0',
+        'experiment_1',
+    ]
+    scans = Scan.objects.filter(experiment__project=project)
+    assert sorted(scans.values_list('name', flat=True)) == ['scan_1', 'scan_2']
+    assert Frame.objects.filter(scan__experiment__project=project).count() == 2
+    # only incremental imports keep the existing scans
+    assert scans.filter(id=scan_1.id).exists() == incremental
+
+
+@pytest.mark.django_db
+def test_import_copy_matches_bulk_create(project_factory, user_factory, settings, mocker):
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    creator = user_factory(email='reviewer@miqa.test')
+    # characters that COPY escapes
+    note = 'tab\there\nnew line\\N \\ backslash, "quoted"'
+
+    def imported_rows(use_copy):
+        settings.IMPORT_USE_COPY = use_copy
+        project = project_factory(name=f'copy_{use_copy}')
+        decision = {
+            'decision': 'UN',
+            'creator': creator.email,
+            'note': note,
+            'created': '2022-01-01 12:00',
+            'location': 'i=1;j=2;k=3',
+            'user_identified_artifacts': 'lesions',
+        }
+        scans = {
+            'scan1': {
+                'type': 'T1',
+                'subject_id': None,
+                'decisions': [decision, {**decision, 'created': None, 'creator': None}],
+                'frames': {0: {'file_location': '/tmp/scan1.nii.gz'}},
+            }
+        }
+        perform_import(
+            {'projects': {project.name: {'experiments': {'exp1': {'notes': note, 'scans': scans}}}}}
+        )
+        scan = Scan.objects.get(experiment__project=project)
+        return (
+            scan.experiment.note,
+            scan.subject_id,
+            list(scan.frames.values_list('frame_number', 'raw_path', 'content')),
+            list(
+                scan.decisions.order_by('created').values_list(
+                    'decision', 'creator', 'note', 'location', 'user_identified_artifacts'
+                )
+            ),
+        )
+
+    assert imported_rows(True) == imported_rows(False)
+
+
+@pytest.mark.django_db
+def test_import_csv_chunk_error(
+    tmp_path: Path, project_factory, experiment_factory, scan_factory, mocker
+):
+    mocker.patch('miqa.core.tasks.IMPORT_CHUNK_SIZE', 2)
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    csv_file = tmp_path / 'import.csv'
+    csv_file.write_text(
+        '\n'.join(
+            [','.join(IMPORT_CSV_COLUMNS[:6])]
+            + [f'ucsd,experiment,scan_{frame},T1,{frame},/tmp/image.nii.gz' for frame in range(2)]
+            + ['ucsd,experiment,scan_2,T1,foo,/tmp/image.nii.gz']
+        )
+    )
+    project = project_factory(name='ucsd', import_path=str(csv_file))
+    scan = scan_factory(experiment=experiment_factory(project=project))
+
+    with pytest.raises(APIException, match='Import stopped at rows 3-3, nothing was imported'):
+        import_data(project.id)
+    # the valid first chunk was rolled back, along with the deletion of the previous import
+    scans = Scan.objects.filter(experiment__project=project)
+    assert scans.count() == 1
+    assert scans.filter(id=scan.id).exists()
+
+
+@pytest.mark.django_db
+def test_validate_file_locations_lists_each_directory_once(tmp_path: Path, project_factory, mocker):
+    scan_dir = tmp_path / 'scans'
+    scan_dir.mkdir()
+    for name in ['a.nii.gz', 'b.nii.gz']:
+        (scan_dir / name).touch()
+    (scan_dir / 'broken.nii.gz').symlink_to(tmp_path / 'missing.nii.gz')
+    project = project_factory(import_path=str(tmp_path / 'imports' / 'import.csv'))
+    frames = {
+        frame_number: {'file_location': file_location}
+        for frame_number, file_location in enumerate(
+            [
+                str(scan_dir / 'a.nii.gz'),
+                'scans/b.nii.gz',
+                str(scan_dir / 'c.nii.gz'),
+                str(scan_dir / 'broken.nii.gz'),
+                str(tmp_path / 'other' / 'd.nii.gz'),
+                's3://bucket/scans/e.nii.gz',
+            ]
+        )
+    }
+    scandir = mocker.spy(os, 'scandir')
+
+    import_dict, errors = validate_file_locations(
+        {'projects': {'p': {'experiments': {'e': {'scans': {'s': {'frames': frames}}}}}}},
+        project,
+        [],
+    )
+
+    scandir.assert_called_once_with(scan_dir)
+    assert frames[1]['file_location'] == str(tmp_path / 'scans' / 'b.nii.gz')
+    assert errors == [
+        f'File not found: {scan_dir / "c.nii.gz"}',
+        f'File not found: {scan_dir / "broken.nii.gz"}',
+        f'File not found: {tmp_path / "other" / "d.nii.gz"}',
+    ]
+
+
+@pytest.mark.django_db
+def test_validate_file_locations_s3(project, settings, mocker):
+    settings.IMPORT_VERIFY_S3_LOCATIONS = True
+    client = mocker.patch('miqa.core.conversion.import_export_csvs.get_s3_client').return_value
+    client.get_paginator.return_value.paginate.return_value = [
+        {'Contents': [{'Key': 'scans/a.nii.gz'}]},
+        {'Contents': [{'Key': 'scans/b.nii.gz'}]},
+    ]
+    frames = {
+        frame_number: {'file_location': f's3://bucket/scans/{name}'}
+        for frame_number, name in enumerate(['a.nii.gz', 'b.nii.gz', 'c.nii.gz'])
+    }
+
+    _, errors = validate_file_locations({'frames': frames}, project, [])
+
+    client.get_paginator.return_value.paginate.assert_called_once_with(
+        Bucket='bucket', Prefix='scans/', Delimiter='/'
+    )
+    assert errors == ['File not found: s3://bucket/scans/c.nii.gz']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('export_format', ['csv', 'json'])
+def test_export_query_count(
+    tmp_path: Path,
+    project_factory,
+    experiment_factory,
+    scan_factory,
+    frame_factory,
+    user,
+    export_format,
+):
+    project = project_factory(export_path=str(tmp_path / f'export.{export_format}'))
+
+    def add_scans(count):
+        experiment = experiment_factory(project=project)
+        for _ in range(count):
+            scan = scan_factory(experiment=experiment)
+            frame_factory(scan=scan, frame_number=0)
+            frame_factory(scan=scan, frame_number=1)
+            ScanDecision.objects.create(scan=scan, creator=user, decision='U')
+
+    def export_queries():
+        with CaptureQueriesContext(connection) as context:
+            perform_export(project.id)
+        return len(context.captured_queries)
+
+    add_scans(1)
+    small_export_queries = export_queries()
+    add_scans(10)
+    # the number of queries does not depend on the number of experiments, scans or frames
+    assert export_queries() == small_export_queries
+
+    with open(project.export_path) as fd:
+        exported = fd.read()
+    # CSV rows repeat the last decision of a scan for each of its frames
+    assert exported.count(user.username) == (22 if export_format == 'csv' else 11)
+
+
+@pytest.mark.django_db
+def test_parquet_round_trip(
+    tmp_path: Path, project_factory, experiment_factory, scan_factory, frame_factory, user, mocker
+):
+    pyarrow_parquet = pytest.importorskip('pyarrow.parquet')
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    mocker.patch('miqa.core.conversion.import_export_parquet.PARQUET_ROW_GROUP_SIZE', 2)
+    parquet_file = str(tmp_path / 'export.parquet')
+    project = project_factory(name='ucsd', import_path=parquet_file, export_path=parquet_file)
+    experiment = experiment_factory(project=project, note='notes')
+    for scan_index in range(2):
+        scan = scan_factory(experiment=experiment, name=f'scan_{scan_index}')
+        for frame_number in range(2):
+            frame_factory(scan=scan, frame_number=frame_number, raw_path=f'/data/{scan.name}')
+    ScanDecision.objects.create(
+        scan=scan,
+        creator=user,
+        decision='UN',
+        note='too blurry',
+        created=timezone.datetime(2022, 1, 1, 12, 30, tzinfo=timezone.utc),
+        user_identified_artifacts={'lesions': 1, 'ghosting_motion': 0},
+        location={'i': 1, 'j': 2, 'k': 3},
+    )
+
+    def export_csv():
+        project.export_path = str(tmp_path / 'export.csv')
+        project.save()
+        perform_export(project.id)
+        project.export_path = parquet_file
+        project.save()
+        return (tmp_path / 'export.csv').read_text()
+
+    csv_export = export_csv()
+    perform_export(project.id)
+    parquet_metadata = pyarrow_parquet.ParquetFile(parquet_file).metadata
+    # 4 frames in row groups of 2
+    assert parquet_metadata.num_row_groups == 2
+    table = pyarrow_parquet.read_table(parquet_file)
+    assert str(table.schema.field('frame_number').type) == 'int32'
+    assert str(table.schema.field('last_decision_created').type) == 'timestamp[us, tz=UTC]'
+    assert table.column('identified_artifacts').to_pylist()[-1]['lesions'] is True
+    assert table.column('identified_artifacts').to_pylist()[-1]['ghosting_motion'] is False
+
+    # an import of the export recreates the same project
+    not_found_errors = import_data(project.id)
+    assert set(not_found_errors) == {'File not found: /data/scan_0', 'File not found: /data/scan_1'}
+    decision = ScanDecision.objects.get(scan__experiment__project=project)
+    assert decision.user_identified_artifacts['lesions'] == 1
+    assert decision.user_identified_artifacts['ghosting_motion'] == 0
+    assert export_csv() == csv_export
+
+
+@pytest.mark.django_db
+def test_delta_export(
+    tmp_path: Path, project_factory, experiment_factory, scan_factory, user, mocker
+):
+    mocker.patch('miqa.core.tasks.DELTA_EXPORT_OVERLAP', timedelta(0))
+    project = project_factory(export_path=str(tmp_path / 'export.csv'))
+    experiment = experiment_factory(project=project)
+    scans = [scan_factory(experiment=experiment, name=f'scan_{i}') for i in range(2)]
+    for scan in scans:
+        scan.frames.create(frame_number=0, raw_path=f'/data/{scan.name}.nii.gz')
+
+    def delta_scan_names(sequence):
+        with open(tmp_path / f'export.delta-{sequence:06d}.csv') as fd:
+            return [row.split(',')[2] for row in fd.read().splitlines()[1:]]
+
+    # the first delta export holds the whole project
+    perform_delta_export(project.id)
+    assert delta_scan_names(1) == ['scan_0', 'scan_1']
+
+    ScanDecision.objects.create(scan=scans[1], creator=user, decision='U')
+    perform_delta_export(project.id)
+    assert delta_scan_names(2) == ['scan_1']
+
+    perform_delta_export(project.id)
+    assert delta_scan_names(3) == []
+    # earlier delta files are kept
+    assert delta_scan_names(1) == ['scan_0', 'scan_1']
+    project.refresh_from_db()
+    assert project.delta_export_sequence == 3
+
+
+@pytest.mark.django_db(databases=JOB_DATABASES)
+def test_import_job(tmp_path: Path, project_factory, user, user_factory, api_client, mocker):
+    mocker.patch('miqa.core.tasks.enqueue_evaluation')
+    image_file = tmp_path / 'image.nii.gz'
+    image_file.touch()
+    csv_file = tmp_path / 'import.csv'
+    csv_file.write_text(
+        '\n'.join(
+            [','.join(IMPORT_CSV_COLUMNS[:6])]
+            + [f'ucsd,experiment,scan,T1,{frame},{image_file}' for frame in range(3)]
+            + ['ucsd,experiment,scan,T1,3,/not/a/real/file.nii.gz']
+        )
+    )
+    project = project_factory(name='ucsd', import_path=str(csv_file))
+    assign_perm('collaborator', user, project)
+    api_client.force_authenticate(user=user)
+
+    resp = api_client.post(f'/api/v1/projects/{project.id}/import', {'incremental': True})
+    assert resp.status_code == 202
+    job = ImportExportJob.objects.get(id=resp.data['id'])
+    assert job.creator == user
+    assert job.incremental
+
+    resp = api_client.get(f'/api/v1/jobs/{job.id}')
+    assert resp.status_code == 200
+    assert resp.data['kind'] == 'import'
+    assert resp.data['phase'] == 'done'
+    assert resp.data['rows_processed'] == 4
+    assert resp.data['warnings'] == ['File not found: /not/a/real/file.nii.gz']
+    assert resp.data['error'] == ''
+    assert resp.data['elapsed'] >= 0
+
+    # jobs are only visible to whoever started them
+    api_client.force_authenticate(user=user_factory())
+    assert api_client.get(f'/api/v1/jobs/{job.id}').status_code == 404
+
+
+@pytest.mark.django_db(databases=JOB_DATABASES)
+def test_import_job_failure(project_factory, user, api_client):
+    project = project_factory(import_path='/foo/bar.txt')
+    assign_perm('collaborator', user, project)
+    api_client.force_authenticate(user=user)
+
+    resp = api_client.post(f'/api/v1/projects/{project.id}/import')
+    assert resp.status_code == 202
+    resp = api_client.get(f'/api/v1/jobs/{resp.data["id"]}')
+    assert resp.data['phase'] == 'failed'
+    assert resp.data['error'] == 'Invalid import file /foo/bar.txt. Must be CSV, Parquet or JSON.'
+    assert resp.data['finished'] is not None
+
+
+@pytest.mark.django_db(transaction=True, databases=JOB_DATABASES)
+def test_job_progress_outside_import_transaction(project):
+    job = ImportExportJob.objects.create(kind='import', project=project)
+
+    with pytest.raises(APIException):
+        with transaction.atomic():
+            job.update_progress('write', 3)
+            # other connections see the progress while the import runs
+            assert ImportExportJob.objects.using(PROGRESS_DATABASE).get(id=job.id).phase == 'write'
+            raise APIException('Import failed')
+
+    job.refresh_from_db()
+    assert (job.phase, job.rows_processed) == ('write', 3)
@@ -1,15 +1,23 @@
+from base64 import b64encode
 import json
+from urllib.parse import urlencode
 from uuid import UUID
 
-from guardian.shortcuts import assign_perm, get_perms
+from click import ClickException
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from guardian.shortcuts import assign_perm, get_perms, remove_perm
 import pytest
 
+from miqa.core.models import Evaluation, ProjectStatistics
 from miqa.core.rest.frame import FrameSerializer
 from miqa.core.rest.permissions import has_read_perm, has_review_perm
 from miqa.core.rest.project import ProjectSerializer
-from miqa.core.rest.scan import ScanSerializer
+from miqa.core.rest.scan import ScanSummarySerializer
 from miqa.core.rest.scan_decision import ScanDecisionSerializer
 from miqa.core.rest.user import UserSerializer
+from miqa.core.s3 import presigned_urls
 
 
 # to avoid failing a comparison between a string id and UUID
@@ -62,6 +70,26 @@ def test_projects_list(user_api_client, project, user):
         }
 
 
+@pytest.mark.django_db
+def test_projects_list_reads_statistics(api_client, project_factory, scan_factory, user_factory):
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+    for project in [project_factory() for _ in range(3)]:
+        scan_factory(experiment__project=project)
+        ProjectStatistics.refresh(project.id)
+
+    with CaptureQueriesContext(connection) as context:
+        resp = api_client.get('/api/v1/projects')
+    assert resp.status_code == 200
+    assert [project['status']['total_scans'] for project in resp.data['results']] == [1, 1, 1]
+    # statistics are read from one row per project rather than counted from its scans and frames
+    assert not [
+        query
+        for query in context.captured_queries
+        if 'COUNT(' in query['sql']
+        and ('"core_scan"' in query['sql'] or '"core_frame"' in query['sql'])
+    ]
+
+
 @pytest.mark.django_db
 def test_project_status(
     project,
@@ -83,12 +111,159 @@ def test_project_status(
         decider = user_factory()
         assign_perm(decision[1], decider, project)
         scan_decision_factory(scan=scan, creator=decider, decision=decision[0])
-    # project.refresh_from_db()
+    # factories skip the views that maintain review states
+    project.update_review_states()
     status = project.get_status()
     assert status['total_scans'] == len(scans)
     assert status['total_complete'] == 3
 
 
+@pytest.mark.django_db
+def test_review_states_follow_tier_2_reviewers(
+    project, scan, scan_decision_factory, user_factory, capsys
+):
+    reviewer = user_factory()
+    scan_decision_factory(scan=scan, creator=reviewer, decision='UN')
+    with pytest.raises(ClickException, match='scans or project statistics are out of date'):
+        call_command('backfill_review_states', '--verify')
+
+    call_command('backfill_review_states')
+    scan.refresh_from_db()
+    assert scan.review_state == 'needs tier 2 review'
+    call_command('backfill_review_states', '--verify')
+    assert f'{project.name}: 0 scans out of date' in capsys.readouterr().out
+
+    project.update_group('tier_2_reviewer', [reviewer.username])
+    scan.refresh_from_db()
+    assert scan.review_state == 'complete'
+    project.update_group('tier_2_reviewer', [])
+    scan.refresh_from_db()
+    assert scan.review_state == 'needs tier 2 review'
+
+    # permissions assigned outside of update_group are followed too
+    assign_perm('tier_2_reviewer', reviewer, project)
+    scan.refresh_from_db()
+    assert scan.review_state == 'complete'
+    assert ProjectStatistics.objects.get(project=project).complete_scans == 1
+    remove_perm('tier_2_reviewer', reviewer, project)
+    scan.refresh_from_db()
+    assert scan.review_state == 'needs tier 2 review'
+    assert ProjectStatistics.objects.get(project=project).complete_scans == 0
+
+
+@pytest.mark.django_db
+def test_project_memberships_follow_permissions(api_client, project, experiment, user_factory):
+    reviewer = user_factory()
+    assign_perm('collaborator', reviewer, project)
+    project.update_group('tier_1_reviewer', [reviewer.username])
+    assert project.memberships.get().role == 'tier_1_reviewer'
+    assert project.get_user_role(reviewer) == 'tier_1_reviewer'
+
+    api_client.force_authenticate(user=reviewer)
+    with CaptureQueriesContext(connection) as context:
+        resp = api_client.get(f'/api/v1/projects/{project.id}/task_overview')
+    assert resp.status_code == 200
+    assert resp.data['my_project_role'] == 'tier_1_reviewer'
+    # the permission decorator and the serializer share one lookup of the user's roles
+    membership_queries = [
+        query
+        for query in context.captured_queries
+        if 'FROM "core_projectmembership"' in query['sql']
+    ]
+    assert len(membership_queries) == 1
+
+    project.update_group('tier_1_reviewer', [])
+    assert project.get_user_role(reviewer) == 'collaborator'
+    project.update_group('collaborator', [])
+    assert not project.memberships.exists()
+    assert api_client.get(f'/api/v1/experiments/{experiment.id}').status_code == 404
+
+
+@pytest.mark.django_db
+def test_project_task_overview(
+    api_client, project, experiment_factory, scan_factory, scan_decision_factory, user_factory
+):
+    decisions = [
+        ('U', 'tier_1_reviewer', 'complete'),
+        ('UN', 'tier_1_reviewer', 'needs tier 2 review'),
+        ('UN', 'tier_2_reviewer', 'complete'),
+        ('Q?', 'superuser', 'complete'),
+        ('Q?', None, 'needs tier 2 review'),
+    ]
+    expected_states = {}
+
+    def add_scans():
+        experiment = experiment_factory(project=project)
+        for decision, role, state in decisions:
+            scan = scan_factory(experiment=experiment)
+            decider = user_factory(is_superuser=role == 'superuser')
+            if role and role != 'superuser':
+                assign_perm(role, decider, project)
+            # only the latest decision counts
+            scan_decision_factory(
+                scan=scan, creator=decider, decision='U', created='2022-01-01 00:00Z'
+            )
+            scan_decision_factory(scan=scan, creator=decider if role else None, decision=decision)
+            expected_states[str(scan.id)] = state
+        expected_states[str(scan_factory(experiment=experiment).id)] = 'unreviewed'
+        # factories skip the views that maintain review states
+        project.update_review_states()
+
+    def task_overview():
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.get(f'/api/v1/projects/{project.id}/task_overview')
+        assert resp.status_code == 200
+        assert resp.data['scan_states'] == expected_states
+        assert resp.data['total_scans'] == len(expected_states)
+        return len(context.captured_queries)
+
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+    add_scans()
+    # the first request fills caches, like that of content types
+    task_overview()
+    small_project_queries = task_overview()
+    for _ in range(5):
+        add_scans()
+    # the number of queries does not depend on the number of experiments, scans or decisions
+    assert task_overview() == small_project_queries
+
+
+@pytest.mark.django_db
+def test_project_status_pending_evaluations(project, experiment, scan_factory, frame_factory):
+    frames = [frame_factory(scan__experiment=experiment, scan__scan_type='T1') for i in range(2)]
+    Evaluation.objects.create(frame=frames[0], evaluation_model='MIQAT1-0', results={})
+    # no evaluation model is configured for PET scans, so their frames are never evaluated
+    frame_factory(scan__experiment=experiment, scan__scan_type='PET')
+    ProjectStatistics.refresh(project.id)
+
+    status = project.get_status()
+    assert status['evaluated_frames'] == 1
+    assert status['pending_evaluations'] == 1
+
+
+@pytest.mark.django_db
+def test_project_evaluation_progress(
+    user_api_client, project, experiment, scan_factory, frame_factory, user
+):
+    scan = scan_factory(experiment=experiment, scan_type='T1')
+    frames = [frame_factory(scan=scan) for i in range(3)]
+    Evaluation.objects.create(frame=frames[0], evaluation_model='MIQAT1-0', results={})
+    # no evaluation model is configured for PET scans, so their frames are never evaluated
+    frame_factory(scan=scan_factory(experiment=experiment, scan_type='PET'))
+
+    resp = user_api_client().get(f'/api/v1/projects/{project.id}/evaluation_progress')
+    if not has_read_perm(get_perms(user, project)):
+        assert resp.status_code == 403
+    else:
+        assert resp.status_code == 200
+        assert resp.data == {
+            'total_frames': 4,
+            'evaluated_frames': 1,
+            'pending_frames': 2,
+            'skipped_frames': 1,
+        }
+
+
 @pytest.mark.django_db
 def test_project_settings_get(user_api_client, project, user):
     resp = user_api_client().get(f'/api/v1/projects/{project.id}/settings')
@@ -182,7 +357,6 @@ def test_experiments_list(user_api_client, experiment, user):
                 'id': experiment.id,
                 'name': experiment.name,
                 'lock_owner': None,
-                'scans': [],
                 'project': experiment.project.id,
                 'note': experiment.note,
             }
@@ -219,21 +393,81 @@ def test_scans_list(user_api_client, scan, user):
     assert resp.status_code == 200
     if not has_read_perm(get_perms(user, scan.experiment.project)):
         assert resp.data == {
-            'count': 0,
             'next': None,
             'previous': None,
             'results': [],
         }
     else:
-        expected_result = [ScanSerializer(scan).data]
+        expected_result = [ScanSummarySerializer(scan).data]
         assert json.loads(json.dumps(resp.data, cls=UUIDEncoder)) == {
-            'count': 1,
             'next': None,
             'previous': None,
             'results': expected_result,
         }
 
 
+@pytest.mark.django_db
+def test_scans_list_by_experiment(
+    api_client, experiment_factory, scan_factory, frame_factory, user_factory
+):
+    experiment, other_experiment = experiment_factory(), experiment_factory()
+    scans = [scan_factory(experiment=experiment, name=f'scan_{i}') for i in range(3)]
+    scan_factory(experiment=other_experiment)
+    frame = frame_factory(scan=scans[0])
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+
+    resp = api_client.get('/api/v1/scans', {'experiment': experiment.id, 'limit': 2})
+    assert resp.status_code == 200
+    assert [scan['id'] for scan in resp.data['results']] == [str(scan.id) for scan in scans[:2]]
+    assert resp.data['next']
+    # download URLs are only generated when a scan is opened
+    assert [frame_data['id'] for frame_data in resp.data['results'][0]['frames']] == [str(frame.id)]
+    assert 'download_url' not in resp.data['results'][0]['frames'][0]
+
+    resp = api_client.get(f'/api/v1/scans/{scans[0].id}')
+    assert resp.status_code == 200
+    assert 'download_url' in resp.data['frames'][0]
+
+    resp = api_client.get(f'/api/v1/projects/{experiment.project.id}')
+    assert resp.status_code == 200
+    assert [experiment_data['id'] for experiment_data in resp.data['experiments']] == [
+        str(experiment.id)
+    ]
+    assert 'scans' not in resp.data['experiments'][0]
+
+
+@pytest.mark.django_db
+def test_scan_presigned_urls_cached(
+    api_client, scan, frame_factory, user_factory, settings, mocker
+):
+    settings.S3_SUPPORT = True
+    frames = [
+        frame_factory(scan=scan, frame_number=i, raw_path=f's3://bucket/frame_{i}.nii.gz')
+        for i in range(3)
+    ]
+    generate_presigned_url = mocker.patch(
+        'miqa.core.s3.get_s3_client'
+    ).return_value.generate_presigned_url
+    generate_presigned_url.side_effect = lambda method, Params, ExpiresIn: Params['Key']
+    monotonic = mocker.patch('miqa.core.s3.time.monotonic', return_value=0)
+    presigned_urls.clear()
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+
+    def download_urls():
+        resp = api_client.get(f'/api/v1/scans/{scan.id}')
+        assert resp.status_code == 200
+        return [frame['download_url'] for frame in resp.data['frames']]
+
+    expected_urls = [f'frame_{i}.nii.gz' for i in range(len(frames))]
+    assert download_urls() == expected_urls
+    assert download_urls() == expected_urls
+    # each URL is signed once, until it is about to expire
+    assert generate_presigned_url.call_count == len(frames)
+    monotonic.return_value = presigned_urls.expiration - presigned_urls.expiry_margin
+    assert download_urls() == expected_urls
+    assert generate_presigned_url.call_count == 2 * len(frames)
+
+
 @pytest.mark.django_db
 def test_scan_decisions_list(user_api_client, scan_decision, user):
     resp = user_api_client(project=scan_decision.scan.experiment.project).get(
@@ -242,7 +476,6 @@ def test_scan_decisions_list(user_api_client, scan_decision, user):
     assert resp.status_code == 200
     if not has_read_perm(get_perms(user, scan_decision.scan.experiment.project)):
         assert resp.data == {
-            'count': 0,
             'next': None,
             'previous': None,
             'results': [],
@@ -250,7 +483,6 @@ def test_scan_decisions_list(user_api_client, scan_decision, user):
     else:
         expected_result = [ScanDecisionSerializer(scan_decision).data]
         assert resp.data == {
-            'count': 1,
             'next': None,
             'previous': None,
             'results': expected_result,
@@ -263,20 +495,159 @@ def test_frames_list(user_api_client, frame, user):
     assert resp.status_code == 200
     if not has_read_perm(get_perms(user, frame.scan.experiment.project)):
         assert resp.data == {
-            'count': 0,
             'next': None,
             'previous': None,
             'results': [],
         }
     else:
         assert resp.data == {
-            'count': 1,
             'next': None,
             'previous': None,
             'results': [FrameSerializer(frame).data],
         }
 
 
+def walk_pages(api_client, url, link='next'):
+    """Return the ids listed by a page and those it links to, and the queries of each page."""
+    pages = []
+    page_queries = []
+    while url:
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.get(url)
+        assert resp.status_code == 200
+        pages.append([result['id'] for result in resp.data['results']])
+        page_queries.append([query['sql'] for query in context.captured_queries])
+        url = resp.data[link]
+    return pages, page_queries, resp
+
+
+@pytest.mark.django_db
+def test_scans_list_cursor(api_client, experiment, scan_factory, user_factory):
+    # more scans share a name than fit on a page
+    scans = [scan_factory(experiment=experiment, name='scan_a') for _ in range(5)]
+    scans += [scan_factory(experiment=experiment, name=f'scan_{i}') for i in 'bc']
+    scans.sort(key=lambda scan: (scan.name, str(scan.id)))
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+
+    url = '/api/v1/scans?' + urlencode({'experiment': experiment.id, 'limit': 2})
+    pages, page_queries, last_page = walk_pages(api_client, url)
+    assert sum(pages, []) == [str(scan.id) for scan in scans]
+    # pages continue from the last scan of the previous one, without counting or skipping rows
+    assert len({len(queries) for queries in page_queries}) == 1
+    for queries in page_queries:
+        assert not any('COUNT(' in sql or 'OFFSET' in sql for sql in queries)
+
+    # previous links lead back through the same pages
+    previous_pages, _, first_page = walk_pages(api_client, last_page.data['previous'], 'previous')
+    assert previous_pages == pages[-2::-1]
+    assert first_page.data['previous'] is None
+
+
+@pytest.mark.django_db
+def test_scan_decisions_list_cursor(api_client, scan, scan_decision_factory, user_factory):
+    decisions = [scan_decision_factory(scan=scan) for _ in range(4)]
+    # decisions imported without a creation time sort first, as the latest
+    for decision in decisions[:2]:
+        decision.created = None
+        decision.save()
+    expected = sorted(decisions[:2], key=lambda decision: str(decision.id)) + sorted(
+        decisions[2:], key=lambda decision: decision.created, reverse=True
+    )
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+
+    url = '/api/v1/scan-decisions?' + urlencode({'scan': scan.id, 'limit': 1})
+    pages, _, _ = walk_pages(api_client, url)
+    assert pages == [[str(decision.id)] for decision in expected]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    'position',
+    [
+        'not json',
+        '{"scan_id": null}',
+        '["00000000-0000-0000-0000-000000000000"]',
+        '["not a uuid", null, "00000000-0000-0000-0000-000000000000"]',
+        '["00000000-0000-0000-0000-000000000000", "not a date", null]',
+        '["00000000-0000-0000-0000-000000000000", null, ["nested"]]',
+    ],
+)
+def test_scan_decisions_list_invalid_cursor(api_client, scan, user_factory, position):
+    api_client.force_authenticate(user=user_factory(is_superuser=True))
+    cursor = b64encode(urlencode({'p': position}).encode('ascii')).decode('ascii')
+
+    resp = api_client.get(
+        '/api/v1/scan-decisions?' + urlencode({'scan': scan.id, 'cursor': cursor})
+    )
+    assert resp.status_code == 404
+    assert resp.data == {'detail': 'Invalid cursor'}
+
+
+# the most queries each endpoint may take, whatever the number of objects it serializes
+ENDPOINT_MAX_QUERIES = {
+    '/api/v1/projects': 6,
+    '/api/v1/projects/{project}': 5,
+    '/api/v1/experiments': 2,
+    '/api/v1/experiments/{experiment}': 6,
+    '/api/v1/scans': 5,
+    '/api/v1/scans/{scan}': 5,
+    '/api/v1/frames': 1,
+    '/api/v1/scan-decisions': 1,
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('endpoint', ENDPOINT_MAX_QUERIES)
+def test_endpoint_query_count(
+    endpoint,
+    api_client,
+    project_factory,
+    experiment_factory,
+    scan_factory,
+    frame_factory,
+    scan_decision_factory,
+    user_factory,
+):
+    user = user_factory()
+    api_client.force_authenticate(user=user)
+    projects = []
+
+    def add_objects():
+        project = project_factory()
+        assign_perm('tier_1_reviewer', user, project)
+        assign_perm('collaborator', user_factory(), project)
+        projects.append(project)
+        for _ in range(2):
+            experiment = experiment_factory(project=project, lock_owner=user_factory())
+            for _ in range(2):
+                scan = scan_factory(experiment=experiment)
+                for frame_number in range(2):
+                    frame = frame_factory(scan=scan, frame_number=frame_number)
+                    Evaluation.objects.create(frame=frame, evaluation_model='MIQAMix-0', results={})
+                    scan_decision_factory(scan=scan, creator=user_factory())
+
+    def endpoint_queries():
+        project = projects[0]
+        experiment = project.experiments.first()
+        url = endpoint.format(
+            project=project.id, experiment=experiment.id, scan=experiment.scans.first().id
+        )
+        with CaptureQueriesContext(connection) as context:
+            resp = api_client.get(url)
+        assert resp.status_code == 200
+        return len(context.captured_queries)
+
+    add_objects()
+    # the first request fills caches, like that of content types
+    endpoint_queries()
+    queries = endpoint_queries()
+    for _ in range(3):
+        add_objects()
+    # every page, and every object, takes the same number of queries
+    assert endpoint_queries() == queries
+    assert queries <= ENDPOINT_MAX_QUERIES[endpoint]
+
+
 @pytest.mark.django_db
 def test_experiment_lock_acquire_requires_auth(api_client, experiment):
     resp = api_client.post(f'/api/v1/experiments/{experiment.id}/lock')
@@ -403,3 +774,26 @@ def test_create_scan_decision_with_lock(user_api_client, scan, user):
         decisions = scan.decisions.all()
         assert len(decisions) == 1
         assert decisions[0].decision == 'U'
+
+
+@pytest.mark.django_db
+def test_create_scan_decision_updates_review_state(api_client, scan, user):
+    project = scan.experiment.project
+    assign_perm('tier_1_reviewer', user, project)
+    # factories skip the views that maintain project statistics
+    ProjectStatistics.refresh(project.id)
+    scan.experiment.lock_owner = user
+    scan.experiment.save(update_fields=['lock_owner'])
+    api_client.force_authenticate(user=user)
+
+    for decision, review_state in [('UN', 'needs tier 2 review'), ('U', 'complete')]:
+        resp = api_client.post(
+            '/api/v1/scan-decisions', data={'scan': scan.id, 'decision': decision}, format='json'
+        )
+        assert resp.status_code == 201
+        scan.refresh_from_db()
+        assert str(scan.latest_decision_id) == resp.data['id']
+        assert scan.review_state == review_state
+    expected = ProjectStatistics.compute(project.id)
+    assert ProjectStatistics.objects.values(*expected).get(project=project) == expected
+    assert ProjectStatistics.objects.get(project=project).complete_scans == 1
@@ -1,11 +1,16 @@
 from abc import ABC, abstractmethod
+import logging
 from pathlib import Path
-from typing import List
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
 
 from uri import URI
 
 from miqa.learning.nn_inference import get_model
 
+logger = logging.getLogger(__name__)
+
 
 class EvaluationModel(ABC):
     def __init__(self, uri: URI, expected_outputs: List[str]):
@@ -62,3 +67,67 @@ available_evaluation_models = {
         ],
     ),
 }
+
+
+def _model_memory_size(model) -> int:
+    # bytes held by the weights and buffers of a torch module
+    state_dict = getattr(model, 'state_dict', None)
+    if state_dict is None:
+        return 0
+    return sum(tensor.numel() * tensor.element_size() for tensor in state_dict().values())
+
+
+class EvaluationModelRegistry:
+    """
+    Process-wide cache of loaded evaluation models.
+
+    Each model is loaded at most once per process and reused by every subsequent evaluation.
+    Celery workers warm the cache on `worker_process_init`, so tasks never pay the load cost.
+    """
+
+    def __init__(self, models: Dict[str, EvaluationModel]):
+        self.models = models
+        self._loaded: Dict[str, object] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str):
+        with self._lock:
+            if name not in self._loaded:
+                start = time.perf_counter()
+                loaded_model = self.models[name].load()
+                self._stats[name] = {
+                    'load_seconds': time.perf_counter() - start,
+                    'memory_bytes': _model_memory_size(loaded_model),
+                }
+                self._loaded[name] = loaded_model
+                logger.info(
+                    f'Loaded evaluation model {name} in {self._stats[name]["load_seconds"]:.2f}s '
+                    f'({self._stats[name]["memory_bytes"] / 2**20:.1f} MiB)'
+                )
+            return self._loaded[name]
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        """
+        Load models ahead of their first use.
+
+        A model that fails to load, e.g. because its weights are missing, is logged and left to
+        be loaded by get when an evaluation needs it, so that workers still start.
+        """
+        for name in names if names is not None else self.models.keys():
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception(f'Could not preload evaluation model {name}')
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: dict(model_stats) for name, model_stats in self._stats.items()}
+
+    def clear(self):
+        with self._lock:
+            self._loaded.clear()
+            self._stats.clear()
+
+
+evaluation_model_registry = EvaluationModelRegistry(available_evaluation_models)
@@ -31,26 +31,35 @@ artifact_names = {
 }
 
 
+# number of 64^3 tiles sent through the network at once by evaluate_many
+DEFAULT_TILE_BATCH_SIZE = 32
+
+
+def get_tile_starts(size, tile_size):
+    # evenly spread the minimal number of tiles needed to cover the axis
+    steps = math.ceil(size / tile_size)
+    return [round(step * (size - tile_size) / max(1, steps - 1)) for step in range(steps)]
+
+
 class TiledClassifier(monai.networks.nets.Classifier):
-    def forward(self, inputs):
-        # split the input image into tiles and run each tile through NN
-        results = []
+    def split_into_tiles(self, inputs):
+        # split the input image into tiles matching the NN input shape
+        tiles = []
         z_tile_size = self.in_shape[0]
         y_tile_size = self.in_shape[1]
         x_tile_size = self.in_shape[2]
         z_size = inputs.shape[2]
         y_size = inputs.shape[3]
         x_size = inputs.shape[4]
-        z_steps = math.ceil(z_size / z_tile_size)
-        y_steps = math.ceil(y_size / y_tile_size)
-        x_steps = math.ceil(x_size / x_tile_size)
-        for k in range(z_steps):
-            k_start = round(k * (z_size - z_tile_size) / max(1, z_steps - 1))
-            for j in range(y_steps):
-                j_start = round(j * (y_size - y_tile_size) / max(1, y_steps - 1))
-                for i in range(x_steps):
-                    i_start = round(i * (x_size - x_tile_size) / max(1, x_steps - 1))
 
+        # check if the image is smaller than our NN input
+        x_pad = max(0, x_tile_size - x_size)
+        y_pad = max(0, y_tile_size - y_size)
+        z_pad = max(0, z_tile_size - z_size)
+
+        for k_start in get_tile_starts(z_size, z_tile_size):
+            for j_start in get_tile_starts(y_size, y_tile_size):
+                for i_start in get_tile_starts(x_size, x_tile_size):
                     # use slicing operator to make a tile
                     tile = inputs[
                         :,
@@ -59,21 +68,24 @@ class TiledClassifier(monai.networks.nets.Classifier):
                         j_start : j_start + y_tile_size,
                         i_start : i_start + x_tile_size,
                     ]
-
-                    # check if the tile is smaller than our NN input
-                    x_pad = max(0, x_tile_size - x_size)
-                    y_pad = max(0, y_tile_size - y_size)
-                    z_pad = max(0, z_tile_size - z_size)
-
                     if x_pad + y_pad + z_pad > 0:  # we need to pad
                         tile = torch.nn.functional.pad(
                             tile, (0, x_pad, 0, y_pad, 0, z_pad), 'replicate'
                         )
+                    tiles.append(tile)
+        return tiles
 
-                    results.append(super().forward(tile))
+    def classify_tiles(self, tiles):
+        # run a batch of NN-sized tiles through the network, one output row per tile
+        return super().forward(tiles)
+
+    def forward(self, inputs):
+        # run all tiles of all inputs through the NN as a single batch
+        tiles = self.split_into_tiles(inputs)
+        results = self.classify_tiles(torch.cat(tiles))
 
         # TODO: do something smarter than mean here
-        average = torch.mean(torch.stack(results), dim=0)
+        average = torch.mean(results.view(len(tiles), inputs.shape[0], -1), dim=0)
         return average
 
 
@@ -306,27 +318,72 @@ def evaluate1(model, image_path):
     return label_results(result)
 
 
-def evaluate_many(model, image_paths):
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+def evaluate_tiled(model, volumes, device, tile_batch_size=DEFAULT_TILE_BATCH_SIZE):
+    """
+    Evaluate many volumes, packing tiles from consecutive volumes into shared batches.
 
-    evaluation_files = [
-        torchio.Subject(
-            {
-                'img': torchio.ScalarImage(image_path),
-                'info': torch.FloatTensor([0] * (regression_count + len(artifacts))),
-            }
-        )
-        for image_path in image_paths
-    ]
+    Each volume is a (1, C, Z, Y, X) tensor. The network runs once per `tile_batch_size` tiles
+    instead of once per tile, and each tile output is added back to the volume it came from.
+    Returns the averaged network output of every volume, in input order.
+    """
+    model.eval()
+    sums = []
+    counts = []
+    pending_tiles = []
+    pending_owners = []
+
+    def classify_pending(batch_size):
+        batch = torch.cat(pending_tiles[:batch_size]).to(device)
+        owners = torch.tensor(pending_owners[:batch_size])
+        outputs = model.classify_tiles(batch).cpu()
+        del pending_tiles[:batch_size]
+        del pending_owners[:batch_size]
+
+        # scatter the tile outputs back onto the volumes they belong to
+        first_owner = int(owners[0])
+        owner_sums = torch.zeros(int(owners[-1]) - first_owner + 1, outputs.shape[1])
+        owner_sums.index_add_(0, owners - first_owner, outputs)
+        for offset, owner_sum in enumerate(owner_sums):
+            sums[first_owner + offset] += owner_sum
 
+    with torch.no_grad():
+        for index, volume in enumerate(volumes):
+            tiles = model.split_into_tiles(volume)
+            sums.append(0)
+            counts.append(len(tiles))
+            pending_tiles.extend(tiles)
+            pending_owners.extend([index] * len(tiles))
+            while len(pending_tiles) >= tile_batch_size:
+                classify_pending(tile_batch_size)
+            logger.debug(f'Tiled volume {index} into {len(tiles)} tiles')
+        if pending_tiles:
+            classify_pending(len(pending_tiles))
+
+    return [(volume_sum / count).tolist() for volume_sum, count in zip(sums, counts)]
+
+
+def evaluate_many(model, image_paths, tile_batch_size=DEFAULT_TILE_BATCH_SIZE):
+    """
+    Evaluate every image in `image_paths`, returning labeled results keyed by path.
+
+    `image_paths` may be any iterable, including a generator that yields files as they finish
+    downloading. Each image is read only after the previous one has been tiled.
+    """
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     rescale = ReorientAndRescale(out_min_max=(0, 1))
-    evaluation_ds = monai.data.Dataset(evaluation_files, transform=rescale)
-    evaluation_loader = DataLoader(evaluation_ds, pin_memory=torch.cuda.is_available())
-    results = evaluate_model(model, evaluation_loader, device, None, 0, 'evaluate_many')
+    evaluated_paths = []
+
+    def load_volumes():
+        for image_path in image_paths:
+            evaluated_paths.append(image_path)
+            subject = rescale(torchio.Subject({'img': torchio.ScalarImage(image_path)}))
+            yield subject['img'][torchio.DATA].unsqueeze(0)  # add batch dimension
+
+    results = evaluate_tiled(model, load_volumes(), device, tile_batch_size)
 
     labeled_results = {}
-    for index, result in enumerate(results):
-        labeled_results[image_paths[index]] = label_results(result)
+    for image_path, result in zip(evaluated_paths, results):
+        labeled_results[image_path] = label_results(result)
     return labeled_results
 
 
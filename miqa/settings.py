@@ -42,21 +42,40 @@ class MiqaMixin(ConfigMixin):
     NORMAL_USERS_CAN_CREATE_PROJECTS = values.BooleanValue(environ=True, default=False)
     # Enable the following to replace null creation times for scan decisions with import time
     REPLACE_NULL_CREATION_DATETIMES = values.BooleanValue(environ=True, default=False)
+    # Enable the following to check that S3 frames listed by imports exist, one listing per folder
+    IMPORT_VERIFY_S3_LOCATIONS = values.BooleanValue(environ=True, default=False)
+    # Disable the following to write imports to PostgreSQL with INSERTs rather than COPY
+    IMPORT_USE_COPY = values.BooleanValue(environ=True, default=True)
+    # Set the following to run a delta export of every project with an export path periodically
+    DELTA_EXPORT_INTERVAL_HOURS = values.IntegerValue(environ=True, default=0)
 
     # Override default signup sheet to ask new users for first and last name
     ACCOUNT_FORMS = {'signup': 'miqa.core.rest.accounts.AccountSignupForm'}
 
     @property
     def CELERY_BEAT_SCHEDULE(self):
+        schedule = {}
         if self.DEMO_MODE:
-            return {
-                'reset-demo': {
-                    'task': 'miqa.core.tasks.reset_demo',
-                    'schedule': timedelta(days=1),
-                }
+            schedule['reset-demo'] = {
+                'task': 'miqa.core.tasks.reset_demo',
+                'schedule': timedelta(days=1),
             }
-        else:
-            return {}
+        if self.DELTA_EXPORT_INTERVAL_HOURS:
+            schedule['delta-export'] = {
+                'task': 'miqa.core.tasks.delta_export_projects',
+                'schedule': timedelta(hours=self.DELTA_EXPORT_INTERVAL_HOURS),
+            }
+        return schedule
+
+    @classmethod
+    def post_setup(cls) -> None:
+        super().post_setup()
+        # Job progress is written on a connection of its own, so that it is visible while an
+        # import runs in its transaction. Tests share the default database.
+        cls.DATABASES['job_progress'] = {
+            **cls.DATABASES['default'],
+            'TEST': {'MIRROR': 'default'},
+        }
 
     @staticmethod
     def before_binding(configuration: ComposedConfiguration) -> None:
@@ -15,6 +15,7 @@ from miqa.core.rest import (
     FrameViewSet,
     GlobalSettingsViewSet,
     HomePageView,
+    ImportExportJobViewSet,
     LogoutView,
     MIQAConfigView,
     ProjectViewSet,
@@ -30,6 +31,7 @@ router.register('scans', ScanViewSet, basename='scan')
 router.register('frames', FrameViewSet, basename='frame')
 router.register('scan-decisions', ScanDecisionViewSet, basename='scan_decisions')
 router.register('global', GlobalSettingsViewSet, basename='global')
+router.register('jobs', ImportExportJobViewSet, basename='job')
 router.register('users', UserViewSet)
 
 # OpenAPI generation
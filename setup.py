@@ -78,6 +78,9 @@ setup(
             'torchio',
             'wandb',
         ],
+        'parquet': [
+            'pyarrow',
+        ],
         'zarr': [
             'itk-io',
             'itk-filtering',
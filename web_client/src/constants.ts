@@ -18,3 +18,7 @@ export const IDLE_TIMEOUT = 15 * 60 * 1000;
 // Controls whether MIQA auto-advances to the next scan when a decision is rendered on the current
 // scan
 export const AUTO_ADVANCE = false;
+// Scans are loaded a page at a time for each experiment of a project
+export const SCANS_PAGE_SIZE = 500;
+// At most this many experiments of a project have their scans loaded at once
+export const EXPERIMENT_SCANS_REQUESTS = 4;
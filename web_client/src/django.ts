@@ -4,9 +4,12 @@ import OAuthClient from '@girder/oauth-client';
 import S3FileFieldClient from 'django-s3-file-field';
 
 import {
-  ResponseData, Project, ProjectTaskOverview, ProjectSettings, User, Email, Experiment, Scan, Frame,
+  ResponseData, ImportExportJob, Project, ProjectTaskOverview, ProjectSettings, User, Email,
+  Experiment, Scan, ScanDecision, Frame,
 } from './types';
-import { API_URL, OAUTH_API_ROOT, OAUTH_CLIENT_ID } from './constants';
+import {
+  API_URL, OAUTH_API_ROOT, OAUTH_CLIENT_ID, SCANS_PAGE_SIZE,
+} from './constants';
 
 interface Paginated<T> {
   count: number,
@@ -74,23 +77,27 @@ const djangoClient = {
     const response = await apiClient.get('/global/settings');
     return response?.data;
   },
-  async globalImport(): Promise<ResponseData> {
-    const response = await apiClient.post('/global/import');
+  async globalImport(incremental = false): Promise<ImportExportJob> {
+    const response = await apiClient.post('/global/import', { incremental });
     return response?.data;
   },
-  async projectImport(projectId: string): Promise<ResponseData> {
-    const response = await apiClient.post(`/projects/${projectId}/import`);
+  async projectImport(projectId: string, incremental = false): Promise<ImportExportJob> {
+    const response = await apiClient.post(`/projects/${projectId}/import`, { incremental });
     return response?.data;
   },
-  async globalExport(): Promise<ResponseData> {
+  async globalExport(): Promise<ImportExportJob> {
     const response = await apiClient.post('/global/export');
     return response?.data;
   },
-  async projectExport(projectId: string): Promise<ResponseData> {
+  async projectExport(projectId: string): Promise<ImportExportJob> {
     if (!projectId) return undefined;
     const response = await apiClient.post(`/projects/${projectId}/export`);
     return response?.data;
   },
+  async importExportJob(jobId: string): Promise<ImportExportJob> {
+    const response = await apiClient.get(`/jobs/${jobId}`);
+    return response?.data;
+  },
   async createProject(projectName: string): Promise<Project> {
     if (!projectName) return undefined;
     const response = await apiClient.post('/projects', { name: projectName });
@@ -191,16 +198,32 @@ const djangoClient = {
   },
   async scans(experimentId: string): Promise<Scan[]> {
     if (!experimentId) return undefined;
-    const response = await apiClient.get('/scans', {
-      params: { experiment: experimentId },
+    // Listed frames have no download URL; it is only generated when a scan is retrieved
+    const scans: Scan[] = [];
+    // Each page links to the next one, continuing from the last scan of the page
+    let response = await apiClient.get('/scans', {
+      params: { experiment: experimentId, limit: SCANS_PAGE_SIZE },
     });
-    return response?.data?.results;
+    while (response?.data) {
+      scans.push(...response.data.results);
+      if (!response.data.next) return scans;
+      // eslint-disable-next-line no-await-in-loop
+      response = await apiClient.get(response.data.next);
+    }
+    return undefined;
   },
   async scan(scanId: string): Promise<Scan> {
     if (!scanId) return undefined;
     const response = await apiClient.get(`/scans/${scanId}`);
     return response?.data;
   },
+  async scanDecisions(scanId: string): Promise<ScanDecision[]> {
+    if (!scanId) return undefined;
+    const response = await apiClient.get('/scan-decisions', {
+      params: { scan: scanId },
+    });
+    return response?.data?.results;
+  },
   async setDecision(
     scanId: string,
     decision: string,
@@ -12,6 +12,7 @@ import { readImageArrayBuffer, WorkerPool, WorkerPoolFunction } from 'itk-wasm';
 import ITKHelper from 'vtk.js/Sources/Common/DataModel/ITKHelper';
 import axios from 'axios';
 import djangoRest, { apiClient } from '@/django';
+import { EXPERIMENT_SCANS_REQUESTS } from '@/constants';
 import {
   MIQAStore, Project, ProjectTaskOverview, ProjectSettings, Scan, User,
 } from '@/types';
@@ -48,6 +49,9 @@ let readDataQueue = [];
 const loadedData = [];
 // Frames that need to be downloaded
 const pendingFrameDownloads = new Set();
+// Download URLs of the frames of each opened scan, which the server only generates when a scan
+// is retrieved rather than listed
+const scanDownloadURLs = new Map();
 // Maximum number of workers in WorkerPool
 const poolSize = Math.floor(navigator.hardwareConcurrency / 2) || 2;
 // Defines the task currently running
@@ -132,6 +136,43 @@ function getImageData(frameId: string, file, webWorker = null) {
   });
 }
 
+/** Get the client and URL to download a frame, retrieving the download URLs of its scan once. */
+async function getFrameDownload(frame) {
+  if (!scanDownloadURLs.has(frame.scan)) {
+    scanDownloadURLs.set(frame.scan, djangoRest.scan(frame.scan).then((scan) => {
+      const downloadURLs = {};
+      scan.frames.forEach((scanFrame) => {
+        downloadURLs[scanFrame.id] = scanFrame.download_url;
+      });
+      return downloadURLs;
+    }).catch((err) => {
+      scanDownloadURLs.delete(frame.scan);
+      throw err;
+    }));
+  }
+  const downloadURLs = await scanDownloadURLs.get(frame.scan);
+  if (downloadURLs[frame.id]) {
+    return { client: axios.create(), downloadURL: downloadURLs[frame.id] };
+  }
+  return { client: apiClient, downloadURL: `/frames/${frame.id}/download` };
+}
+
+/** Download a frame, like ReaderFactory.downloadFrame once its download URL is known. */
+function downloadFrame(frame, { onDownloadProgress = null } = {}) {
+  const download = { promise: null, abortController: null };
+  download.promise = getFrameDownload(frame).then(({ client, downloadURL }) => {
+    const frameDownload = ReaderFactory.downloadFrame(
+      client,
+      `image${frame.extension}`,
+      downloadURL,
+      { onDownloadProgress },
+    );
+    download.abortController = frameDownload.abortController;
+    return frameDownload.promise;
+  });
+  return download;
+}
+
 /** Load file, from cache if possible. */
 function loadFile(frame, { onDownloadProgress = null } = {}) {
   if (fileCache.has(frame.id)) {
@@ -139,18 +180,7 @@ function loadFile(frame, { onDownloadProgress = null } = {}) {
   }
 
   // Otherwise download the frame
-  let client = apiClient;
-  let downloadURL = `/frames/${frame.id}/download`;
-  if (frame.download_url) {
-    client = axios.create();
-    downloadURL = frame.download_url;
-  }
-  const { promise } = ReaderFactory.downloadFrame(
-    client,
-    `image${frame.extension}`,
-    downloadURL,
-    { onDownloadProgress },
-  );
+  const { promise } = downloadFrame(frame, { onDownloadProgress });
   fileCache.set(frame.id, promise);
   return { frameId: frame.id, cachedFile: promise };
 }
@@ -189,18 +219,7 @@ const poolFunction: WorkerPoolFunction = (webWorker, taskInfo) => new Promise((r
   if (fileCache.has(frame.id)) {
     filePromise = fileCache.get(frame.id);
   } else {
-    let client = apiClient;
-    let downloadURL = `/frames/${frame.id}/download`;
-    if (frame.download_url) {
-      client = axios.create();
-      downloadURL = frame.download_url;
-    }
-    const download = ReaderFactory.downloadFrame(
-      client,
-      `image${frame.extension}`,
-      downloadURL,
-      { onDownloadProgress },
-    );
+    const download = downloadFrame(frame, { onDownloadProgress });
     filePromise = download.promise;
     fileCache.set(frame.id, filePromise);
     pendingFrameDownloads.add(download);
@@ -304,6 +323,28 @@ function queueLoadScan(scan, loadNext = 0, onDownloadProgress = null) {
   }
 }
 
+/**
+ * Map items through an asynchronous function, with at most `limit` calls running at once.
+ *
+ * Results are in the order of the items.
+ */
+async function mapWithLimit<T, R>(
+  items: T[], limit: number, fn: (item: T) => Promise<R>,
+): Promise<R[]> {
+  const results: R[] = new Array(items.length);
+  let nextIndex = 0;
+  async function work() {
+    while (nextIndex < items.length) {
+      const index = nextIndex;
+      nextIndex += 1;
+      // eslint-disable-next-line no-await-in-loop
+      results[index] = await fn(items[index]);
+    }
+  }
+  await Promise.all(Array.from({ length: Math.min(limit, items.length) }, work));
+  return results;
+}
+
 /** Get next frame in specific experiment/scan */
 function getNextFrame(experiments, experimentIndex, scanIndex) {
   const experiment = experiments[experimentIndex];
@@ -713,6 +754,7 @@ export const storeConfig:StoreOptions<MIQAStore> = {
       commit('RESET_STATE');
       fileCache.clear();
       frameCache.clear();
+      scanDownloadURLs.clear();
     },
     /** Pulls configuration from API and loads it into state */
     async loadConfiguration({ commit }) {
@@ -755,8 +797,21 @@ export const storeConfig:StoreOptions<MIQAStore> = {
       project = await djangoRest.project(project.id);
       commit('SET_CURRENT_PROJECT', project);
 
+      // The project only lists its experiments; load the scans of each experiment, a page
+      // at a time, without the download URLs of their frames. Only a few experiments are
+      // requested at once, so that large projects do not flood the server.
+      const experimentScans = await mapWithLimit(
+        project.experiments,
+        EXPERIMENT_SCANS_REQUESTS,
+        (experiment) => djangoRest.scans(experiment.id),
+      );
       // place data in state, adds each experiment to experiments
-      const { experiments } = project;
+      const experiments = project.experiments.map(
+        (experiment, experimentIndex) => ({
+          ...experiment,
+          scans: experimentScans[experimentIndex] || [],
+        }),
+      );
 
       for (let experimentIndex = 0; experimentIndex < experiments.length; experimentIndex += 1) {
         // Get a specific experiment from the project
@@ -776,15 +831,11 @@ export const storeConfig:StoreOptions<MIQAStore> = {
         });
 
         // Get the associated scans from the experiment
-        // TODO these requests *can* be run in parallel, or collapsed into one XHR
-        // eslint-disable-next-line no-await-in-loop
         const { scans } = experiment;
         for (let scanIndex = 0; scanIndex < scans.length; scanIndex += 1) {
           const scan = scans[scanIndex];
           commit('ADD_EXPERIMENT_SCANS', { experimentId: experiment.id, scanId: scan.id });
 
-          // TODO these requests *can* be run in parallel, or collapsed into one XHR
-          // eslint-disable-next-line no-await-in-loop
           const { frames } = scan;
 
           commit('SET_SCAN', {
@@ -835,25 +886,16 @@ export const storeConfig:StoreOptions<MIQAStore> = {
       const taskOverview = await djangoRest.projectTaskOverview(project.id);
       commit('SET_TASK_OVERVIEW', taskOverview);
     },
-    /** Add a scan to scans */
-    async reloadScan({ commit, getters }, scanId) {
+    /** Reload the decisions of a scan in scans */
+    async reloadScan({ state, commit, getters }, scanId) {
       const { currentFrame } = getters;
       scanId = scanId || currentFrame.scan;
-      if (!scanId) return;
-      const scan = await djangoRest.scan(scanId);
+      if (!scanId || !state.scans[scanId]) return;
+      // Retrieving the whole scan would generate download URLs for all of its frames
+      const decisions = await djangoRest.scanDecisions(scanId);
       commit('SET_SCAN', {
-        scanId: scan.id,
-        scan: {
-          id: scan.id,
-          name: scan.name,
-          experiment: scan.experiment,
-          cumulativeRange: [Number.MAX_VALUE, -Number.MAX_VALUE],
-          notes: scan.notes,
-          decisions: scan.decisions,
-          sessionID: scan.session_id,
-          subjectID: scan.subject_id,
-          link: scan.scan_link,
-        },
+        scanId,
+        scan: { ...state.scans[scanId], decisions },
       });
     },
     async loadScan({ state, dispatch }, { scanId, projectId }) {
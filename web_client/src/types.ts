@@ -21,6 +21,21 @@ interface User {
   last_name: string,
 }
 
+interface ImportExportJob {
+  id: string,
+  kind: 'import' | 'export',
+  project: string | null,
+  incremental: boolean,
+  phase: string,
+  rows_processed: number,
+  warnings: string[],
+  error: string,
+  created: string,
+  started: string | null,
+  finished: string | null,
+  elapsed: number | null,
+}
+
 interface Email {
   to: string[],
   cc: string[],
@@ -54,6 +69,8 @@ interface Frame {
   extension: string,
   experiment?: string,
   frame_evaluation?: string,
+  // only set on the frames of a retrieved scan
+  download_url?: string | null,
 }
 
 interface MIQAConfig {
@@ -205,7 +222,7 @@ interface MIQAStore {
 }
 
 export {
-  User, ResponseData, Project, ProjectTaskOverview, ProjectSettings,
+  User, ResponseData, ImportExportJob, Project, ProjectTaskOverview, ProjectSettings,
   Scan, ScanDecision, Frame, ScanState, Email, Experiment, MIQAConfig,
   WindowLock, MIQAStore,
 };